@@ -1,17 +1,35 @@
+import time
+
+STARTED_AT = time.perf_counter()  # 模块开始加载的时间，用于统计启动耗时
+
 import os
 import sys
 import tempfile
+import re
+import io
+import json
+import hashlib
+import collections
+import contextlib
+import queue
+import argparse
 import datetime
+import threading
 import subprocess
+import signal
+import socket
+import struct
+import importlib.util
+import math
 from pathlib import Path
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QTextEdit, QPushButton, QFileDialog, QMessageBox,
-    QSystemTrayIcon, QMenu, QRubberBand
+    QSystemTrayIcon, QMenu, QRubberBand, QLineEdit, QListWidget, QListWidgetItem
 )
 from PySide6.QtGui import (
-    QPixmap, QPainter, QImage, QIcon, QPainterPath, QColor, QAction,
+    QPixmap, QPainter, QImage, QIcon, QPainterPath, QColor, QAction, QActionGroup,
     QFont, QLinearGradient, QBrush
 )
 from PySide6.QtCore import (
@@ -19,168 +37,2699 @@ from PySide6.QtCore import (
 )
 from PySide6 import QtWidgets, QtCore
 
-import pyperclip
-import mss
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageChops, ImageFilter
+
+# 启动时只加载托盘和主窗口必需的模块；mss、pyperclip、PIL 绘图模块在首次用到时才导入，
+# numpy 只有 ONNX 后端需要，由引擎子进程创建后端时导入（见 load_numpy）；
+# 引擎池、识别历史、分块并行、本地服务和分布式识别各自用到的标准库模块也在函数内导入
+np = None
+
+
+# ========== 全局异常捕获 ==========
+def handle_exception(exc_type, exc_value, exc_tb):
+    if issubclass(exc_type, KeyboardInterrupt):
+        sys.__excepthook__(exc_type, exc_value, exc_tb)
+        return
+    log_path = os.path.expanduser("~/ocr_crash.log")
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write(f"CRASH: {exc_value}\n")
+        import traceback
+        traceback.print_exception(exc_type, exc_value, exc_tb, file=f)
+
+sys.excepthook = handle_exception
+
+
+# ========== 路径工具 ==========
+# OCR_ENGINE_PATH / OCR_MODELS_DIR 可指定其他位置的引擎和模型（如 Linux 版引擎或基准测试用的替身引擎）
+def get_engine_path():
+    if os.environ.get("OCR_ENGINE_PATH"):
+        return os.environ["OCR_ENGINE_PATH"]
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, "rapidocr", "RapidOcrOnnx.exe")
+
+def get_models_dir():
+    if os.environ.get("OCR_MODELS_DIR"):
+        return os.environ["OCR_MODELS_DIR"]
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, "rapidocr", "models")
+
+
+# ========== Windows 前台窗口==========
+if sys.platform == "win32":
+    import ctypes
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+    def bring_window_to_front(hwnd):
+        current_thread = kernel32.GetCurrentThreadId()
+        foreground_thread = user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), None)
+        user32.AttachThreadInput(foreground_thread, current_thread, True)
+        user32.ShowWindow(hwnd, 9)
+        user32.SetForegroundWindow(hwnd)
+        user32.AttachThreadInput(foreground_thread, current_thread, False)
+
+
+# ========== 生成 OCR 托盘图标 ==========
+def create_ocr_icon():
+    # 直接用 QPainter 绘制，托盘出现前不必加载 PIL 的绘图和字体模块
+    pixmap = QPixmap(32, 32)
+    pixmap.fill(QColor(34, 139, 230))  # 主色调背景
+    painter = QPainter(pixmap)
+    painter.setPen(QColor(255, 255, 255))
+    font = QFont()
+    font.setPixelSize(12)  # 12 像素字适配 32x32 图标
+    painter.setFont(font)
+    painter.drawText(pixmap.rect(), Qt.AlignCenter, "OCR")
+    painter.end()
+    return pixmap
+
+
+# ========== 性能指标 ==========
+# 各阶段耗时（毫秒）和数据量（字节）记入滚动直方图，可在托盘菜单查看或导出为 JSON。
+# 关闭时 stage() 返回共享的空上下文、record() 直接返回，热路径几乎没有额外开销
+METRICS_WINDOW = 1000   # 每个指标保留最近的样本数
+
+
+class RollingHistogram:
+    def __init__(self, size=METRICS_WINDOW):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        values = sorted(self.samples)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return {
+            "count": self.count,
+            "mean": sum(values) / len(values),
+            "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": values[-1],
+        }
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class Metrics:
+    def __init__(self, enabled=False, window=METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def record(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = RollingHistogram(self.window)
+            self._histograms[name].add(value)
+
+    def increment(self, name, amount=1):
+        # 只计次数的事件（如跳过的空白图片）
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record_bytes(self, name, nbytes):
+        self.record(name + ".bytes", nbytes)
+
+    def record_since(self, name, start):
+        self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record_timings(self, timings):
+        # 引擎自报的各阶段耗时（dbNetTime、crnnTime 等）
+        if self.enabled:
+            for name, value in timings.items():
+                self.record("engine." + name, value)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: hist.summary() for name, hist in sorted(self._histograms.items())}
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def report(self):
+        rows = [f"{'stage':<24}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"]
+        for name, s in self.snapshot().items():
+            rows.append(
+                f"{name:<24}{s['count']:>8}{s['mean']:>10.1f}{s['p50']:>10.1f}"
+                f"{s['p95']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}"
+            )
+        for name, count in self.counters().items():
+            rows.append(f"{name:<24}{count:>8}")
+        return "\n".join(rows)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.snapshot(), "counters": self.counters()}, f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+_NULL_STAGE = contextlib.nullcontext()
+METRICS = Metrics(enabled=os.environ.get("OCR_METRICS") == "1")
+
+
+# ========== OCR 结果解析 ==========
+NO_TEXT = "未识别到有效文本"
+
+
+class OCRLine(collections.namedtuple("OCRLine", "text polygon score")):
+    # 一行识别结果：文本、四点多边形（原图坐标）、置信度
+    __slots__ = ()
+
+    @classmethod
+    def from_box(cls, text, box, score):
+        x0, y0, x1, y1 = box
+        return cls(text, [[x0, y0], [x1, y0], [x1, y1], [x0, y1]], score)
+
+    @property
+    def box(self):
+        xs = [p[0] for p in self.polygon]
+        ys = [p[1] for p in self.polygon]
+        return [min(xs), min(ys), max(xs), max(ys)]
+
+
+class OCRResult:
+    def __init__(self, lines=None, timings=None, text_lines=None, errors=""):
+        self.lines = lines if lines is not None else []                 # OCRLine 列表
+        self.timings = timings if timings is not None else {}           # 引擎自身的耗时（毫秒）
+        self.text_lines = text_lines if text_lines is not None else []  # 引擎最终输出的纯文本行
+        self.errors = errors
+
+    def to_dict(self):
+        return {
+            "lines": [list(line) for line in self.lines],
+            "timings": self.timings,
+            "text_lines": self.text_lines,
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            [OCRLine(*line) for line in data["lines"]],
+            dict(data["timings"]),
+            list(data["text_lines"]),
+            data.get("errors", ""),
+        )
+
+
+def render_plain_text(result):
+    # 纯文本视图：优先用结构化记录，引擎未输出逐行日志时退回它的最终文本
+    lines = [line.text for line in result.lines] or result.text_lines
+    return "\n".join(lines) if lines else NO_TEXT
+
+
+def decode_engine_text(raw_bytes):
+    try:
+        return raw_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw_bytes.decode("gbk", errors="replace")
+
+
+TEXT_BOX_RE = re.compile(
+    rb"TextBox\[(\d+)\](\(\+padding\))?\[score\(([-\d.]+)\),"
+    rb"\[x: (-?\d+), y: (-?\d+)\], \[x: (-?\d+), y: (-?\d+)\], "
+    rb"\[x: (-?\d+), y: (-?\d+)\], \[x: (-?\d+), y: (-?\d+)\]\]"
+)
+TEXT_LINE_RE = re.compile(rb"textLine\[(\d+)\]\((.*)\)$")
+TEXT_SCORES_RE = re.compile(rb"textScores\[(\d+)\]\{(.*)\}$")
+TIME_RE = re.compile(rb"\(([\d.]+)ms\)")
+
+
+class OCROutputParser:
+    # 增量解析 RapidOcrOnnx 控制台输出：按块喂入，只处理新到的完整行，
+    # 产出结构化的行记录和引擎耗时，不再对整段输出反复切分、复制。
+    # 输出里没有 FullDetectTime 结果块时（引擎报错、版本不同），整段原文作为最终文本
+    def __init__(self):
+        self.result = OCRResult()
+        self._tail = b""
+        self._boxes = {}
+        self._pending = None
+        self._finished = False
+        self._raw = []
+
+    def feed(self, chunk):
+        # 返回本块新完成的 OCRLine
+        events = []
+        data = self._tail + chunk if self._tail else chunk
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end == -1:
+                break
+            self._parse_line(data[start:end].rstrip(b"\r"), events)
+            start = end + 1
+        self._tail = data[start:]
+        return events
+
+    def close(self):
+        events = []
+        if self._tail:
+            self._parse_line(self._tail.rstrip(b"\r"), events)
+            self._tail = b""
+        self._flush(events)
+        if not self._finished and not self.result.lines:
+            self.result.text_lines = [text for text in map(decode_engine_text, self._raw) if text]
+        return events
+
+    def _parse_line(self, line, events):
+        if self._finished:
+            # FullDetectTime 之后是引擎最终输出的文本
+            text = decode_engine_text(line).strip()
+            if text:
+                self.result.text_lines.append(text)
+            return
+        self._raw.append(line.strip())
+        timings = self.result.timings
+        if line.startswith(b"TextBox["):
+            m = TEXT_BOX_RE.match(line)
+            if m:
+                offset = DET_PADDING if m.group(2) else 0
+                polygon = [[int(m.group(i)) - offset, int(m.group(i + 1)) - offset] for i in (4, 6, 8, 10)]
+                self._boxes[int(m.group(1))] = (polygon, float(m.group(3)))
+        elif line.startswith(b"textLine["):
+            self._flush(events)
+            m = TEXT_LINE_RE.match(line)
+            if m:
+                self._pending = (int(m.group(1)), decode_engine_text(m.group(2)).strip())
+        elif line.startswith(b"textScores["):
+            m = TEXT_SCORES_RE.match(line)
+            if m and self._pending and self._pending[0] == int(m.group(1)):
+                values = [float(v) for v in m.group(2).split(b",") if v.strip()]
+                self._flush(events, sum(values) / len(values) if values else None)
+        elif line.startswith(b"crnnTime["):
+            self._flush(events)
+            self._add_time("crnnTime", line)
+        elif line.startswith(b"angle["):
+            m = re.search(rb"time\(([\d.]+)ms\)", line)
+            if m:
+                timings["angleTime"] = timings.get("angleTime", 0.0) + float(m.group(1))
+        elif line.startswith(b"dbNetTime("):
+            self._add_time("dbNetTime", line)
+        elif line.startswith(b"FullDetectTime("):
+            self._flush(events)
+            self._add_time("FullDetectTime", line)
+            self._finished = True
+            self._raw = []
+
+    def _add_time(self, name, line):
+        m = TIME_RE.search(line)
+        if m:
+            timings = self.result.timings
+            timings[name] = timings.get(name, 0.0) + float(m.group(1))
+
+    def _flush(self, events, score=None):
+        if self._pending is None:
+            return
+        index, text = self._pending
+        self._pending = None
+        if not text or index not in self._boxes:
+            return
+        polygon, box_score = self._boxes[index]
+        line = OCRLine(text, polygon, box_score if score is None else score)
+        self.result.lines.append(line)
+        events.append(line)
+
+
+def parse_engine_output(raw_bytes):
+    parser = OCROutputParser()
+    parser.feed(raw_bytes)
+    parser.close()
+    return parser.result
+
+
+def filter_ocr_bytes(raw_bytes):
+    # 兼容旧接口：标准输出 + 错误输出拼接的字节串 -> 纯文本
+    error_marker = "【错误输出】".encode("utf-8")
+    if error_marker in raw_bytes:
+        raw_bytes = raw_bytes.split(error_marker)[0]
+    return render_plain_text(parse_engine_output(raw_bytes))
+
+
+# ========== OCR 引擎调用 ==========
+OCR_TIMEOUT = 60            # 单次识别超时（秒）
+ENGINE_PING_TIMEOUT = 3     # 健康检查超时（秒）
+ENGINE_HEALTH_INTERVAL = 30 # 健康检查间隔（秒）
+ENGINE_CANCEL_GRACE = 2     # 取消后等待引擎自行中止的时间（秒），超时则强制重启
+
+DET_MODEL = "ch_PP-OCRv4_det_infer.onnx"
+CLS_MODEL = "ch_ppocr_mobile_v2.0_cls_infer.onnx"
+REC_MODEL = "ch_PP-OCRv4_rec_infer.onnx"
+KEYS_FILE = "ppocr_keys_v1.txt"
+REQUIRED_MODELS = [KEYS_FILE, DET_MODEL, CLS_MODEL, REC_MODEL]
+DET_PADDING = 50            # 与 RapidOcrOnnx 默认 padding 一致，改善贴边文字的检测
+
+# 识别流程：full 为检测 + 方向分类 + 识别；no-cls 跳过方向分类；rec-only 把整张图当作一行直接识别。
+# RapidOcrOnnx.exe 没有只识别模式，rec-only 在 exe 后端按 no-cls 执行
+PIPELINE_PROFILES = ("full", "no-cls", "rec-only")
+
+
+class OCREngineError(RuntimeError):
+    pass
+
+
+class OCRCancelledError(OCREngineError):
+    pass
+
+
+def build_engine_cmd(image_path, num_thread=4, profile="full"):
+    engine_path = get_engine_path()
+    models_dir = get_models_dir()
+
+    if not os.path.exists(engine_path):
+        raise FileNotFoundError(f"OCR 引擎未找到: {engine_path}")
+    if not os.path.isdir(models_dir):
+        raise FileNotFoundError(f"模型目录缺失: {models_dir}")
+
+    return [
+        engine_path,
+        "--models", models_dir,
+        "--det", DET_MODEL,
+        "--cls", CLS_MODEL,
+        "--rec", REC_MODEL,
+        "--keys", KEYS_FILE,
+        "--image", image_path,
+        "--padding", str(DET_PADDING),
+        "--numThread", str(num_thread),
+        "--GPU", "-1"
+    ] + (["--doAngle", "0"] if profile != "full" else [])
+
+
+def run_engine_once(image_path, timeout=OCR_TIMEOUT, num_thread=4, on_line=None, cancel_event=None, profile="full"):
+    # 边读边解析引擎输出，每识别出一行就回调 on_line；超时或取消时由看门狗线程直接结束引擎进程
+    cmd = build_engine_cmd(image_path, num_thread, profile)
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    )
+    finished = threading.Event()
+    timed_out = threading.Event()
+    deadline = time.monotonic() + timeout
+
+    def watchdog():
+        while not finished.wait(0.05):
+            if cancel_event is not None and cancel_event.is_set():
+                proc.kill()
+                return
+            if time.monotonic() > deadline:
+                timed_out.set()
+                proc.kill()
+                return
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+    parser = OCROutputParser()
+    try:
+        for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+            for line in parser.feed(chunk):
+                if on_line is not None:
+                    on_line(line)
+        for line in parser.close():
+            if on_line is not None:
+                on_line(line)
+        proc.wait()
+        stderr_reader.join()
+    finally:
+        finished.set()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise OCRCancelledError("识别已取消")
+    if timed_out.is_set():
+        raise OCREngineError(f"OCR 引擎超时（超过 {timeout} 秒）")
+    result = parser.result
+    result.errors = decode_engine_text(b"".join(stderr_chunks)).strip()
+    if proc.returncode != 0 and not result.lines and not result.text_lines:
+        raise OCREngineError(result.errors or f"OCR 引擎异常退出（返回码 {proc.returncode}）")
+    return result
+
+
+class ExeBackend:
+    name = "exe"
+    skips_detection = False  # rec-only 仍要跑检测
+
+    def __init__(self, num_thread=4):
+        self.num_thread = num_thread
+
+    def recognize(self, image, timeout=OCR_TIMEOUT, on_line=None, cancel_event=None, num_thread=None, profile="full"):
+        # num_thread 为本次分配的推理线程数，未指定时用创建时的默认值
+        num_thread = num_thread or self.num_thread
+        if profile == "rec-only":
+            profile = "no-cls"
+        if isinstance(image, str):
+            return run_engine_once(image, timeout, num_thread, on_line, cancel_event, profile)
+        # 引擎只接受文件路径：写成不压缩的 BMP，省去 PNG 压缩和解码
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        with tempfile.NamedTemporaryFile(suffix=".bmp", delete=False) as tmp:
+            temp_path = tmp.name
+        try:
+            image.save(temp_path, "BMP")
+            return run_engine_once(temp_path, timeout, num_thread, on_line, cancel_event, profile)
+        finally:
+            os.unlink(temp_path)
+
+
+# ========== ONNX Runtime 后端 ==========
+# 直接加载 rapidocr/models 下的 PP-OCR 模型，det/cls/rec 三个会话常驻复用，
+# 前后处理全部用 NumPy 向量化实现，直接产出结构化的 OCRResult
+DET_LIMIT_SIDE = 960      # 检测输入最长边
+DET_THRESH = 0.3
+DET_BOX_THRESH = 0.5
+DET_UNCLIP_RATIO = 1.6
+DET_MIN_SIZE = 3
+CLS_THRESH = 0.9
+CLS_SHAPE = (48, 192)
+REC_HEIGHT = 48
+REC_BATCH = 6
+REC_MIN_SCORE = 0.5
+ONNX_SESSION_SETS = 2     # 每个宿主最多常驻几组 det/cls/rec 会话（单行截图和整屏截图各一组）
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _label_runs(mask):
+    # 按行提取连续前景段，再把上下相邻（8 邻域）的段合并为连通域
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    if len(rows) == 0:
+        return rows, starts, ends, rows
+    row_index = np.searchsorted(rows, np.arange(h + 1))
+
+    src, dst = [], []
+    for y in range(1, h):
+        a0, a1 = row_index[y - 1], row_index[y]
+        b0, b1 = row_index[y], row_index[y + 1]
+        if a0 == a1 or b0 == b1:
+            continue
+        touch = (starts[a0:a1, None] <= ends[None, b0:b1]) & (starts[None, b0:b1] <= ends[a0:a1, None])
+        ai, bi = np.nonzero(touch)
+        src.append(ai + a0)
+        dst.append(bi + b0)
+
+    labels = np.arange(len(rows))
+    if src:
+        src = np.concatenate(src)
+        dst = np.concatenate(dst)
+        while True:
+            low = np.minimum(labels[src], labels[dst])
+            updated = labels.copy()
+            np.minimum.at(updated, src, low)
+            np.minimum.at(updated, dst, low)
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+    return rows, starts, ends, np.unique(labels, return_inverse=True)[1]
+
+
+def db_boxes(prob):
+    # DB 后处理：二值化 -> 连通域 -> 打分过滤 -> 按 unclip 比例外扩，返回 (N, 4) 的 x0, y0, x1, y1
+    rows, starts, ends, comp = _label_runs(prob > DET_THRESH)
+    if len(rows) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    n = comp.max() + 1
+    x0 = np.full(n, prob.shape[1]); np.minimum.at(x0, comp, starts)
+    x1 = np.zeros(n, dtype=np.int64); np.maximum.at(x1, comp, ends)
+    y0 = np.full(n, prob.shape[0]); np.minimum.at(y0, comp, rows)
+    y1 = np.zeros(n, dtype=np.int64); np.maximum.at(y1, comp, rows + 1)
+
+    cum = np.zeros((prob.shape[0], prob.shape[1] + 1), dtype=np.float64)
+    np.cumsum(prob, axis=1, out=cum[:, 1:])
+    area = np.zeros(n); np.add.at(area, comp, ends - starts)
+    total = np.zeros(n); np.add.at(total, comp, cum[rows, ends] - cum[rows, starts])
+    scores = total / area
+
+    w = (x1 - x0).astype(np.float64)
+    h = (y1 - y0).astype(np.float64)
+    keep = (np.minimum(w, h) >= DET_MIN_SIZE) & (scores >= DET_BOX_THRESH)
+    d = (w * h * DET_UNCLIP_RATIO / (2 * (w + h)))[keep]
+    boxes = np.stack([x0[keep] - d, y0[keep] - d, x1[keep] + d, y1[keep] + d], axis=1)
+    return boxes.astype(np.float32), scores[keep].astype(np.float32)
+
+
+def sort_boxes(boxes):
+    # 从上到下、从左到右排序；同一行内（纵向相差不足 10 像素）按横坐标排
+    order = list(np.lexsort((boxes[:, 0], boxes[:, 1])))
+    for i in range(len(order) - 1):
+        for j in range(i, -1, -1):
+            a, b = boxes[order[j]], boxes[order[j + 1]]
+            if abs(b[1] - a[1]) < 10 and b[0] < a[0]:
+                order[j], order[j + 1] = order[j + 1], order[j]
+            else:
+                break
+    return np.array(order, dtype=np.int64)
+
+
+def _resize_norm(crop, height, width):
+    # 等比缩放到指定高度，右侧补零到统一宽度，归一化到 [-1, 1]（BGR 排列，与训练一致）
+    h, w = crop.shape[:2]
+    new_w = max(1, min(width, int(np.ceil(height * w / h))))
+    resized = np.asarray(Image.fromarray(crop).resize((new_w, height), Image.Resampling.BILINEAR), dtype=np.float32)
+    out = np.zeros((3, height, width), dtype=np.float32)
+    out[:, :, :new_w] = (resized[:, :, ::-1].transpose(2, 0, 1) / 255.0 - 0.5) / 0.5
+    return out
+
+
+class OnnxBackend:
+    name = "onnx"
+    skips_detection = True   # rec-only 不跑检测和方向分类
+
+    def __init__(self, num_thread=4, models_dir=None):
+        load_numpy()
+        self.models_dir = models_dir or get_models_dir()
+        self.num_thread = num_thread
+        self._sessions = {}
+        self.use_threads(num_thread)
+        with open(os.path.join(self.models_dir, KEYS_FILE), encoding="utf-8") as f:
+            keys = [line.rstrip("\r\n") for line in f]
+        # CTC: 0 号为 blank，末尾追加空格
+        self.charset = np.array([""] + keys + [" "], dtype=object)
+
+    def use_threads(self, num_thread):
+        # 会话的推理线程数创建后不能修改：按 2 的幂分档，各档会话首次用到时创建并缓存。
+        # 每组会话都是一份完整的模型内存，已有 ONNX_SESSION_SETS 组时改用线程数最接近的一组，
+        # 不在用户请求中途再加载模型
+        import onnxruntime as ort
+
+        bucket = 1 << (max(1, num_thread).bit_length() - 1)
+        if bucket not in self._sessions and len(self._sessions) >= ONNX_SESSION_SETS:
+            bucket = min(self._sessions, key=lambda b: (abs(b - bucket), -b))
+        if bucket not in self._sessions:
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = bucket
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._sessions[bucket] = tuple(
+                ort.InferenceSession(
+                    os.path.join(self.models_dir, model), sess_options=options, providers=["CPUExecutionProvider"]
+                )
+                for model in (DET_MODEL, CLS_MODEL, REC_MODEL)
+            )
+        self.det, self.cls, self.rec = self._sessions[bucket]
+
+    def recognize(self, image, timeout=OCR_TIMEOUT, on_line=None, cancel_event=None, num_thread=None, profile="full"):
+        if num_thread:
+            self.use_threads(num_thread)
+        if isinstance(image, str):
+            with Image.open(image) as img:
+                image = img.convert("RGB")
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+        return self.run(image, on_line, cancel_event, profile)
+
+    def run(self, rgb, on_line=None, cancel_event=None, profile="full"):
+        # 单次推理无法中断，取消请求在各阶段之间生效
+        def check_cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                raise OCRCancelledError("识别已取消")
+
+        timings = {}
+        start = time.perf_counter()
+        if profile == "rec-only":
+            # 整张图就是一行文字：不做检测和方向分类，框即整张图
+            h, w = rgb.shape[:2]
+            boxes = np.array([[0, 0, w, h]], dtype=np.float32)
+            crops = [np.ascontiguousarray(rgb)]
+        else:
+            boxes, _ = self.detect(rgb)
+            timings["dbNetTime"] = (time.perf_counter() - start) * 1000
+            check_cancelled()
+
+            crops = []
+            for x0, y0, x1, y1 in boxes.astype(np.int64):
+                crop = rgb[y0:y1, x0:x1]
+                if crop.shape[0] >= crop.shape[1] * 1.5:
+                    crop = np.rot90(crop)   # 竖排文字转为横排识别
+                crops.append(np.ascontiguousarray(crop))
+            if profile == "full":
+                angle_start = time.perf_counter()
+                crops = self.classify(crops)
+                timings["angleTime"] = (time.perf_counter() - angle_start) * 1000
+                check_cancelled()
+
+        def make_line(k, texts, scores):
+            # 框内两侧的留白会被解码成空格，去掉
+            text = texts[k].strip()
+            if text and scores[k] >= REC_MIN_SCORE:
+                return OCRLine.from_box(text, [int(v) for v in boxes[k]], scores[k])
+            return None
+
+        def emit_batch(indices, texts, scores):
+            check_cancelled()
+            for k in indices:
+                line = make_line(k, texts, scores)
+                if line is not None:
+                    on_line(line)
+
+        texts, scores, times = self.recognize_lines(crops, emit_batch if on_line else None)
+        timings["crnnTime"] = sum(times)
+        lines = [make_line(k, texts, scores) for k in range(len(crops))]
+        lines = [line for line in lines if line is not None]
+        timings["FullDetectTime"] = (time.perf_counter() - start) * 1000
+        return OCRResult(lines, timings)
+
+    def detect(self, rgb):
+        h, w = rgb.shape[:2]
+        padded = np.full((h + 2 * DET_PADDING, w + 2 * DET_PADDING, 3), 255, dtype=np.uint8)
+        padded[DET_PADDING:DET_PADDING + h, DET_PADDING:DET_PADDING + w] = rgb
+        ph, pw = padded.shape[:2]
+        ratio = min(1.0, DET_LIMIT_SIDE / max(ph, pw))
+        rh = max(32, int(round(ph * ratio / 32)) * 32)
+        rw = max(32, int(round(pw * ratio / 32)) * 32)
+        resized = np.asarray(Image.fromarray(padded).resize((rw, rh), Image.Resampling.BILINEAR), dtype=np.float32)
+        mean = np.array([0.406, 0.456, 0.485], dtype=np.float32)
+        std = np.array([0.225, 0.224, 0.229], dtype=np.float32)
+        x = ((resized[:, :, ::-1] / 255.0 - mean) / std).transpose(2, 0, 1)[None]
+        prob = self.det.run(None, {self.det.get_inputs()[0].name: x})[0][0, 0]
+
+        boxes, scores = db_boxes(prob)
+        if len(boxes) == 0:
+            return boxes, scores
+        boxes[:, [0, 2]] = boxes[:, [0, 2]] * (pw / rw) - DET_PADDING
+        boxes[:, [1, 3]] = boxes[:, [1, 3]] * (ph / rh) - DET_PADDING
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+        valid = ((boxes[:, 2] - boxes[:, 0]) >= 1) & ((boxes[:, 3] - boxes[:, 1]) >= 1)
+        boxes, scores = boxes[valid], scores[valid]
+        order = sort_boxes(boxes)
+        return boxes[order], scores[order]
+
+    def classify(self, crops):
+        # 方向分类：判定为 180 度且置信度足够时翻转
+        if not crops:
+            return crops
+        name = self.cls.get_inputs()[0].name
+        for i in range(0, len(crops), REC_BATCH):
+            batch = np.stack([_resize_norm(c, *CLS_SHAPE) for c in crops[i:i + REC_BATCH]])
+            probs = self.cls.run(None, {name: batch})[0]
+            flip = (probs.argmax(axis=1) == 1) & (probs.max(axis=1) > CLS_THRESH)
+            for j in np.nonzero(flip)[0]:
+                crops[i + j] = np.ascontiguousarray(np.rot90(crops[i + j], 2))
+        return crops
+
+    def recognize_lines(self, crops, on_batch=None):
+        # 默认按宽高比排序组批，减少补零；需要逐批回传结果时按阅读顺序组批，先出的就是靠前的行
+        texts = [""] * len(crops)
+        scores = [0.0] * len(crops)
+        times = [0.0] * len(crops)
+        if not crops:
+            return texts, scores, times
+        name = self.rec.get_inputs()[0].name
+        ratios = np.array([c.shape[1] / c.shape[0] for c in crops])
+        order = np.argsort(ratios) if on_batch is None else np.arange(len(crops))
+        for i in range(0, len(order), REC_BATCH):
+            idx = order[i:i + REC_BATCH]
+            start = time.perf_counter()
+            width = int(REC_HEIGHT * max(320 / REC_HEIGHT, ratios[idx].max()))
+            batch = np.stack([_resize_norm(crops[k], REC_HEIGHT, width) for k in idx])
+            preds = self.rec.run(None, {name: batch})[0]
+            cost = (time.perf_counter() - start) * 1000 / len(idx)
+            for k, text, score in zip(idx, *self.ctc_decode(preds)):
+                texts[k], scores[k], times[k] = text, score, cost
+            if on_batch is not None:
+                on_batch(idx, texts, scores)
+        return texts, scores, times
+
+    def ctc_decode(self, preds):
+        # 贪心解码：去掉 blank 和连续重复字符
+        index = preds.argmax(axis=2)
+        prob = preds.max(axis=2)
+        keep = index != 0
+        keep[:, 1:] &= index[:, 1:] != index[:, :-1]
+        texts, scores = [], []
+        for row_index, row_prob, row_keep in zip(index, prob, keep):
+            texts.append("".join(self.charset[row_index[row_keep]]))
+            scores.append(float(row_prob[row_keep].mean()) if row_keep.any() else 0.0)
+        return texts, scores
+
+
+# ========== 后端选择 ==========
+BACKENDS = {"onnx": OnnxBackend, "exe": ExeBackend}
+
+
+def backend_missing_files(name):
+    models_dir = get_models_dir()
+    missing = []
+    if name == "exe":
+        engine_path = get_engine_path()
+        if not os.path.exists(engine_path):
+            missing.append(engine_path)
+    elif importlib.util.find_spec("numpy") is None or importlib.util.find_spec("onnxruntime") is None:
+        missing.append("Python 依赖: numpy, onnxruntime")
+    for m in REQUIRED_MODELS:
+        if not os.path.exists(os.path.join(models_dir, m)):
+            missing.append(os.path.join(models_dir, m))
+    return missing
+
+
+def select_backend():
+    # 可用 OCR_BACKEND 环境变量强制指定；否则优先常驻内存的 ONNX 后端，其次 RapidOcrOnnx.exe
+    forced = os.environ.get("OCR_BACKEND")
+    if forced in BACKENDS:
+        return forced
+    for name in BACKENDS:
+        if not backend_missing_files(name):
+            return name
+    return "exe" if sys.platform == "win32" else "onnx"
+
+
+def create_backend(name=None, num_thread=4):
+    return BACKENDS[name or select_backend()](num_thread=num_thread)
+
+
+# ========== 常驻 OCR 引擎宿主 ==========
+# 子进程常驻运行，启动时加载一次后端（模型常驻内存），通过管道逐个接收请求；
+# 主进程负责健康检查、超时处理和崩溃重启
+def _serve_request(conn, backend, init_error, image, timeout, num_thread, profile):
+    # 识别放到线程里执行，主线程负责转发逐行结果并监听取消请求；管道只由主线程读写
+    events = queue.Queue()
+    cancel_event = threading.Event()
+
+    def work():
+        try:
+            if backend is None:
+                raise OCREngineError(init_error)
+            result = backend.recognize(
+                image, timeout, lambda line: events.put(("line", list(line))), cancel_event, num_thread, profile
+            )
+            events.put(("ok", result.to_dict()))
+        except OCRCancelledError as e:
+            events.put(("cancelled", str(e)))
+        except Exception as e:
+            events.put(("error", str(e)))
+
+    threading.Thread(target=work, daemon=True).start()
+    while True:
+        try:
+            event = events.get(timeout=0.05)
+        except queue.Empty:
+            if conn.poll() and conn.recv()[0] == "cancel":
+                cancel_event.set()
+            continue
+        conn.send(event)
+        if event[0] != "line":
+            return
+
+
+def _engine_host_main(conn, backend_name, num_thread):
+    # Ctrl+C 由主进程处理并负责停止宿主，子进程忽略以免打印中断堆栈
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # 初始会话按典型整屏截图会分到的线程数创建，核数少的机器上首次识别不必再建一组会话
+        backend = create_backend(backend_name, num_thread or min(DEFAULT_ENGINE_THREADS, os.cpu_count() or 1))
+        init_error = None
+    except Exception as e:
+        backend = None
+        init_error = f"OCR 引擎初始化失败: {e}"
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        op = msg[0]
+        if op == "ping":
+            conn.send(("pong", os.getpid()))
+        elif op in ("ocr", "ocr_raw"):
+            image = msg[1]
+            if op == "ocr_raw":
+                # 像素紧随请求头以原始字节发送，直接包装成数组，无需解码
+                buf = conn.recv_bytes()
+                w, h = image
+                if np is not None:
+                    image = np.frombuffer(buf, dtype=np.uint8).reshape(h, w, 3)
+                else:
+                    image = Image.frombuffer("RGB", (w, h), buf, "raw", "RGB", 0, 1)
+            # 识别过程中逐行回传，最后再发送完整结果
+            _serve_request(conn, backend, init_error, image, msg[2], msg[3], msg[4])
+        elif op == "quit":
+            break
+        # 请求结束后才到达的 cancel 直接忽略
+
+
+class OCREngineHost:
+    def __init__(self, backend_name=None, timeout=OCR_TIMEOUT, num_thread=None):
+        self.backend_name = backend_name or select_backend()
+        self.timeout = timeout
+        self.num_thread = num_thread
+        self.restart_count = 0
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self._ready = False
+        self._stopped = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        with self._lock:
+            if not self._is_alive():
+                self._spawn()
+        if self._monitor is None:
+            self._stopped.clear()
+            self._monitor = threading.Thread(target=self._health_loop, daemon=True)
+            self._monitor.start()
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(("quit",))
+                except (OSError, ValueError):
+                    pass
+            self._kill()
+        self._monitor = None
+
+    def is_alive(self):
+        with self._lock:
+            return self._is_alive()
+
+    def ping(self, timeout=ENGINE_PING_TIMEOUT):
+        with self._lock:
+            return self._ping(timeout)
+
+    def recognize(self, image, timeout=None, on_line=None, cancel_event=None, num_thread=None, profile="full"):
+        timeout = timeout or self.timeout
+        with self._lock:
+            if not self._is_alive():
+                self._restart()
+            try:
+                if not self._wait_ready(self.timeout):
+                    self._restart()
+                    raise OCREngineError("OCR 引擎加载超时，已自动重启")
+                with METRICS.stage("engine.send"):
+                    self._send_image(image, timeout, num_thread, profile)
+                # 子进程内部会先按 timeout 结束引擎，这里多留余量，仍无响应说明宿主已卡死
+                deadline = time.monotonic() + timeout + ENGINE_PING_TIMEOUT
+                cancel_deadline = None
+                while True:
+                    now = time.monotonic()
+                    if cancel_deadline is None and cancel_event is not None and cancel_event.is_set():
+                        # 先请求子进程自行中止（保留已加载的模型），超过宽限时间再强制重启
+                        self._conn.send(("cancel",))
+                        cancel_deadline = now + ENGINE_CANCEL_GRACE
+                    if cancel_deadline is not None and now > cancel_deadline:
+                        self._restart()
+                        raise OCRCancelledError("识别已取消，OCR 引擎已重启")
+                    if now > deadline:
+                        self._restart()
+                        raise OCREngineError(f"OCR 引擎无响应（超过 {timeout} 秒），已自动重启")
+                    if not self._conn.poll(min(deadline - now, 0.05)):
+                        continue
+                    status, payload = self._conn.recv()
+                    if status != "line":
+                        break
+                    if on_line is not None:
+                        on_line(OCRLine(*payload))
+            except (EOFError, OSError):
+                self._restart()
+                raise OCREngineError("OCR 引擎进程异常退出，已自动重启")
+        if status == "cancelled":
+            raise OCRCancelledError(payload)
+        if status == "error":
+            raise OCREngineError(payload)
+        return OCRResult.from_dict(payload)
+
+    def _send_image(self, image, timeout, num_thread=None, profile="full"):
+        # 路径仅作为兜底；图片对象按原始 RGB 像素经管道发送
+        if isinstance(image, str):
+            self._conn.send(("ocr", image, timeout, num_thread, profile))
+            return
+        if isinstance(image, Image.Image):
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            size, data = image.size, image.tobytes()
+        else:
+            image = load_numpy().ascontiguousarray(image, dtype=np.uint8)
+            size, data = (image.shape[1], image.shape[0]), image
+        self._conn.send(("ocr_raw", size, timeout, num_thread, profile))
+        self._conn.send_bytes(data)
+        METRICS.record_bytes("engine.send", size[0] * size[1] * 3)
+
+    def _spawn(self):
+        import multiprocessing
+
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_engine_host_main, args=(child_conn, self.backend_name, self.num_thread), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._ready = False
+        self._spawned_at = time.perf_counter()
+
+    def _wait_ready(self, timeout):
+        # 子进程加载完模型后先发送 ready，之前的请求都会排队等待
+        if not self._ready and self._conn.poll(timeout):
+            self._ready = self._conn.recv()[0] == "ready"
+            METRICS.record_since("engine.load", self._spawned_at)
+        return self._ready
+
+    def _kill(self):
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(1)
+                if self._process.is_alive():
+                    self._process.kill()
+                    self._process.join(1)
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _restart(self):
+        self._kill()
+        self._spawn()
+        self.restart_count += 1
+
+    def _is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _ping(self, timeout):
+        if not self._is_alive():
+            return False
+        try:
+            if not self._wait_ready(0):
+                return True  # 仍在加载模型
+            self._conn.send(("ping",))
+            if self._conn.poll(timeout):
+                return self._conn.recv()[0] == "pong"
+        except (EOFError, OSError):
+            pass
+        return False
+
+    def _health_loop(self):
+        while not self._stopped.wait(ENGINE_HEALTH_INTERVAL):
+            # 正在识别时跳过，避免阻塞请求
+            if not self._lock.acquire(blocking=False):
+                continue
+            try:
+                if not self._stopped.is_set() and not self._ping(ENGINE_PING_TIMEOUT):
+                    self._restart()
+            finally:
+                self._lock.release()
+
+
+# CPU 预算：每次识别按图片像素数和当前并发识别数动态分配推理线程：单个任务可用满所有核，
+# 后来的任务只分到剩余的空闲核（不超过均分份额，至少 1 个），已分配的线程总数除每任务 1 线程的下限外不超过核数；
+# 也可固定线程数
+DEFAULT_ENGINE_THREADS = 4              # 自动模式下估算引擎实例数所用的每实例线程数
+PIXELS_PER_THREAD = 1280 * 720 // 4     # 约每 23 万像素一个线程，1280x720 对应 4 线程
+
+
+def image_pixels(image):
+    if isinstance(image, str):
+        with Image.open(image) as img:
+            return img.width * img.height
+    if isinstance(image, Image.Image):
+        return image.width * image.height
+    return image.shape[0] * image.shape[1]
+
+
+class CPUBudget:
+    def __init__(self, cores=None, fixed=None, max_threads=None):
+        self.cores = cores or os.cpu_count() or 1
+        self.fixed = fixed              # 指定后每次都用该线程数，不再自适应
+        self.max_threads = max_threads  # 自动模式下单次识别的线程上限
+        self.active = 0
+        self.allocated = 0
+        self._lock = threading.Lock()
+
+    def plan(self, pixels):
+        if self.fixed:
+            return self.fixed
+        want = max(1, -(-pixels // PIXELS_PER_THREAD))
+        # 只从空闲核里分配（至少 1 个线程）；已有任务在跑时再以均分份额为上限，不超过图片大小所需
+        limit = max(1, self.cores - self.allocated)
+        if self.active:
+            limit = min(limit, max(1, self.cores // (self.active + 1)))
+        return max(1, min(want, limit, self.max_threads or self.cores))
+
+    def acquire(self, pixels):
+        with self._lock:
+            threads = self.plan(pixels)
+            self.active += 1
+            self.allocated += threads
+        METRICS.record("engine.threads", threads)
+        return threads
+
+    def release(self, threads):
+        with self._lock:
+            self.active -= 1
+            self.allocated -= threads
+
+    def describe(self):
+        if self.fixed:
+            return f"{self.fixed} 线程"
+        return f"自动分配线程（{self.cores} 核）"
+
+
+def plan_engine_threads(workers, num_thread):
+    # 引擎实例数 x 每实例线程数不超过 CPU 核数，避免超订；
+    # num_thread 为 None 时实例数按默认线程数估算，每次识别的线程数由 CPUBudget 动态分配
+    cores = os.cpu_count() or 1
+    if num_thread is None:
+        if workers is None:
+            workers = max(1, cores // DEFAULT_ENGINE_THREADS)
+        return workers, None
+    num_thread = max(1, min(num_thread, cores))
+    if workers is None:
+        workers = max(1, cores // num_thread)
+    if workers * num_thread > cores:
+        num_thread = max(1, cores // workers)
+    return workers, num_thread
+
+
+class OCREnginePool:
+    # 多个引擎宿主组成的池，接口与单个宿主一致，空闲宿主按先到先得分配
+    def __init__(self, size, backend_name=None, timeout=OCR_TIMEOUT, num_thread=None, max_threads=None):
+        self.backend_name = backend_name or select_backend()
+        self.budget = CPUBudget(fixed=num_thread, max_threads=max_threads)
+        self.hosts = [OCREngineHost(self.backend_name, timeout, num_thread) for _ in range(max(1, size))]
+        self._idle = queue.Queue()
+        for host in self.hosts:
+            self._idle.put(host)
+
+    def start(self):
+        for host in self.hosts:
+            host.start()
+
+    def stop(self):
+        for host in self.hosts:
+            host.stop()
+
+    def recognize(self, image, timeout=None, on_line=None, cancel_event=None, profile="full"):
+        while True:
+            try:
+                host = self._idle.get(timeout=0.05)
+                break
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OCRCancelledError("识别已取消")
+        threads = self.budget.acquire(image_pixels(image))
+        try:
+            return host.recognize(image, timeout, on_line, cancel_event, threads, profile)
+        finally:
+            self.budget.release(threads)
+            self._idle.put(host)
+
+    def prewarm(self, stop_event=None):
+        # 用合成的文字图按典型尺寸在每个宿主上各识别一次：推理会话、首轮推理的内存分配和
+        # 模型文件的磁盘缓存都在用户第一次截图前就绪。宿主按空闲队列轮流取用，
+        # 真实任务到来时最多等一次预热识别。返回耗时（秒）
+        start = time.perf_counter()
+        for size in PREWARM_SIZES:
+            image = make_prewarm_image(size)
+            for _ in self.hosts:
+                if stop_event is not None and stop_event.is_set():
+                    return time.perf_counter() - start
+                self.recognize(image, profile="full")
+        return time.perf_counter() - start
+
+
+# 预热用的图片尺寸：单行小截图和整屏截图，二者分到的线程数（即推理会话）通常不同
+PREWARM_SIZES = [(480, 48), (1280, 720)]
+PREWARM_DELAY_MS = 500  # 主窗口显示后多久开始预热
+
+
+def make_prewarm_image(size):
+    from PIL import ImageDraw, ImageFont
+
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for i, y in enumerate(range(8, size[1] - 32, 48)):
+        draw.text((16, y), f"OCR warm up line {i}", fill="black", font=font)
+    return image
+
+
+# ========== 识别结果缓存 ==========
+# 以预处理后像素的哈希 + 引擎/模型设置为键；内存 LRU 一级，磁盘按总大小淘汰的二级
+CACHE_MEMORY_ENTRIES = 256
+CACHE_DISK_BYTES = 64 * 1024 * 1024
+CACHE_FORMAT = 2  # 缓存内容格式变化时递增，旧条目自然失效
+
+
+def get_cache_dir():
+    if sys.platform == "win32" and os.environ.get("LOCALAPPDATA"):
+        base = os.environ["LOCALAPPDATA"]
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "screenshot_ocr", "results")
+
+
+class OCRResultCache:
+    def __init__(self, cache_dir=None, max_entries=CACHE_MEMORY_ENTRIES, max_disk_bytes=CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir if cache_dir is not None else get_cache_dir()
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # 首次写入时统计
+
+    def make_key(self, image, settings):
+        h = hashlib.blake2b(repr(settings).encode("utf-8"), digest_size=20)
+        if isinstance(image, str):
+            with open(image, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        elif isinstance(image, Image.Image):
+            h.update(f"{image.mode}{image.size}".encode("ascii"))
+            h.update(image.tobytes())
+        else:
+            h.update(repr(image.shape).encode("ascii"))
+            h.update(load_numpy().ascontiguousarray(image).data)
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        if self.cache_dir:
+            try:
+                self._store(key, value)
+            except OSError:
+                pass  # 磁盘缓存失败不影响识别
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # 刷新访问时间，淘汰时按最久未用
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._trim_disk()
+
+    def _scan_disk(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _trim_disk(self):
+        # 一次清理到预算的 80%，避免每次写入都扫描目录
+        entries = sorted(self._scan_disk(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.8
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+# ========== 识别历史 ==========
+# 每次识别的文字、时间、来源和小缩略图存入本地 SQLite；FTS5 trigram 索引支持中英文任意子串搜索。
+# 界面线程只负责入队，后台线程攒批后一个事务写入
+HISTORY_THUMB_SIDE = 160     # 历史记录中缩略图的最长边
+HISTORY_BATCH = 64           # 一个事务最多写入的条数
+HISTORY_FLUSH_DELAY = 0.5    # 收到第一条后最多再等这么久（秒）凑批
+HISTORY_SEARCH_LIMIT = 50
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    source TEXT NOT NULL,
+    text TEXT NOT NULL,
+    thumbnail BLOB
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    text, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts(history_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def get_history_path():
+    # 可用 OCR_HISTORY_DB 环境变量指定数据库文件
+    path = os.environ.get("OCR_HISTORY_DB")
+    if path:
+        return path
+    if sys.platform == "win32" and os.environ.get("LOCALAPPDATA"):
+        base = os.environ["LOCALAPPDATA"]
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "screenshot_ocr", "history.db")
+
+
+class OCRHistory:
+    def __init__(self, path=None):
+        self.path = path or get_history_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 查询用的连接属于创建它的（界面）线程；WAL 模式下读不会被后台写入阻塞
+        self._conn = self._connect()
+        self._conn.executescript(HISTORY_SCHEMA)
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def add(self, text, source, thumbnail=None):
+        # 只入队，缩略图编码和写库都在后台线程
+        self._pending.put((time.time(), source, text, thumbnail))
+
+    def search(self, query, limit=HISTORY_SEARCH_LIMIT):
+        # 返回 (id, 时间, 来源, 文字, 缩略图 JPEG) 列表，最新的在前；空查询返回最近的记录。
+        # 3 个字符及以上的词走全文索引，更短的词（如两个汉字）用 LIKE 在候选结果上过滤
+        terms = query.split()
+        long_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) < 3]
+        # 有全文检索词时从索引按 rowid 倒序取，LIMIT 生效后即停止，不必对全部命中排序
+        where, params = [], []
+        if long_terms:
+            sql = "SELECT h.id, h.created, h.source, h.text, h.thumbnail FROM history_fts f JOIN history h ON h.id = f.rowid"
+            order = "f.rowid"
+            where.append("history_fts MATCH ?")
+            params.append(" ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        else:
+            sql = "SELECT h.id, h.created, h.source, h.text, h.thumbnail FROM history h"
+            order = "h.id"
+        for term in short_terms:
+            where.append("h.text LIKE ? ESCAPE '\\'")
+            params.append("%" + re.sub(r"([%_\\])", r"\\\1", term) + "%")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit)
+        with METRICS.stage("history.search"):
+            return self._conn.execute(sql, params).fetchall()
+
+    def count(self):
+        return self._conn.execute("SELECT count(*) FROM history").fetchone()[0]
+
+    def close(self, timeout=5):
+        # 写完队列中剩余的记录再退出
+        self._pending.put(None)
+        self._writer.join(timeout)
+        self._conn.close()
+
+    def _connect(self):
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_loop(self):
+        import sqlite3
+
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._pending.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + HISTORY_FLUSH_DELAY
+            while len(batch) < HISTORY_BATCH:
+                try:
+                    item = self._pending.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            rows = [(created, source, text, self._encode_thumbnail(thumb)) for created, source, text, thumb in batch]
+            try:
+                with METRICS.stage("history.write"), conn:
+                    conn.executemany(
+                        "INSERT INTO history (created, source, text, thumbnail) VALUES (?, ?, ?, ?)", rows
+                    )
+            except sqlite3.Error as e:
+                print(f"写入识别历史失败：{e}", file=sys.stderr)
+        conn.close()
+
+    @staticmethod
+    def _encode_thumbnail(image):
+        if image is None:
+            return None
+        image = make_thumbnail(image, (HISTORY_THUMB_SIDE, HISTORY_THUMB_SIDE))
+        buf = io.BytesIO()
+        image.convert("RGB").save(buf, "JPEG", quality=80)
+        return buf.getvalue()
+
+
+# ========== 图像预处理 ==========
+# 送入引擎前按任务选择的预处理流程处理图片，全部在 NumPy 数组上向量化完成（需要 numpy）：
+# 对比度归一化（深色背景反色为浅底深字）、按估计的字高缩放、纠偏、自适应二值化。
+# 字大的截图缩小后检测更快，字小的图片放大后更容易检出；识别结果的坐标映射回预处理前的图片
+PREPROCESS_PROFILE = "none"   # 未指定时使用的预处理流程，命令行 --preprocess 可修改
+PREPROCESS_PROFILES = {
+    "none": (),                                            # 保持原样
+    "scale": ("scale",),                                   # 只按字高缩放，保留彩色
+    "clean": ("normalize", "scale"),                       # 灰度 + 对比度归一化 + 缩放
+    "scan": ("normalize", "scale", "deskew", "binarize"),  # 扫描件、拍照文档
+}
+# 字高用字符连通域高度的中位数估计；在合适范围内不缩放，
+# 太小时检测模型容易漏检（放大到下限的两倍），太大时识别不会更准、只会让检测更慢（缩小到上限）
+TEXT_MIN_HEIGHT = 6
+TEXT_MAX_HEIGHT = 24
+TEXT_MIN_SCALE = 0.5
+TEXT_MAX_SCALE = 2.0
+TEXT_SCALE_TOLERANCE = 0.1   # 缩放比例与 1 相差不到该值时不缩放
+TEXT_MIN_COMPONENTS = 8      # 字符连通域少于该数量时不估计字高
+NORMALIZE_CLIP = 0.01        # 对比度拉伸时两端各舍弃的像素比例
+DESKEW_MAX_ANGLE = 8.0       # 纠偏搜索范围（度）
+DESKEW_COARSE_STEP = 1.0    # 先按粗步长找到大致角度，再在其附近按细步长细化
+DESKEW_STEP = 0.25
+DESKEW_MIN_ANGLE = 0.5       # 小于该角度不旋转，避免无谓的插值模糊
+DESKEW_SAMPLES = 50000       # 估计倾角时最多使用的笔画像素数
+BINARIZE_WINDOW = 2 * TEXT_MAX_HEIGHT + 1   # 自适应阈值的窗口边长，约为两个字高
+BINARIZE_K = 0.15            # 比窗口均值暗该比例以上的像素为笔画
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+
+def preprocess_available():
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def ink_mask(gray):
+    # 出现最多的灰度视为背景，与之相差明显的像素为笔画
+    background = int(np.bincount(gray.ravel(), minlength=256).argmax())
+    return np.abs(gray.astype(np.int16) - background) > LINE_INK_DELTA
+
+
+def estimate_text_height(gray):
+    # 字符连通域高度的中位数作为字高的粗略估计；去掉噪点以及表格线、图片之类的大块
+    mask = ink_mask(gray)
+    rows, starts, ends, comp = _label_runs(mask)
+    if len(rows) == 0:
+        return None
+    n = comp.max() + 1
+    x0 = np.full(n, mask.shape[1]); np.minimum.at(x0, comp, starts)
+    x1 = np.zeros(n, dtype=np.int64); np.maximum.at(x1, comp, ends)
+    y0 = np.full(n, mask.shape[0]); np.minimum.at(y0, comp, rows)
+    y1 = np.zeros(n, dtype=np.int64); np.maximum.at(y1, comp, rows + 1)
+    heights, widths = y1 - y0, x1 - x0
+    keep = (heights >= 3) & (heights <= mask.shape[0] // 2) & (widths <= heights * 4)
+    if np.count_nonzero(keep) < TEXT_MIN_COMPONENTS:
+        return None
+    return float(np.median(heights[keep]))
+
+
+def text_scale(gray):
+    height = estimate_text_height(gray)
+    if height is None or TEXT_MIN_HEIGHT <= height <= TEXT_MAX_HEIGHT:
+        return 1.0
+    target = TEXT_MIN_HEIGHT * 2 if height < TEXT_MIN_HEIGHT else TEXT_MAX_HEIGHT
+    scale = min(TEXT_MAX_SCALE, max(TEXT_MIN_SCALE, target / height))
+    if scale > 1:
+        # 检测模型的输入最长边不超过 DET_LIMIT_SIDE，放大超过它没有意义
+        scale = min(scale, max(1.0, DET_LIMIT_SIDE / max(gray.shape)))
+    return 1.0 if abs(scale - 1) < TEXT_SCALE_TOLERANCE else scale
+
+
+def normalize_contrast(gray):
+    # 按直方图拉伸到 0~255，两端各舍弃少量像素；背景偏暗时反色，统一为浅底深字
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    cdf = np.cumsum(histogram) / gray.size
+    low = int(np.searchsorted(cdf, NORMALIZE_CLIP))
+    high = int(np.searchsorted(cdf, 1 - NORMALIZE_CLIP))
+    lut = np.clip((np.arange(256) - low) * (255.0 / max(1, high - low)), 0, 255)
+    if histogram.argmax() < 128:
+        lut = 255 - lut
+    return lut.astype(np.uint8)[gray]
+
+
+def _best_projection(ys, xs, angles, height, width):
+    # 投影法：把笔画像素沿各候选角度投影到纵轴，文字行与投影方向一致时直方图最尖锐。
+    # 所有候选角度一次算完：每个角度的投影平移到各自的区间，合在一起做一次 bincount
+    slopes = np.tan(np.radians(angles))
+    margin = int(np.ceil(width * np.abs(slopes).max()))
+    span = height + 2 * margin + 1
+    bins = np.rint(ys[None, :] - xs[None, :] * slopes[:, None]).astype(np.int64) + margin
+    bins += np.arange(len(angles))[:, None] * span
+    counts = np.bincount(bins.ravel(), minlength=len(angles) * span).reshape(len(angles), span)
+    return float(angles[np.argmax((counts.astype(np.int64) ** 2).sum(axis=1))])
+
+
+def estimate_skew(gray):
+    ys, xs = np.nonzero(ink_mask(gray))
+    if len(ys) < TEXT_MIN_COMPONENTS * 16:
+        return 0.0
+    step = -(-len(ys) // DESKEW_SAMPLES)
+    ys, xs = ys[::step], xs[::step]
+    height, width = gray.shape
+    coarse = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_COARSE_STEP / 2, DESKEW_COARSE_STEP)
+    best = _best_projection(ys, xs, coarse, height, width)
+    fine = best + np.arange(-DESKEW_COARSE_STEP, DESKEW_COARSE_STEP + DESKEW_STEP / 2, DESKEW_STEP)
+    best = _best_projection(ys, xs, fine, height, width)
+    return best if abs(best) >= DESKEW_MIN_ANGLE else 0.0
+
+
+def rotate_image(image, angle, fill=255):
+    # 逆时针旋转 angle 度（画面扩展，空出部分填背景色），返回旋转后的图片和把新坐标映射回旧坐标的仿射矩阵
+    rotated = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+    cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    cx, cy = image.width / 2, image.height / 2
+    ncx, ncy = rotated.width / 2, rotated.height / 2
+    return rotated, (cos, -sin, cx - cos * ncx + sin * ncy, sin, cos, cy - sin * ncx - cos * ncy)
+
+
+def _window_sums(values, r):
+    # 纵向方框滤波：每行取前后 r 行（含自身，越界部分不计）之和，同时返回每行实际累加的行数
+    n = len(values)
+    cum = np.zeros((n + 1,) + values.shape[1:], dtype=np.int32)
+    np.cumsum(values, axis=0, dtype=np.int32, out=cum[1:])
+    lo, hi = np.clip(np.arange(n) - r, 0, n), np.clip(np.arange(n) + r + 1, 0, n)
+    return cum[hi] - cum[lo], hi - lo
+
+
+def binarize(gray, window=BINARIZE_WINDOW):
+    # 自适应阈值：窗口均值由纵、横两次方框滤波求出，比均值暗 BINARIZE_K 以上的像素为笔画（黑），其余为白
+    r = window // 2
+    sums, rows = _window_sums(gray, r)
+    sums, cols = _window_sums(sums.T, r)
+    area = rows[:, None] * cols[None, :]
+    return np.where(gray * area < sums.T * (1 - BINARIZE_K), 0, 255).astype(np.uint8)
+
+
+def compose_transforms(outer, inner):
+    # 仿射矩阵 (a, b, c, d, e, f)：x = a*x' + b*y' + c，y = d*x' + e*y' + f；先 inner 后 outer
+    a, b, c, d, e, f = outer
+    p, q, r, s, t, u = inner
+    return (a * p + b * s, a * q + b * t, a * r + b * u + c, d * p + e * s, d * q + e * t, d * r + e * u + f)
+
+
+def preprocess_image(image, profile=None):
+    # 返回 (处理后的图片, 把其坐标映射回原图的仿射矩阵)；不需要处理时原样返回，矩阵为 None
+    steps = PREPROCESS_PROFILES[profile or PREPROCESS_PROFILE]
+    if not steps or not isinstance(image, Image.Image):
+        return image, None
+    if not preprocess_available():
+        raise RuntimeError("图像预处理需要安装 numpy（pip install numpy）")
+    load_numpy()
+    with METRICS.stage("preprocess"):
+        gray = np.asarray(image.convert("L"))
+        transform = IDENTITY
+        if "normalize" in steps:
+            gray = normalize_contrast(gray)
+        if "scale" in steps:
+            scale = text_scale(gray)
+            if scale != 1.0:
+                w, h = image.size
+                size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                resample = Image.Resampling.LANCZOS if scale < 1 else Image.Resampling.BICUBIC
+                if "normalize" in steps:
+                    gray = np.asarray(Image.fromarray(gray).resize(size, resample))
+                else:
+                    # 只缩放时保留彩色，颜色相近的文字和背景转成灰度后可能难以区分
+                    image = image.resize(size, resample)
+                transform = (w / size[0], 0.0, 0.0, 0.0, h / size[1], 0.0)
+        # 纠偏和二值化都在归一化后的灰度图上进行
+        if "deskew" in steps:
+            angle = estimate_skew(gray)
+            if angle:
+                rotated, rotation = rotate_image(Image.fromarray(gray), angle)
+                gray = np.asarray(rotated)
+                transform = compose_transforms(transform, rotation)
+        if "binarize" in steps:
+            gray = binarize(gray)
+        if "normalize" in steps:
+            image = Image.fromarray(gray)
+    METRICS.record_bytes("preprocess", image.width * image.height)
+    return image, (None if transform == IDENTITY else transform)
+
+
+def deskew_image(image, profile=None):
+    # 分块识别前整图纠偏：倾角在缩小的灰度图上估计（与缩放无关），再旋转整张图。
+    # 分块里的文字都已水平，分块结果可以按水平的框合并；其余预处理仍在各分块上进行
+    if "deskew" not in PREPROCESS_PROFILES[profile or PREPROCESS_PROFILE] or not isinstance(image, Image.Image):
+        return image, None
+    load_numpy()
+    with METRICS.stage("preprocess"):
+        gray = image.convert("L")
+        factor = max(1, -(-max(gray.size) // BLANK_CHECK_SIDE))
+        small = np.asarray(gray.reduce(factor) if factor > 1 else gray)
+        angle = estimate_skew(normalize_contrast(small))
+        if not angle:
+            return image, None
+        background = int(np.bincount(small.ravel(), minlength=256).argmax())
+        return rotate_image(gray, angle, background)
+
+
+def restore_line(line, transform):
+    a, b, c, d, e, f = transform
+    polygon = [[int(round(a * x + b * y + c)), int(round(d * x + e * y + f))] for x, y in line.polygon]
+    return OCRLine(line.text, polygon, line.score)
+
+
+def restore_result(result, transform):
+    lines = [restore_line(line, transform) for line in result.lines]
+    return OCRResult(lines, result.timings, result.text_lines, result.errors)
+
+
+# ========== 识别流程 ==========
+MAX_OCR_WIDTH = 1280
+MAX_OCR_HEIGHT = 720
+
+
+def prepare_ocr_image(pil_image, tiled=False):
+    # 图片缩放优化：超过 1280x720 的图片等比缩小后再识别；分块模式下保留原始分辨率
+    w, h = pil_image.size
+    with METRICS.stage("prepare"):
+        if not tiled and (w > MAX_OCR_WIDTH or h > MAX_OCR_HEIGHT):
+            scale = min(MAX_OCR_WIDTH / w, MAX_OCR_HEIGHT / h)
+            pil_image = pil_image.resize((int(w * scale), int(h * scale)), Image.Resampling.LANCZOS)
+        if pil_image.mode != "RGB":
+            pil_image = pil_image.convert("RGB")
+    METRICS.record_bytes("prepare", pil_image.width * pil_image.height * 3)
+    return pil_image
+
+
+def load_ocr_image(fp, tiled=False):
+    # 从文件路径或文件对象加载并预处理。非分块模式下 JPEG 用 draft 直接按接近识别尺寸的比例解码（1/2~1/8），
+    # 大尺寸扫描件的全分辨率像素不会在内存中展开
+    with Image.open(fp) as img:
+        w, h = img.size
+        scale = min(MAX_OCR_WIDTH / w, MAX_OCR_HEIGHT / h)
+        if not tiled and scale < 1:
+            img.draft("RGB", (int(w * scale), int(h * scale)))
+        with METRICS.stage("load"):
+            img.load()
+        return prepare_ocr_image(img, tiled)
+
+
+def engine_backend(engine):
+    return getattr(engine, "backend_name", None) or getattr(engine, "name", None) or select_backend()
+
+
+def engine_signature(engine):
+    # 影响识别结果的引擎和模型设置，作为缓存键的一部分
+    return (CACHE_FORMAT, engine_backend(engine), DET_MODEL, CLS_MODEL, REC_MODEL, MAX_OCR_WIDTH, MAX_OCR_HEIGHT)
+
+
+# 空白检测：几乎没有明暗对比或几乎没有明显边缘的图片不可能含有文字，直接跳过引擎
+# 按强边缘像素的绝对数量判断而不是占比，大截图里只有一个小词也不会被误判为空白
+BLANK_CHECK_SIDE = 2048       # 检测前按整数倍降采样到该尺寸以内
+BLANK_CONTRAST = 8            # 最亮与最暗灰度之差低于该值视为纯色
+BLANK_EDGE_LEVEL = 48         # 边缘图中高于该值的像素算作强边缘
+BLANK_MIN_EDGES = 12          # 强边缘像素少于该数量视为空白；设为 0 关闭检测
+
+
+def is_blank_image(image, min_edges=None):
+    min_edges = BLANK_MIN_EDGES if min_edges is None else min_edges
+    if min_edges <= 0 or not isinstance(image, Image.Image):
+        return False
+    with METRICS.stage("blank_check"):
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGB")
+        factor = max(1, -(-max(image.size) // BLANK_CHECK_SIDE))
+        gray = (image.reduce(factor) if factor > 1 else image).convert("L")
+        low, high = gray.getextrema()
+        if high - low < BLANK_CONTRAST:
+            return True
+        if gray.width < 3 or gray.height < 3:
+            return False
+        # 滤波不处理最外一圈像素（保留原值），统计前裁掉
+        edges = gray.filter(ImageFilter.FIND_EDGES).crop((1, 1, gray.width - 1, gray.height - 1))
+        # 降采样后边缘像素约少 factor 倍，折算回原图尺寸再比较
+        return sum(edges.histogram()[BLANK_EDGE_LEVEL:]) * factor < min_edges
+
+
+def needs_tiling(image):
+    return isinstance(image, Image.Image) and (image.width > MAX_OCR_WIDTH or image.height > MAX_OCR_HEIGHT)
+
+
+# 单行快速路径：自动模式下，宽高比像一行字、且水平投影只有一个文字带的截图只跑识别模型，
+# 置信度不够再退回完整流程。exe 后端无法跳过检测，单行截图只跳过方向分类、识别一次，不再回退。
+# 也可按任务强制指定流程
+PROFILE_AUTO = "auto"
+PIPELINE_PROFILE = PROFILE_AUTO   # 未指定时使用的流程，命令行 --profile 可修改
+LINE_MIN_ASPECT = 2.5       # 宽高比至少为此值才可能是单行
+LINE_MIN_HEIGHT = 8
+LINE_CHECK_HEIGHT = 64      # 投影前把高度缩到此值以内
+LINE_INK_DELTA = 48         # 与背景灰度相差超过该值的像素算作笔画
+LINE_MIN_FILL = 0.3         # 文字带至少占图片高度的比例，否则字太小，缩放到识别高度后会糊
+LINE_GAP_RATIO = 0.25       # 文字带之间的空白超过最高文字带的该比例，视为多行
+LINE_MIN_SCORE = 0.9        # 快速路径结果的最低置信度
+
+
+def is_single_line(image):
+    if not isinstance(image, Image.Image):
+        return False
+    w, h = image.size
+    if h < LINE_MIN_HEIGHT or w < h * LINE_MIN_ASPECT:
+        return False
+    with METRICS.stage("line_check"):
+        gray = image.convert("L")
+        if h > LINE_CHECK_HEIGHT:
+            gray = gray.resize((max(1, w * LINE_CHECK_HEIGHT // h), LINE_CHECK_HEIGHT), Image.Resampling.BOX)
+        # 出现最多的灰度视为背景；水平投影按行统计笔画像素，缩成一列即每行的均值
+        histogram = gray.histogram()
+        background = histogram.index(max(histogram))
+        ink = gray.point([255 if abs(v - background) > LINE_INK_DELTA else 0 for v in range(256)])
+        rows = [v > 0 for v in ink.resize((1, ink.height), Image.Resampling.BOX).tobytes()]
+    bands = []
+    for y, inked in enumerate(rows):
+        if inked and (not bands or bands[-1][1] != y):
+            bands.append([y, y + 1])
+        elif inked:
+            bands[-1][1] = y + 1
+    if not bands or bands[-1][1] - bands[0][0] < len(rows) * LINE_MIN_FILL:
+        return False
+    tallest = max(end - begin for begin, end in bands)
+    # 字符内部（如“三”、i 上的点）的小空隙不算分行
+    return all(nxt[0] - prev[1] < tallest * LINE_GAP_RATIO for prev, nxt in zip(bands, bands[1:]))
+
+
+def is_confident(result):
+    return bool(result.lines) and min(line.score for line in result.lines) >= LINE_MIN_SCORE
+
+
+def ocr_image(image, engine=None, cache=None, tiled=False, on_line=None, cancel_event=None, profile=None,
+              preprocess=None, memory=None):
+    # 送入引擎并返回结构化结果，GUI 工作线程和批量模式共用；命中缓存时不再调用引擎。
+    # on_line 在识别过程中逐行回调，用于边识别边显示；cancel_event 置位后尽快抛出 OCRCancelledError。
+    # profile 为 auto 或 PIPELINE_PROFILES 之一，未指定时用 PIPELINE_PROFILE；
+    # preprocess 为 PREPROCESS_PROFILES 之一，未指定时用 PREPROCESS_PROFILE；分块模式下整图只做纠偏，其余逐块处理。
+    # memory 为同一来源的 TileMemory 时增量识别：只重识别与上次相比内容变化的区域
+    profile = profile or PIPELINE_PROFILE
+    if is_blank_image(image):
+        METRICS.increment("skip.blank")
+        return OCRResult()
+    if engine is None:
+        engine = create_backend()
+    tiles = tiled and needs_tiling(image)
+
+    def recognize(image, on_line):
+        if tiles:
+            return run_tiled_ocr(image, engine, cache, on_line, cancel_event, profile, preprocess)
+        return recognize_auto(image, engine, cache, on_line, cancel_event, profile)
+
+    def recognize_region(crop):
+        # 不分块时变化区域已随整图预处理过；分块时整图只做了纠偏，区域像分块一样按所选流程预处理。
+        # 自动流程改用完整流程，识别出的行与整页识别的粒度一致
+        return ocr_image(
+            crop, engine, cache, True, cancel_event=cancel_event,
+            profile="full" if profile == PROFILE_AUTO else profile, preprocess=preprocess if tiles else "none"
+        )
+
+    def recognize_changes(image, on_line):
+        settings = (profile, preprocess or PREPROCESS_PROFILE)
+        return run_incremental_ocr(image, memory, settings, recognize, recognize_region, on_line, engine)
+
+    run = recognize if memory is None else recognize_changes
+    image, transform = deskew_image(image, preprocess) if tiles else preprocess_image(image, preprocess)
+    if transform is None:
+        return run(image, on_line)
+    if on_line is not None:
+        emit = on_line
+        on_line = lambda line: emit(restore_line(line, transform))
+    return restore_result(run(image, on_line), transform)
+
+
+def recognize_auto(image, engine, cache, on_line, cancel_event, profile):
+    if profile == PROFILE_AUTO:
+        if is_single_line(image):
+            if not getattr(BACKENDS.get(engine_backend(engine)), "skips_detection", False):
+                METRICS.increment("profile.no_cls")
+                return recognize_profile(image, engine, cache, on_line, cancel_event, "no-cls")
+            # 快速路径的结果确认可信后才回传，避免先显示一行错字再被完整流程的结果替换
+            result = recognize_profile(image, engine, cache, None, cancel_event, "rec-only")
+            if is_confident(result):
+                METRICS.increment("profile.rec_only")
+                if on_line is not None:
+                    for line in result.lines:
+                        on_line(line)
+                return result
+            METRICS.increment("profile.fallback")
+        profile = "full"
+    return recognize_profile(image, engine, cache, on_line, cancel_event, profile)
 
 
-# ========== 全局异常捕获 ==========
-def handle_exception(exc_type, exc_value, exc_tb):
-    if issubclass(exc_type, KeyboardInterrupt):
-        sys.__excepthook__(exc_type, exc_value, exc_tb)
-        return
-    log_path = os.path.expanduser("~/ocr_crash.log")
-    with open(log_path, "w", encoding="utf-8") as f:
-        f.write(f"CRASH: {exc_value}\n")
-        import traceback
-        traceback.print_exception(exc_type, exc_value, exc_tb, file=f)
+def recognize_profile(image, engine, cache, on_line, cancel_event, profile):
+    # 按指定流程识别一次；流程不同结果也不同，缓存键中包含流程
+    if cache is not None:
+        with METRICS.stage("cache.lookup"):
+            key = cache.make_key(image, engine_signature(engine) + (profile,))
+            cached = cache.get(key)
+        if cached is not None:
+            result = OCRResult.from_dict(cached)
+            # 命中缓存时同样逐行回调，界面的流式显示不因缓存而空白
+            if on_line is not None:
+                for line in result.lines:
+                    on_line(line)
+            return result
+    with METRICS.stage("engine.recognize"):
+        result = engine.recognize(image, on_line=on_line, cancel_event=cancel_event, profile=profile)
+    METRICS.record_timings(result.timings)
+    if cache is not None:
+        cache.put(key, result.to_dict())
+    return result
 
-sys.excepthook = handle_exception
 
+def run_ocr(image, engine=None, cache=None, tiled=False, on_line=None, cancel_event=None, profile=None,
+            preprocess=None, memory=None):
+    result = ocr_image(image, engine, cache, tiled, on_line, cancel_event, profile, preprocess, memory)
+    with METRICS.stage("render"):
+        return render_plain_text(result)
 
-# ========== 路径工具 ==========
-def get_engine_path():
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, "rapidocr", "RapidOcrOnnx.exe")
 
-def get_models_dir():
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, "rapidocr", "models")
+# ========== 大图分块识别 ==========
+# 大图不再整体缩小，而是切成与 1280x720 同尺寸、相互重叠的分块并行识别，再按坐标合并去重
+TILE_OVERLAP = 160   # 重叠宽度，高度不超过一半重叠的文字行总能完整落在某个分块里
+TILE_EDGE = 4        # 距分块内部边界小于该值的文本框视为被截断
 
 
-# ========== Windows 前台窗口==========
-if sys.platform == "win32":
-    import ctypes
-    user32 = ctypes.windll.user32
-    kernel32 = ctypes.windll.kernel32
-    def bring_window_to_front(hwnd):
-        current_thread = kernel32.GetCurrentThreadId()
-        foreground_thread = user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), None)
-        user32.AttachThreadInput(foreground_thread, current_thread, True)
-        user32.ShowWindow(hwnd, 9)
-        user32.SetForegroundWindow(hwnd)
-        user32.AttachThreadInput(foreground_thread, current_thread, False)
+def _tile_spans(length, tile, overlap):
+    # 返回 (起点, 终点, 归属起点, 归属终点)，重叠区以中线划分归属
+    if length <= tile:
+        return [(0, length, 0, length)]
+    step = tile - overlap
+    starts = []
+    pos = 0
+    while True:
+        starts.append(min(pos, length - tile))
+        if pos + tile >= length:
+            break
+        pos += step
+    spans = []
+    for i, start in enumerate(starts):
+        end = start + tile
+        own_start = 0 if i == 0 else (start + starts[i - 1] + tile) // 2
+        own_end = length if i == len(starts) - 1 else (starts[i + 1] + end) // 2
+        spans.append((start, end, own_start, own_end))
+    return spans
 
 
-# ========== 生成 OCR 托盘图标 ==========
-def create_ocr_icon():
-    img = Image.new('RGBA', (32, 32), (34, 139, 230, 255))  # 主色调背景
-    draw = ImageDraw.Draw(img)
-    # 加载系统默认字体并指定大小（12号字适配32x32图标）
-    font = ImageFont.load_default(size=12)
-    draw.text((2, 8), "OCR", fill=(255, 255, 255, 255), font=font)
-    return img
+def split_tiles(width, height, tile_w=MAX_OCR_WIDTH, tile_h=MAX_OCR_HEIGHT, overlap=TILE_OVERLAP):
+    tiles = []
+    for y0, y1, oy0, oy1 in _tile_spans(height, tile_h, overlap):
+        for x0, x1, ox0, ox1 in _tile_spans(width, tile_w, overlap):
+            tiles.append(((x0, y0, x1, y1), (ox0, oy0, ox1, oy1)))
+    return tiles
 
 
-# ========== OCR 结果过滤==========
-def filter_ocr_bytes(raw_bytes):
-    error_marker = "【错误输出】".encode("utf-8")
-    if error_marker in raw_bytes:
-        raw_bytes = raw_bytes.split(error_marker)[0]
-    
-    detect_marker = b"FullDetectTime"
-    if detect_marker in raw_bytes:
-        detect_start = raw_bytes.find(detect_marker)
-        line_end = raw_bytes.find(b"\n", detect_start)
-        if line_end != -1:
-            result_bytes = raw_bytes[line_end + 1:]
+def join_overlapping_text(left, right, approx):
+    # 拼接同一行被分块切开的两段：优先找与重叠宽度相符的首尾重复，找不到就按估计字数裁掉右段开头。
+    # 重复字符（"0000"、"----"）处可能有多个长度都能对上，取最接近按像素估计的字数的那个，而不是最长的
+    matches = [
+        k for k in range(min(len(left), len(right)), 0, -1)
+        if left.endswith(right[:k]) and abs(k - approx) <= max(2, approx / 2)
+    ]
+    if matches:
+        return left + right[min(matches, key=lambda k: abs(k - approx)):]
+    return left + right[min(len(right), int(round(approx))):]
+
+
+def sort_lines(lines):
+    # 从上到下、同一行内从左到右
+    lines = sorted(lines, key=lambda l: (l[1][1], l[1][0]))
+    for i in range(len(lines) - 1):
+        for j in range(i, -1, -1):
+            a, b = lines[j][1], lines[j + 1][1]
+            same_row = min(a[3], b[3]) - max(a[1], b[1]) > 0.5 * min(a[3] - a[1], b[3] - b[1])
+            if same_row and b[0] < a[0]:
+                lines[j], lines[j + 1] = lines[j + 1], lines[j]
+            else:
+                break
+    return lines
+
+
+def place_tile_line(tile, line, width, height):
+    # 返回 (原图坐标框, 是否被左右边界截断)；应丢弃的行返回 None
+    (bx0, by0, bx1, by1), (ox0, oy0, ox1, oy1) = tile
+    x0, y0, x1, y1 = line.box
+    # 被分块上下边界截断的行必然在相邻分块中完整出现，直接丢弃
+    if (y0 <= TILE_EDGE and by0 > 0) or (y1 >= by1 - by0 - TILE_EDGE and by1 < height):
+        return None
+    cut = (x0 <= TILE_EDGE and bx0 > 0) or (x1 >= bx1 - bx0 - TILE_EDGE and bx1 < width)
+    box = [x0 + bx0, y0 + by0, x1 + bx0, y1 + by0]
+    cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    # 完整的行只保留中心点所在分块的那一份；左右被截断的片段留待拼接
+    if not cut and not (ox0 <= cx < ox1 and oy0 <= cy < oy1):
+        return None
+    return box, cut
+
+
+def merge_tile_lines(tiles, results, width, height):
+    candidates = []
+    for tile, result in zip(tiles, results):
+        for line in result.lines:
+            placed = place_tile_line(tile, line, width, height)
+            if placed is not None:
+                candidates.append([line.text, placed[0], line.score])
+
+    # 同一行上相互重叠的片段：被包含的丢弃，部分重叠的拼接成一行
+    candidates.sort(key=lambda l: l[1][2] - l[1][0], reverse=True)
+    merged = []
+    for line in candidates:
+        text, box, score = line
+        for other in merged:
+            obox = other[1]
+            v_overlap = min(box[3], obox[3]) - max(box[1], obox[1])
+            h_overlap = min(box[2], obox[2]) - max(box[0], obox[0])
+            if v_overlap <= 0.5 * min(box[3] - box[1], obox[3] - obox[1]) or h_overlap <= 0:
+                continue
+            # 只有左右都落在另一框内（容许 TILE_EDGE 像素误差）才算被包含；探出去的部分说明是另一段文字
+            if box[0] < obox[0] - TILE_EDGE or box[2] > obox[2] + TILE_EDGE:
+                left, right = (other, line) if obox[0] <= box[0] else (line, other)
+                char_w = (left[1][2] - left[1][0]) / max(1, len(left[0]))
+                other[0] = join_overlapping_text(left[0], right[0], h_overlap / char_w)
+                other[1] = [min(box[0], obox[0]), min(box[1], obox[1]), max(box[2], obox[2]), max(box[3], obox[3])]
+                other[2] = min(score, other[2])
+            break
         else:
-            result_bytes = raw_bytes[detect_start + len(detect_marker):]
-    else:
-        result_bytes = raw_bytes
-    
+            merged.append(line)
+    return [OCRLine.from_box(*line) for line in sort_lines(merged)]
+
+
+def run_tiled_ocr(pil_image, engine, cache=None, on_line=None, cancel_event=None, profile=None, preprocess=None):
+    import concurrent.futures
+
+    width, height = pil_image.size
+    tiles = split_tiles(width, height)
+    # 引擎池有几个实例就并行几路；在途分块数有上限，峰值内存只与分块大小相关
+    workers = len(getattr(engine, "hosts", ())) or 1
+    results = [None] * len(tiles)
+
+    def collect(future, index):
+        results[index] = future.result()
+        if on_line is not None:
+            # 分块完成即回传其中完整归属于本块的行；跨块片段要等合并后才出现在最终结果里
+            for line in results[index].lines:
+                placed = place_tile_line(tiles[index], line, width, height)
+                if placed is not None and not placed[1]:
+                    on_line(OCRLine.from_box(line.text, placed[0], line.score))
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        running = {}
+        for i, (box, _) in enumerate(tiles):
+            if len(running) >= workers * 2:
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    collect(future, running.pop(future))
+            running[executor.submit(
+                ocr_image, pil_image.crop(box), engine, cache,
+                cancel_event=cancel_event, profile=profile, preprocess=preprocess
+            )] = i
+        for future in concurrent.futures.as_completed(running):
+            collect(future, running[future])
+
+    timings = {"tiles": len(tiles)}
+    for result in results:
+        for name, value in result.timings.items():
+            timings[name] = timings.get(name, 0.0) + value
+    errors = "\n".join(result.errors for result in results if result.errors)
+    return OCRResult(merge_tile_lines(tiles, results, width, height), timings, errors=errors)
+
+
+# ========== 增量识别 ==========
+# 同一来源（截图区域、文件、服务调用方指定的名字）反复识别时，记住上次整页的识别结果和一张细网格的格子内容哈希。
+# 再次识别时找出哈希变化的格子，连成几个矩形区域，扩到能完整包住与之相交的旧行，只识别这些区域，
+# 用新识别的行替换区域内的旧行：耗时与改动的面积成正比，而不是与整页大小成正比。
+# 首次识别、图片尺寸或识别设置变化、改动面积过大时按整页识别
+INCREMENTAL_CELL = 64          # 哈希网格的格子边长（像素）
+INCREMENTAL_MARGIN = 24        # 变化区域向外扩展的边距，给检测模型留出文字周围的背景
+INCREMENTAL_MAX_AREA = 0.5     # 变化区域超过整页的这一比例时直接整页识别
+INCREMENTAL_SOURCES = 16       # 最多记住几个来源，超出时丢弃最久未用的
+
+
+def cell_hashes(image, cell=INCREMENTAL_CELL):
+    # 逐格计算内容哈希（行优先）；先裁出一行格子的条带，再从条带中切格子
+    width, height = image.size
+    hashes = []
+    for y in range(0, height, cell):
+        band = image.crop((0, y, width, min(height, y + cell)))
+        for x in range(0, width, cell):
+            tile = band.crop((x, 0, min(width, x + cell), band.height))
+            hashes.append(hashlib.blake2b(tile.tobytes(), digest_size=16).digest())
+    return hashes
+
+
+def boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def changed_regions(changed, size, lines, cell=INCREMENTAL_CELL, margin=INCREMENTAL_MARGIN):
+    # 变化的格子按相邻关系连成块，每块取外接矩形并外扩边距；再反复扩到完整包住与之相交的旧行、
+    # 合并相互重叠的矩形，直到不再变化。返回互不重叠的 [x0, y0, x1, y1] 列表
+    width, height = size
+    columns = -(-width // cell)
+    pending = set(changed)
+    regions = []
+    while pending:
+        stack = [pending.pop()]
+        x0, y0, x1, y1 = width, height, 0, 0
+        while stack:
+            row, col = divmod(stack.pop(), columns)
+            x0, y0 = min(x0, col * cell), min(y0, row * cell)
+            x1, y1 = max(x1, (col + 1) * cell), max(y1, (row + 1) * cell)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    neighbour = (row + dr) * columns + col + dc
+                    if 0 <= col + dc < columns and neighbour in pending:
+                        pending.remove(neighbour)
+                        stack.append(neighbour)
+        regions.append([max(0, x0 - margin), max(0, y0 - margin), min(width, x1 + margin), min(height, y1 + margin)])
+
+    boxes = [line.box for line in lines]
+    grown = True
+    while grown:
+        grown = False
+        for region in regions:
+            for box in boxes:
+                if boxes_overlap(region, box):
+                    covered = [
+                        max(0, min(region[0], math.floor(box[0]))), max(0, min(region[1], math.floor(box[1]))),
+                        min(width, max(region[2], math.ceil(box[2]))), min(height, max(region[3], math.ceil(box[3]))),
+                    ]
+                    if covered != region:
+                        region[:] = covered
+                        grown = True
+        merged = []
+        for region in regions:
+            for other in merged:
+                if boxes_overlap(region, other):
+                    other[:] = [min(region[0], other[0]), min(region[1], other[1]),
+                                max(region[2], other[2]), max(region[3], other[3])]
+                    grown = True
+                    break
+            else:
+                merged.append(region)
+        regions = merged
+    return regions
+
+
+def line_hash(image, box):
+    # 文本框左右各外扩一个行高后范围内像素的哈希，用来判断一行是否原样未动；
+    # 外扩是为了发现紧接在行首、行尾增删的文字
+    pad = box[3] - box[1]
+    x0, y0 = max(0, math.floor(box[0] - pad)), max(0, math.floor(box[1]))
+    x1, y1 = min(image.width, math.ceil(box[2] + pad)), min(image.height, math.ceil(box[3]))
+    return hashlib.blake2b(image.crop((x0, y0, max(x0, x1), max(y0, y1))).tobytes(), digest_size=16).digest()
+
+
+def extends_beyond(box, old, tolerance):
+    return (box[0] < old[0] - tolerance or box[1] < old[1] - tolerance
+            or box[2] > old[2] + tolerance or box[3] > old[3] + tolerance)
+
+
+def run_incremental_ocr(image, memory, settings, recognize, recognize_region, on_line=None, engine=None):
+    # recognize(image, on_line) 整页识别；recognize_region(crop) 识别一个变化区域，坐标相对于裁剪图
+    import concurrent.futures
+
+    hashes = cell_hashes(image)
+    previous = memory.recall(image, settings)
+    if previous is not None:
+        old_hashes, old_lines, old_line_hashes = previous
+        changed = [i for i, (new, old) in enumerate(zip(hashes, old_hashes)) if new != old]
+        regions = changed_regions(changed, image.size, old_lines)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if previous is None or area > INCREMENTAL_MAX_AREA * image.width * image.height:
+        METRICS.increment("incremental.full")
+        result = recognize(image, on_line)
+        if not result.errors:
+            memory.remember(image, settings, hashes, result.lines)
+        return result
+
+    # 引擎池有几个实例就并行识别几个区域
+    workers = len(getattr(engine, "hosts", ())) or 1
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(lambda region: recognize_region(image.crop(region)), regions))
+    # 区域里原样未动的旧行保留（重新识别同样的像素也可能有细微出入），其余旧行换成新识别的行。
+    # 旧行连同左右一个行高范围内的像素有改动，或有新行与它相交且超出它的范围（行尾追加、换行方式改变），
+    # 就视为已改动
+    new_lines = [
+        OCRLine(line.text, [[x + x0, y + y0] for x, y in line.polygon], line.score)
+        for (x0, y0, _, _), result in zip(regions, results) for line in result.lines
+    ]
+    lines = []
+    kept = []
+    for line, digest in zip(old_lines, old_line_hashes):
+        box = line.box
+        if not any(boxes_overlap(region, box) for region in regions):
+            lines.append(line)
+            continue
+        if line_hash(image, box) != digest:
+            continue
+        tolerance = (box[3] - box[1]) / 2
+        if any(boxes_overlap(new.box, box) and extends_beyond(new.box, box, tolerance) for new in new_lines):
+            continue
+        lines.append(line)
+        kept.append(box)
+    for line in new_lines:
+        box = line.box
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        if not any(k[0] <= cx <= k[2] and k[1] <= cy <= k[3] for k in kept):
+            lines.append(line)
+    lines = [item[2] for item in sort_lines([[line.text, line.box, line] for line in lines])]
+
+    METRICS.increment("incremental.regions", len(regions))
+    timings = {"regions": len(regions), "changed_area": round(area / (image.width * image.height), 4)}
+    for result in results:
+        for name, value in result.timings.items():
+            timings[name] = timings.get(name, 0.0) + value
+    errors = "\n".join(result.errors for result in results if result.errors)
+    if not errors:
+        memory.remember(image, settings, hashes, lines)
+    if on_line is not None:
+        for line in lines:
+            on_line(line)
+    return OCRResult(lines, timings, errors=errors)
+
+
+class TileMemory:
+    # 一个来源上次识别的格子哈希、整页的行及每行像素的哈希；尺寸、颜色模式或识别设置不同时视为没有记录
+    def __init__(self):
+        self.key = None
+        self.hashes = None
+        self.lines = None
+        self.line_hashes = None
+        self._lock = threading.Lock()
+
+    def recall(self, image, settings):
+        with self._lock:
+            if self.key != (image.size, image.mode, settings):
+                return None
+            return self.hashes, self.lines, self.line_hashes
+
+    def remember(self, image, settings, hashes, lines):
+        line_hashes = [line_hash(image, line.box) for line in lines]
+        with self._lock:
+            self.key = (image.size, image.mode, settings)
+            self.hashes = hashes
+            self.lines = list(lines)
+            self.line_hashes = line_hashes
+
+
+class TileMemoryStore:
+    def __init__(self, max_sources=INCREMENTAL_SOURCES):
+        self.max_sources = max_sources
+        self._sources = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source):
+        with self._lock:
+            memory = self._sources.get(source)
+            if memory is None:
+                memory = self._sources[source] = TileMemory()
+                while len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            self._sources.move_to_end(source)
+            return memory
+
+
+# ========== 多页文档 ==========
+# TIFF/GIF 的每一帧、PDF 的每一页按页惰性解码：解码一页、预处理一页，只有后台预取队列里的几页常驻内存，
+# 与总页数无关。PDF 由可选依赖 pypdfium2 在本地渲染
+DOCUMENT_EXTS = (".tif", ".tiff", ".gif", ".pdf")
+PAGE_PREFETCH = 2   # 后台预先解码的页数
+PDF_DPI = 200       # PDF 渲染分辨率；非分块模式下直接按识别尺寸上限渲染
+
+
+def is_document(path):
+    return isinstance(path, str) and path.lower().endswith(DOCUMENT_EXTS)
+
+
+def open_pdf(path):
     try:
-        result_str = result_bytes.decode("utf-8")
-    except UnicodeDecodeError:
-        result_str = result_bytes.decode("gbk", errors="replace")
-    
-    lines = [line.strip() for line in result_str.split('\n') if line.strip()]
-    return '\n'.join(lines) if lines else "未识别到有效文本"
+        import pypdfium2
+    except ImportError:
+        raise RuntimeError("识别 PDF 需要安装 pypdfium2：pip install pypdfium2")
+    return pypdfium2.PdfDocument(path)
+
+
+def document_page_count(path):
+    if path.lower().endswith(".pdf"):
+        pdf = open_pdf(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def is_multipage(path):
+    # PDF 总按文档处理；只有一帧的 TIFF/GIF 仍按普通图片处理
+    return is_document(path) and (path.lower().endswith(".pdf") or document_page_count(path) > 1)
+
+
+def page_title(page):
+    return f"—— 第 {page} 页 ——"
+
+
+def iter_document_pages(path, tiled=False, skip=()):
+    # 逐页产出 (页码, 预处理后的图片)，页码从 1 开始；skip 中的页不解码
+    if path.lower().endswith(".pdf"):
+        yield from _iter_pdf_pages(path, tiled, skip)
+        return
+    with Image.open(path) as img:
+        for index in range(getattr(img, "n_frames", 1)):
+            if index + 1 in skip:
+                continue
+            img.seek(index)
+            with METRICS.stage("load"):
+                img.load()
+            page = prepare_ocr_image(img, tiled)
+            # 不需要缩放和转换时得到的是同一个对象，下一帧会覆盖它，必须复制出来
+            yield index + 1, page.copy() if page is img else page
+
+
+def _iter_pdf_pages(path, tiled, skip):
+    pdf = open_pdf(path)
+    try:
+        for index in range(len(pdf)):
+            if index + 1 in skip:
+                continue
+            page = pdf[index]
+            try:
+                with METRICS.stage("load"):
+                    width, height = page.get_size()
+                    scale = PDF_DPI / 72
+                    if not tiled:
+                        scale = min(scale, MAX_OCR_WIDTH / width, MAX_OCR_HEIGHT / height)
+                    image = page.render(scale=scale, rev_byteorder=True).to_pil()
+            finally:
+                page.close()
+            yield index + 1, prepare_ocr_image(image, tiled)
+    finally:
+        pdf.close()
+
+
+def prefetch(iterable, depth=PAGE_PREFETCH):
+    # 在后台线程按顺序消费 iterable（解码下一页），与当前页的识别重叠；队列满时解码暂停。
+    # 调用方提前结束（取消、出错）时停止后台线程并关闭 iterable
+    pending = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(("item", item)):
+                    return
+            put(("done", None))
+        except Exception as e:
+            put(("error", e))
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item = pending.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+# ========== 屏幕区域监视 ==========
+# 按固定间隔截取同一区域，先比较原始字节，再比较降采样灰度图（每像素即一个 4x4 块的均值），
+# 只有内容确实变化时才送去识别，识别文字也变化时才回调
+WATCH_INTERVAL = 1.0        # 轮询间隔（秒）
+WATCH_DOWNSAMPLE = 4        # 降采样倍数
+WATCH_DIFF_THRESHOLD = 12   # 降采样后任一块灰度差超过该值视为变化，过滤光标闪烁等噪声
+
+
+def region_thumbnail(shot):
+    image = Image.frombuffer("RGB", shot.size, shot.raw, "raw", "BGRX", 0, 1)
+    return image.convert("L").reduce(WATCH_DOWNSAMPLE)
+
+
+class RegionWatcher:
+    def __init__(self, region, engine=None, cache=None, interval=WATCH_INTERVAL, threshold=WATCH_DIFF_THRESHOLD,
+                 memory=None):
+        self.region = region  # mss 格式 {"left", "top", "width", "height"}，物理像素
+        self.engine = engine
+        self.cache = cache
+        self.interval = interval
+        self.threshold = threshold
+        self.memory = memory  # 增量识别：画面变化时只重识别变化的分块
+        self.frames = 0
+        self.ocr_runs = 0
+        self._raw = None
+        self._thumb = None
+        self._text = None
+
+    def changed(self, shot):
+        if self._raw is not None and shot.raw == self._raw:
+            return False
+        self._raw = shot.raw
+        thumb = region_thumbnail(shot)
+        # 只在判定变化时更新基准图，缓慢的渐变累积到阈值后同样会被发现
+        if self._thumb is not None and ImageChops.difference(thumb, self._thumb).getextrema()[1] <= self.threshold:
+            return False
+        self._thumb = thumb
+        return True
+
+    def poll(self, sct):
+        # 截取一帧；内容变化且识别出的文字与上次不同时返回新文字，否则返回 None
+        with METRICS.stage("watch.grab"):
+            shot = sct.grab(self.region)
+        self.frames += 1
+        with METRICS.stage("watch.diff"):
+            changed = self.changed(shot)
+        if not changed:
+            return None
+        self.ocr_runs += 1
+        image = Image.frombytes("RGB", shot.size, shot.raw, "raw", "BGRX")
+        try:
+            incremental = self.memory is not None
+            text = run_ocr(
+                prepare_ocr_image(image, incremental), self.engine, self.cache, incremental, memory=self.memory
+            )
+        except OCREngineError:
+            self._thumb = None  # 下一帧重试
+            raise
+        if text == self._text:
+            return None
+        self._text = text
+        return text
+
+    def run(self, on_change, stop_event, on_error=None):
+        import mss
+
+        with mss.mss() as sct:
+            while not stop_event.is_set():
+                start = time.monotonic()
+                try:
+                    text = self.poll(sct)
+                    if text is not None:
+                        on_change(text)
+                except OCREngineError as e:
+                    if on_error is not None:
+                        on_error(str(e))
+                stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
 
 
 # ========== OCR 工作线程==========
 class OCRWorker(QObject):
     result_ready = Signal(str)
     error_occurred = Signal(str)
+    line_ready = Signal(str)  # 识别过程中逐行发出，便于界面实时追加
+    cancelled = Signal()
     
-    def __init__(self, image_path):
+    def __init__(self, image, engine=None, cache=None, tiled=False, cancel_event=None, profile=None,
+                 preprocess=None, memory=None):
         super().__init__()
-        self.image_path = image_path
+        self.image = image  # PIL 图片（直接传像素）、图片路径或多页文档路径
+        self.engine = engine
+        self.cache = cache
+        self.tiled = tiled
+        self.cancel_event = cancel_event
+        self.profile = profile
+        self.preprocess = preprocess
+        self.memory = memory  # 增量识别时为该来源的 TileMemory
 
     def run(self):
         try:
-            engine_path = get_engine_path()
-            models_dir = get_models_dir()
-            
-            if not os.path.exists(engine_path):
-                raise FileNotFoundError(f"OCR 引擎未找到: {engine_path}")
-            if not os.path.isdir(models_dir):
-                raise FileNotFoundError(f"模型目录缺失: {models_dir}")
-
-            cmd = [
-                engine_path,
-                "--models", models_dir,
-                "--det", "ch_PP-OCRv4_det_infer.onnx",
-                "--cls", "ch_ppocr_mobile_v2.0_cls_infer.onnx",
-                "--rec", "ch_PP-OCRv4_rec_infer.onnx",
-                "--keys", "ppocr_keys_v1.txt",
-                "--image", self.image_path,
-                "--numThread", "4",
-                "--GPU", "-1"
-            ]
-
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-            )
-
-            stdout_marker = "【标准输出】\n".encode("utf-8")
-            stderr_marker = "\n【错误输出】\n".encode("utf-8")
-            raw_bytes = stdout_marker + result.stdout + stderr_marker + result.stderr
-            pure_text = filter_ocr_bytes(raw_bytes)
-            if "未识别到有效文本" == pure_text or "识别失败" in pure_text:
+            if is_document(self.image):
+                pure_text = self.run_document()
+            else:
+                pure_text = run_ocr(
+                    self.image, self.engine, self.cache, self.tiled,
+                    on_line=lambda line: self.line_ready.emit(line.text),
+                    cancel_event=self.cancel_event, profile=self.profile, preprocess=self.preprocess,
+                    memory=self.memory
+                )
+            if NO_TEXT == pure_text or "识别失败" in pure_text:
                 self.error_occurred.emit(pure_text)
             else:
                 self.result_ready.emit(pure_text)
+        except OCRCancelledError:
+            self.cancelled.emit()
         except Exception as e:
             self.error_occurred.emit(f"OCR 执行异常: {str(e)}")
 
+    def run_document(self):
+        # 多页文档逐页识别：先发出页标题，再逐行发出该页结果；下一页在后台提前解码
+        pages = []
+        found = False
+        for page, image in prefetch(iter_document_pages(self.image, self.tiled)):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise OCRCancelledError("识别已取消")
+            self.line_ready.emit(page_title(page))
+            text = run_ocr(
+                image, self.engine, self.cache, self.tiled,
+                on_line=lambda line: self.line_ready.emit(line.text),
+                cancel_event=self.cancel_event, profile=self.profile, preprocess=self.preprocess
+            )
+            found = found or text != NO_TEXT
+            pages.append(f"{page_title(page)}\n{text}")
+        return "\n\n".join(pages) if found else NO_TEXT
+
+
+class WatchWorker(QObject):
+    text_changed = Signal(str)
+    error_occurred = Signal(str)
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+        self.stop_event = threading.Event()
+
+    def run(self):
+        self.watcher.run(self.text_changed.emit, self.stop_event, self.error_occurred.emit)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# ========== OCR 任务调度 ==========
+# 截图/选图都提交为任务：同时运行的任务数有上限，其余排队；
+# 开启“只保留最新任务”时，新任务会取消所有排队中和识别中的旧任务
+class OCRJob:
+    def __init__(self, job_id, image, tiled=False, profile=None, preprocess=None, memory=None):
+        self.job_id = job_id
+        self.image = image
+        self.tiled = tiled
+        self.profile = profile
+        self.preprocess = preprocess
+        self.memory = memory
+        self.state = "queued"   # queued / running / cancelling
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.worker = None
+
+
+class OCRJobScheduler(QObject):
+    job_line = Signal(int, str)
+    job_finished = Signal(int, str)
+    job_failed = Signal(int, str)
+    job_cancelled = Signal(int)
+    state_changed = Signal()
+
+    def __init__(self, engine, cache=None, max_running=1, latest_wins=True, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.cache = cache
+        self.max_running = max(1, max_running)
+        self.latest_wins = latest_wins
+        self._next_id = 1
+        self._queued = collections.deque()
+        self._running = {}   # worker -> job，直到工作线程发出结束信号
+        self._threads = {}   # thread -> job，直到线程真正退出，避免对象提前回收
+
+    def submit(self, image, tiled=False, profile=None, preprocess=None, memory=None):
+        if self.latest_wins:
+            self.cancel_all()
+        job = OCRJob(self._next_id, image, tiled, profile, preprocess, memory)
+        self._next_id += 1
+        self._queued.append(job)
+        self._dispatch()
+        self.state_changed.emit()
+        return job.job_id
+
+    def cancel(self, job_id):
+        for job in self._queued:
+            if job.job_id == job_id:
+                self._queued.remove(job)
+                self.job_cancelled.emit(job_id)
+                self.state_changed.emit()
+                return True
+        for job in self._running.values():
+            if job.job_id == job_id and job.state == "running":
+                # 识别中的任务由引擎宿主中止引擎，必要时直接重启引擎进程
+                job.state = "cancelling"
+                job.cancel_event.set()
+                self.state_changed.emit()
+                return True
+        return False
+
+    def cancel_all(self):
+        for job in list(self._queued) + list(self._running.values()):
+            self.cancel(job.job_id)
+
+    def counts(self):
+        counts = {"queued": len(self._queued), "running": 0, "cancelling": 0}
+        for job in self._running.values():
+            counts[job.state] += 1
+        return counts
+
+    def summary(self):
+        counts = self.counts()
+        if not any(counts.values()):
+            return "空闲"
+        parts = [f"识别中 {counts['running']}", f"排队 {counts['queued']}"]
+        if counts["cancelling"]:
+            parts.append(f"取消中 {counts['cancelling']}")
+        return "，".join(parts)
+
+    def shutdown(self, timeout=ENGINE_CANCEL_GRACE + 1):
+        self.cancel_all()
+        for thread in list(self._threads):
+            thread.quit()
+            thread.wait(int(timeout * 1000))
+
+    def _dispatch(self):
+        while self._queued and len(self._running) < self.max_running:
+            self._start(self._queued.popleft())
+
+    def _start(self, job):
+        job.state = "running"
+        job.started = time.perf_counter()
+        METRICS.record("job.queue_wait", (job.started - job.submitted) * 1000)
+        job.thread = QThread(self)
+        job.worker = OCRWorker(
+            job.image, self.engine, self.cache, job.tiled, job.cancel_event, job.profile, job.preprocess,
+            job.memory
+        )
+        job.worker.moveToThread(job.thread)
+        self._running[job.worker] = job
+        self._threads[job.thread] = job
+
+        job.thread.started.connect(job.worker.run)
+        job.worker.line_ready.connect(self._on_line)
+        job.worker.result_ready.connect(self._on_result)
+        job.worker.error_occurred.connect(self._on_error)
+        job.worker.cancelled.connect(self._on_cancelled)
+        job.thread.finished.connect(self._on_thread_finished)
+        job.thread.start()
+
+    # 以下槽函数都在界面线程执行（排队连接），用 sender() 找到对应任务
+    def _on_line(self, text):
+        job = self._running.get(self.sender())
+        if job is not None and job.state == "running":
+            self.job_line.emit(job.job_id, text)
+
+    def _on_result(self, text):
+        self._finish(self.sender(), self.job_finished, text)
+
+    def _on_error(self, error_msg):
+        self._finish(self.sender(), self.job_failed, error_msg)
+
+    def _on_cancelled(self):
+        self._finish(self.sender(), None, None)
+
+    def _finish(self, worker, signal, payload):
+        job = self._running.pop(worker, None)
+        if job is None:
+            return
+        job.thread.quit()
+        METRICS.record_since("job.run", job.started)
+        # 取消后才完成的结果已经过时，同样按取消处理
+        if signal is None or job.state == "cancelling":
+            self.job_cancelled.emit(job.job_id)
+        else:
+            signal.emit(job.job_id, payload)
+        self._dispatch()
+        self.state_changed.emit()
+
+    def _on_thread_finished(self):
+        thread = self.sender()
+        self._threads.pop(thread, None)
+        thread.deleteLater()
+
+
 # ========== 截图部件 (美化选框和遮罩) ==========
+def grab_screens():
+    # 一次性截取所有显示器，按物理像素尺寸和位置与 QScreen 一一对应，返回 [(QScreen, mss 截图)]
+    import mss
+
+    with mss.mss() as sct:
+        shots = [sct.grab(monitor) for monitor in sct.monitors[1:]]
+    pairs = []
+    for screen in QApplication.screens():
+        if not shots:
+            break
+        geo = screen.geometry()
+        dpr = screen.devicePixelRatio()
+        width, height = round(geo.width() * dpr), round(geo.height() * dpr)
+        shot = min(shots, key=lambda s: (
+            abs(s.width - width) + abs(s.height - height),
+            abs(s.left - geo.x() * dpr) + abs(s.top - geo.y() * dpr)
+        ))
+        shots.remove(shot)
+        pairs.append((screen, shot))
+    return pairs
+
+
 class ScreenshotWidget(QtWidgets.QWidget):
     screenshot_taken = Signal(object)
+    region_selected = Signal(dict)  # 选中区域在虚拟桌面上的物理像素位置，供区域监视使用
+    closed = Signal()
     
-    def __init__(self):
+    def __init__(self, screen, shot):
         super().__init__()
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
+        # 每个显示器一个遮罩窗口，覆盖对应屏幕
+        self.setScreen(screen)
+        self.setGeometry(screen.geometry())
         self.setWindowState(Qt.WindowFullScreen)
         self.setCursor(Qt.CrossCursor)
         
-        with mss.mss() as sct:
-            self.monitor = sct.monitors[1]
-            screenshot = sct.grab(self.monitor)
-            self.pil_image = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
-            self.physical_width = screenshot.width
-            self.physical_height = screenshot.height
+        # mss 的 BGRA 缓冲区直接包装为 RGB32 QImage，不做任何拷贝；
+        # 缓冲区必须与 QImage 同生命周期，裁剪推迟到松开鼠标时只处理选中区域
+        self.raw = shot.raw
+        self.physical_left = shot.left
+        self.physical_top = shot.top
+        self.physical_width = shot.width
+        self.physical_height = shot.height
+        self.bg_image = QImage(self.raw, shot.width, shot.height, shot.width * 4, QImage.Format_RGB32)
         
-        screen = QApplication.primaryScreen()
         logical_rect = screen.geometry()
         self.logical_width = logical_rect.width()
         self.logical_height = logical_rect.height()
         self.scale_x = self.physical_width / self.logical_width
         self.scale_y = self.physical_height / self.logical_height
         
-        img_data = self.pil_image.tobytes()
-        qimg = QImage(img_data, self.pil_image.width, self.pil_image.height, QImage.Format_RGB888)
-        self.bg_pixmap = QPixmap.fromImage(qimg)
-        
         self.mask_opacity = 0.5  # 提高遮罩透明度，更清晰
         self.origin = QPoint()
         self.current_rect = QRect()
@@ -195,7 +2744,7 @@ class ScreenshotWidget(QtWidgets.QWidget):
     
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.drawPixmap(self.rect(), self.bg_pixmap)
+        painter.drawImage(QRectF(self.rect()), self.bg_image)
         painter.save()
         painter.setOpacity(self.mask_opacity)
         full_rect_f = QRectF(self.rect())
@@ -222,7 +2771,7 @@ class ScreenshotWidget(QtWidgets.QWidget):
             self.update()
     
     def mouseReleaseEvent(self, event):
-        self.rubberband。hide()
+        self.rubberband.hide()
         rect = self.current_rect
         if rect.width() <= 10 or rect.height() <= 10:
             self.close()
@@ -241,15 +2790,59 @@ class ScreenshotWidget(QtWidgets.QWidget):
             self.close()
             return
         
-        cropped = self.pil_image.crop((x1, y1, x2, y2))
+        self.region_selected.emit({
+            "left": self.physical_left + x1, "top": self.physical_top + y1,
+            "width": x2 - x1, "height": y2 - y1
+        })
+        with METRICS.stage("capture.crop"):
+            region = self.bg_image.copy(x1, y1, x2 - x1, y2 - y1)
+            cropped = Image.frombuffer(
+                "RGB", (region.width(), region.height()), region.constBits(),
+                "raw", "BGRX", region.bytesPerLine(), 1
+            ).copy()
+        METRICS.record_bytes("capture.crop", region.sizeInBytes())
         self.screenshot_taken.emit(cropped)
         self.close()
 
+    def closeEvent(self, event):
+        self.closed.emit()
+        super().closeEvent(event)
+
 
 # ========== 主窗口 =======
+PREVIEW_MAX_SIDE = 1024  # 界面只保留这么大的预览缩略图，原图在识别输入准备好后即释放
+
+
+def make_thumbnail(pil_img, max_size=(PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE)):
+    # 等比缩小到 max_size 以内；reducing_gap 让 PIL 先按整数倍快速降采样再精细缩放
+    scale = min(max_size[0] / pil_img.width, max_size[1] / pil_img.height)
+    if scale >= 1:
+        return pil_img
+    size = (max(1, int(pil_img.width * scale)), max(1, int(pil_img.height * scale)))
+    return pil_img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def preview_pixmap(pil_img, size):
+    # 识别结果旁的预览图：先在 PIL 中缩到显示区域大小，只有缩略图转成 RGBA 交给 Qt
+    pil_img = make_thumbnail(pil_img, (size.width(), size.height()))
+    if pil_img.mode != "RGBA":
+        pil_img = pil_img.convert("RGBA")
+    data = pil_img.tobytes("raw", "RGBA")
+    qimg = QImage(data, pil_img.width, pil_img.height, QImage.Format_RGBA8888)
+    return QPixmap.fromImage(qimg).scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
 class OCRMainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, backend_name=None):
         super().__init__()
+        self.backend_name = backend_name
+        # 先创建应用图标和系统托盘（同时在后台启动引擎池），再搭建主窗口的控件和样式
+        self.app_icon = self.create_app_icon()
+        self.setWindowIcon(self.app_icon)
+        self.create_tray_icon()
+        self.startup_timings = {"tray": (time.perf_counter() - STARTED_AT) * 1000}
+        self.first_ocr_pending = True
+
         # 窗口基础设置
         self.setWindowTitle("截屏OCR工具")
         self.resize(800, 500)  # 默认窗口尺寸
@@ -359,6 +2952,51 @@ class OCRMainWindow(QMainWindow):
         right_layout = QVBoxLayout()
         right_layout.setSpacing(10)
         
+        # 历史搜索框：输入关键词即时搜索过往的识别结果
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索识别历史")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setFixedHeight(34)
+        self.search_edit.setStyleSheet("""
+            QLineEdit {
+                background-color: #ffffff;
+                border: 1px solid #e0e0e0;
+                border-radius: 6px;
+                padding: 0 10px;
+                font-size: 13px;
+                color: #333333;
+            }
+            QLineEdit:focus {
+                border-color: #2196F3;
+            }
+        """)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)  # 停止输入后再查询，避免每个按键都重建列表
+        self.search_timer.timeout.connect(self.search_history)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        right_layout.addWidget(self.search_edit)
+
+        # 搜索结果列表，只在有搜索词时显示；点击一条把它的文字和缩略图载入下方
+        self.history_list = QListWidget()
+        self.history_list.setIconSize(QSize(64, 64))
+        self.history_list.setVisible(False)
+        self.history_list.setStyleSheet("""
+            QListWidget {
+                background-color: #ffffff;
+                border: 1px solid #e0e0e0;
+                border-radius: 8px;
+                font-size: 12px;
+                color: #333333;
+            }
+            QListWidget::item:selected {
+                background-color: #e3f2fd;
+                color: #333333;
+            }
+        """)
+        self.history_list.itemClicked.connect(self.show_history_item)
+        right_layout.addWidget(self.history_list)
+
         # 文本编辑框
         self.text_edit = QTextEdit()
         self.text_edit.setPlaceholderText("✨ 识别结果将显示在这里\n\n支持：截图识别 / 本地图片识别\n识别完成后可一键复制或保存")
@@ -435,21 +3073,57 @@ class OCRMainWindow(QMainWindow):
         right_layout.addLayout(btn_layout)
         content_layout.addLayout(right_layout, 1)
         main_layout.addLayout(content_layout)
+
+        # 3. 任务状态区域 (底部)：显示识别中/排队数量，可取消全部识别任务
+        status_layout = QHBoxLayout()
+        status_layout.setSpacing(10)
+        self.status_label = QLabel("任务：空闲")
+        self.status_label.setStyleSheet("""
+            QLabel {
+                color: #666666;
+                font-size: 12px;
+            }
+        """)
+        status_layout.addWidget(self.status_label, 1)
+
+        self.cancel_btn = QPushButton("取消识别")
+        self.cancel_btn.setFixedHeight(30)
+        self.cancel_btn.setCursor(Qt.PointingHandCursor)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #f5f5f5;
+                color: #333333;
+                border: 1px solid #e0e0e0;
+                border-radius: 6px;
+                font-size: 12px;
+                padding: 0 12px;
+            }
+            QPushButton:hover {
+                background-color: #eeeeee;
+                border-color: #d0d0d0;
+            }
+            QPushButton:disabled {
+                color: #aaaaaa;
+            }
+        """)
+        self.cancel_btn.clicked.connect(self.cancel_ocr_jobs)
+        status_layout.addWidget(self.cancel_btn)
+        main_layout.addLayout(status_layout)
         
         # 设置全局字体
         font = QFont()
         font.setFamily("Microsoft YaHei")  # 微软雅黑，更美观的中文字体
         font.setPointSize(12)
         self.setFont(font)
-        
-        # 创建应用图标
-        self.app_icon = self.create_app_icon()
-        self.setWindowIcon(self.app_icon)
-        
-        # 创建系统托盘
-        self.create_tray_icon()
         self.show()
 
+        self.startup_timings["window"] = (time.perf_counter() - STARTED_AT) * 1000
+        self.record_startup_timings()
+        # 界面显示后再在后台预热引擎，预热期间的截图照常排队识别
+        self.prewarm_stop = threading.Event()
+        QTimer.singleShot(PREWARM_DELAY_MS, self.start_prewarm)
+
     # 重写paintEvent实现窗口圆角
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -460,11 +3134,7 @@ class OCRMainWindow(QMainWindow):
         super().paintEvent(event)
 
     def create_app_icon(self):
-        icon_img = create_ocr_icon()
-        data = icon_img.tobytes("raw", "RGBA")
-        qimg = QImage(data, icon_img.width, icon_img.height, QImage.Format_RGBA8888)
-        pixmap = QPixmap.fromImage(qimg)
-        return QIcon(pixmap)
+        return QIcon(create_ocr_icon())
 
     def create_tray_icon(self):
         tray_icon = self.app_icon
@@ -474,17 +3144,284 @@ class OCRMainWindow(QMainWindow):
         tray_menu = QMenu()
         show_action = QAction("显示窗口", self)
         quit_action = QAction("退出", self)
+        # 大图分块识别开关：开启时超过 1280x720 的图片按全分辨率分块识别，不再整体缩小
+        self.tile_mode = True
+        tile_action = QAction("大图分块识别", self)
+        tile_action.setCheckable(True)
+        tile_action.setChecked(self.tile_mode)
+        # 增量识别：同一截图区域或同一文件再次识别时，只重识别内容变化的分块，其余沿用上次结果
+        self.incremental_mode = False
+        self.tile_memory = TileMemoryStore()
+        self.capture_source = None  # 最近一次截图选中的屏幕区域
+        incremental_action = QAction("增量识别（只重识别变化的部分）", self)
+        incremental_action.setCheckable(True)
+        incremental_action.setChecked(self.incremental_mode)
+        # 只保留最新任务：连续截图时丢弃尚未完成的旧任务，不再白白占用 CPU
+        latest_action = QAction("只保留最新任务", self)
+        latest_action.setCheckable(True)
+        latest_action.setChecked(True)
+        cancel_action = QAction("取消全部识别", self)
+        # 区域监视：选定区域后定时检查，画面变化时才重新识别
+        self.watch_action = QAction("监视屏幕区域", self)
+        self.unwatch_action = QAction("停止监视", self)
+        self.unwatch_action.setEnabled(False)
+        # 性能指标：各阶段耗时直方图，可查看或导出为 JSON
+        metrics_action = QAction("记录性能指标", self)
+        metrics_action.setCheckable(True)
+        metrics_action.setChecked(METRICS.enabled)
+        metrics_view_action = QAction("查看性能指标", self)
+        metrics_dump_action = QAction("导出性能指标", self)
+        # 本地识别服务：其他程序可通过 http://127.0.0.1:8765/ocr 共用本程序的常驻引擎
+        self.service_action = QAction(f"本地识别服务（端口 {SERVICE_PORT}）", self)
+        self.service_action.setCheckable(True)
+        # 推理线程：默认自动分配，也可固定为某个值
+        thread_menu = QMenu("推理线程", tray_menu)
+        thread_menu.setFont(QFont("Microsoft YaHei", 11))
+        thread_group = QActionGroup(self)
+        cores = os.cpu_count() or 1
+        for value in [None] + [n for n in (1, 2, 4, 8, 16) if n <= cores]:
+            action = QAction("自动" if value is None else f"{value} 线程", self)
+            action.setCheckable(True)
+            action.setChecked(value is None)
+            action.triggered.connect(lambda checked, value=value: self.set_engine_threads(value))
+            thread_group.addAction(action)
+            thread_menu.addAction(action)
+        # 识别流程：自动时单行截图只跑识别模型，也可对之后的任务固定某个流程
+        self.pipeline_profile = PIPELINE_PROFILE
+        profile_menu = QMenu("识别流程", tray_menu)
+        profile_menu.setFont(QFont("Microsoft YaHei", 11))
+        profile_group = QActionGroup(self)
+        profile_names = {
+            PROFILE_AUTO: "自动（单行文字只做识别）",
+            "full": "完整流程（检测 + 方向分类 + 识别）",
+            "no-cls": "跳过方向分类",
+            "rec-only": "仅识别（整张图视为一行）",
+        }
+        for value, title in profile_names.items():
+            action = QAction(title, self)
+            action.setCheckable(True)
+            action.setChecked(value == self.pipeline_profile)
+            action.triggered.connect(lambda checked, value=value: self.set_pipeline_profile(value))
+            profile_group.addAction(action)
+            profile_menu.addAction(action)
+        # 图像预处理：扫描件、拍照文档、深色界面等可先归一化、纠偏、二值化再送入引擎；需要 numpy
+        self.preprocess_profile = PREPROCESS_PROFILE
+        preprocess_menu = QMenu("图像预处理", tray_menu)
+        preprocess_menu.setFont(QFont("Microsoft YaHei", 11))
+        preprocess_group = QActionGroup(self)
+        preprocess_names = {
+            "none": "不处理",
+            "scale": "按字高缩放",
+            "clean": "灰度 + 对比度归一化 + 缩放",
+            "scan": "扫描件（再加纠偏和二值化）",
+        }
+        can_preprocess = preprocess_available()
+        for value, title in preprocess_names.items():
+            action = QAction(title, self)
+            action.setCheckable(True)
+            action.setChecked(value == self.preprocess_profile)
+            action.setEnabled(can_preprocess or not PREPROCESS_PROFILES[value])
+            action.triggered.connect(lambda checked, value=value: self.set_preprocess_profile(value))
+            preprocess_group.addAction(action)
+            preprocess_menu.addAction(action)
         # 美化托盘菜单
         show_action.setFont(QFont("Microsoft YaHei", 11))
+        tile_action.setFont(QFont("Microsoft YaHei", 11))
+        incremental_action.setFont(QFont("Microsoft YaHei", 11))
+        latest_action.setFont(QFont("Microsoft YaHei", 11))
+        cancel_action.setFont(QFont("Microsoft YaHei", 11))
+        self.watch_action.setFont(QFont("Microsoft YaHei", 11))
+        self.unwatch_action.setFont(QFont("Microsoft YaHei", 11))
+        metrics_action.setFont(QFont("Microsoft YaHei", 11))
+        metrics_view_action.setFont(QFont("Microsoft YaHei", 11))
+        metrics_dump_action.setFont(QFont("Microsoft YaHei", 11))
+        self.service_action.setFont(QFont("Microsoft YaHei", 11))
         quit_action.setFont(QFont("Microsoft YaHei", 11))
         show_action.triggered.connect(self.show_window)
+        tile_action.toggled.connect(self.set_tile_mode)
+        incremental_action.toggled.connect(self.set_incremental_mode)
+        latest_action.toggled.connect(self.set_latest_wins)
+        cancel_action.triggered.connect(self.cancel_ocr_jobs)
+        self.watch_action.triggered.connect(self.start_watch_selection)
+        self.unwatch_action.triggered.connect(self.stop_watch)
+        metrics_action.toggled.connect(self.set_metrics_enabled)
+        metrics_view_action.triggered.connect(self.show_metrics)
+        metrics_dump_action.triggered.connect(self.dump_metrics)
+        self.service_action.toggled.connect(self.set_service_enabled)
         quit_action.triggered.connect(self.quit_app)
         tray_menu.addAction(show_action)
+        tray_menu.addAction(tile_action)
+        tray_menu.addAction(incremental_action)
+        tray_menu.addAction(latest_action)
+        tray_menu.addAction(cancel_action)
+        tray_menu.addAction(self.watch_action)
+        tray_menu.addAction(self.unwatch_action)
+        tray_menu.addAction(metrics_action)
+        tray_menu.addAction(metrics_view_action)
+        tray_menu.addAction(metrics_dump_action)
+        tray_menu.addAction(self.service_action)
+        tray_menu.addMenu(thread_menu)
+        tray_menu.addMenu(profile_menu)
+        tray_menu.addMenu(preprocess_menu)
         tray_menu.addAction(quit_action)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.activated.connect(self.on_tray_activated)
         self.tray_icon.show()
 
+        # 托盘常驻时同时启动 OCR 引擎池，实例数按 CPU 核数分配，大图分块可并行识别；
+        # 后端选择和模型文件检查放在托盘出现之后
+        self.backend_name = self.backend_name or select_backend()
+        missing = backend_missing_files(self.backend_name)
+        if missing:
+            QMessageBox.critical(None, "错误", "以下文件缺失：\n" + "\n".join(missing))
+            sys.exit(1)
+        workers, num_thread = plan_engine_threads(None, None)
+        self.engine_pool = OCREnginePool(workers, self.backend_name, num_thread=num_thread)
+        self.engine_pool.start()
+        self.ocr_cache = OCRResultCache()
+        import sqlite3
+
+        try:
+            self.history = OCRHistory()
+        except (OSError, sqlite3.Error) as e:
+            print(f"识别历史不可用：{e}", file=sys.stderr)
+            self.history = None
+
+        # 同时识别的任务数与引擎实例数一致
+        self.job_previews = {}  # 任务编号 -> 预览缩略图
+        self.job_sources = {}   # 任务编号 -> 来源（截图或文件路径），写入识别历史
+        self.job_started = {}   # 任务编号 -> 发起时间，用于统计端到端耗时
+        self.current_job_id = None
+        self.scheduler = OCRJobScheduler(self.engine_pool, self.ocr_cache, workers, latest_action.isChecked(), self)
+        self.scheduler.job_line.connect(self.handle_ocr_line)
+        self.scheduler.job_finished.connect(self.on_job_finished)
+        self.scheduler.job_failed.connect(self.on_job_failed)
+        self.scheduler.job_cancelled.connect(self.on_job_cancelled)
+        self.scheduler.state_changed.connect(self.update_job_status)
+        self.watch_thread = None
+        self.watch_worker = None
+        self.ocr_service = None
+
+    def start_prewarm(self):
+        threading.Thread(target=self._prewarm, daemon=True).start()
+
+    def _prewarm(self):
+        try:
+            elapsed = self.engine_pool.prewarm(self.prewarm_stop)
+        except (OCREngineError, OCRCancelledError):
+            return  # 引擎不可用时由第一次识别提示错误
+        if not self.prewarm_stop.is_set():
+            self.startup_timings["prewarm"] = elapsed * 1000
+            METRICS.record("startup.prewarm", elapsed * 1000)
+
+    def set_tile_mode(self, enabled):
+        self.tile_mode = enabled
+
+    def set_incremental_mode(self, enabled):
+        self.incremental_mode = enabled
+
+    def set_latest_wins(self, enabled):
+        self.scheduler.latest_wins = enabled
+
+    def cancel_ocr_jobs(self):
+        self.scheduler.cancel_all()
+
+    def set_engine_threads(self, value):
+        self.engine_pool.budget.fixed = value
+
+    def set_pipeline_profile(self, value):
+        self.pipeline_profile = value
+
+    def set_preprocess_profile(self, value):
+        self.preprocess_profile = value
+
+    def set_service_enabled(self, enabled):
+        if not enabled:
+            if self.ocr_service is not None:
+                self.ocr_service.stop()
+                self.ocr_service = None
+            return
+        try:
+            self.ocr_service = OCRService(self.engine_pool, self.ocr_cache)
+        except OSError as e:
+            QMessageBox.critical(self, "本地识别服务", f"无法启动服务：{e}")
+            self.service_action.setChecked(False)
+            return
+        self.ocr_service.start()
+        self.tray_icon.showMessage("本地识别服务", f"已启动：{self.ocr_service.address}/ocr")
+
+    def record_startup_timings(self):
+        for name, value in self.startup_timings.items():
+            METRICS.record(f"startup.{name}", value)
+
+    def set_metrics_enabled(self, enabled):
+        # 启动耗时只发生一次：启动后才在托盘菜单开启指标时补记
+        first = enabled and not METRICS.enabled and "startup.tray" not in METRICS.snapshot()
+        METRICS.enabled = enabled
+        if first:
+            self.record_startup_timings()
+
+    def show_metrics(self):
+        if not METRICS.snapshot() and not METRICS.counters():
+            QMessageBox.information(self, "性能指标", "暂无数据，请先在托盘菜单开启“记录性能指标”。")
+            return
+        box = QMessageBox(QMessageBox.Information, "性能指标（毫秒 / 字节）", METRICS.report(), QMessageBox.Ok, self)
+        box.setStyleSheet("QLabel { font-family: Consolas, monospace; }")
+        box.exec()
+
+    def dump_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能指标", "ocr_metrics.json", "JSON 文件 (*.json)")
+        if path:
+            METRICS.dump(path)
+            QMessageBox.information(self, "成功", f"已导出到：\n{path}")
+
+    def start_watch(self, region):
+        self.stop_watch()
+        self.text_edit.setPlainText(
+            f"正在监视区域 {region['width']}x{region['height']}（{region['left']}, {region['top']}），"
+            "内容变化时自动识别..."
+        )
+        self.image_label.setText("区域监视中")
+        self.show_window()
+
+        self.watch_thread = QThread()
+        memory = TileMemory() if self.incremental_mode else None
+        self.watch_worker = WatchWorker(RegionWatcher(region, self.engine_pool, self.ocr_cache, memory=memory))
+        self.watch_worker.moveToThread(self.watch_thread)
+        self.watch_thread.started.connect(self.watch_worker.run)
+        self.watch_worker.text_changed.connect(self.handle_watch_text)
+        self.watch_worker.error_occurred.connect(self.handle_watch_text)
+        self.watch_thread.start()
+        self.watch_action.setEnabled(False)
+        self.unwatch_action.setEnabled(True)
+        self.update_job_status()
+
+    def stop_watch(self):
+        if self.watch_thread is None:
+            return
+        self.watch_worker.stop()
+        self.watch_thread.quit()
+        self.watch_thread.wait()
+        self.watch_thread = None
+        self.watch_worker = None
+        self.watch_action.setEnabled(True)
+        self.unwatch_action.setEnabled(False)
+        self.update_job_status()
+
+    def handle_watch_text(self, text):
+        # 每次变化追加一条带时间的记录
+        stamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self.text_edit.append(f"[{stamp}]\n{text}\n")
+
+    def update_job_status(self):
+        summary = self.scheduler.summary()
+        if self.watch_thread is not None:
+            summary += "，区域监视中"
+        self.status_label.setText(f"任务：{summary}")
+        self.tray_icon.setToolTip(f"截屏OCR工具 - {summary}")
+        counts = self.scheduler.counts()
+        self.cancel_btn.setEnabled(bool(counts["queued"] or counts["running"]))
+
     def on_tray_activated(self, reason):
         if reason in (QSystemTrayIcon.Trigger, QSystemTrayIcon.DoubleClick):
             self.show_window()
@@ -497,6 +3434,13 @@ class OCRMainWindow(QMainWindow):
             bring_window_to_front(int(self.winId()))
 
     def quit_app(self):
+        self.prewarm_stop.set()
+        self.set_service_enabled(False)
+        self.stop_watch()
+        self.scheduler.shutdown()
+        self.engine_pool.stop()
+        if self.history is not None:
+            self.history.close()
         QApplication.quit()
 
     def closeEvent(self, event):
@@ -508,17 +3452,48 @@ class OCRMainWindow(QMainWindow):
             event.accept()
 
     def start_screenshot(self):
+        self.capture_requested = time.perf_counter()
         self.hide()
         QApplication.processEvents()
         QTimer.singleShot(200, self._launch_screenshot)
 
-    def _launch_screenshot(self):
-        self.screenshot_widget = ScreenshotWidget()
-        self.screenshot_widget.screenshot_taken.connect(self.on_ocr_ready)
-        self.screenshot_widget.show()
+    def start_watch_selection(self):
+        self.capture_requested = time.perf_counter()
+        self.hide()
+        QApplication.processEvents()
+        QTimer.singleShot(200, lambda: self._launch_screenshot(watch=True))
+
+    def _launch_screenshot(self, watch=False):
+        # 所有显示器各自显示遮罩，任一遮罩完成或取消选择时全部关闭
+        self.screenshot_widgets = []
+        with METRICS.stage("capture.grab"):
+            pairs = grab_screens()
+        for screen, shot in pairs:
+            METRICS.record_bytes("capture.grab", len(shot.raw))
+            widget = ScreenshotWidget(screen, shot)
+            if watch:
+                widget.region_selected.connect(self.start_watch)
+            else:
+                widget.region_selected.connect(self.remember_capture_region)
+                widget.screenshot_taken.connect(self.on_ocr_ready)
+            widget.closed.connect(self.close_screenshot_widgets)
+            widget.show()
+            self.screenshot_widgets.append(widget)
+        # 从点击截图到遮罩出现（含隐藏主窗口的固定延时）
+        METRICS.record_since("capture.overlay", self.capture_requested)
+
+    def close_screenshot_widgets(self):
+        widgets, self.screenshot_widgets = self.screenshot_widgets, []
+        for widget in widgets:
+            widget.close()
+
+    def remember_capture_region(self, region):
+        # 选区先于截图发出；增量识别以屏幕区域区分来源，同一区域再次截图时沿用上次的分块结果
+        self.capture_source = ("region", region["left"], region["top"], region["width"], region["height"])
 
     def on_ocr_ready(self, pil_image):
-        self.current_screenshot = pil_image  # 保存截图用于显示
+        self.request_started = time.perf_counter()
+        source, self.capture_source = self.capture_source, None
 
         self.text_edit.setPlainText("正在识别，请稍候...")
         self.image_label.setText("识别中...")
@@ -530,35 +3505,12 @@ class OCRMainWindow(QMainWindow):
                 self.show_window()
                 return
 
-            # 图片缩放优化
-            max_width = 1280
-            max_height = 720
-            w, h = pil_image.size
-            if w > max_width or h > max_height:
-                scale = min(max_width/w, max_height/h)
-                new_w = int(w * scale)
-                new_h = int(h * scale)
-                pil_image = pil_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-
-            # 保存临时文件
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-                temp_path = tmp.name
-                pil_image.save(temp_path, "PNG")
-
-            # 启动异步 OCR
-            self.ocr_thread = QThread()
-            self.ocr_worker = OCRWorker(temp_path)
-            self.ocr_worker.moveToThread(self.ocr_thread)
-            
-            self.ocr_thread.started.connect(self.ocr_worker.run)
-            self.ocr_worker.result_ready.connect(self.handle_ocr_result)
-            self.ocr_worker.error_occurred.connect(self.handle_ocr_error)
-            self.ocr_worker.result_ready.connect(self.ocr_thread.quit)
-            self.ocr_worker.error_occurred.connect(self.ocr_thread.quit)
-            self.ocr_thread.finished.connect(lambda: os.unlink(temp_path))  # 自动清理
-            self.ocr_thread.finished.connect(self.ocr_thread.deleteLater)
-            
-            self.ocr_thread.start()
+            # 图片缩放优化（增量识别按全分辨率分块，不缩小）；界面只留缩略图用于显示
+            pil_image = prepare_ocr_image(pil_image, self.tile_mode or self.incremental_mode)
+            self.current_screenshot = make_thumbnail(pil_image)
+
+            # 直接把像素交给引擎，不再经过临时 PNG
+            self.start_ocr_job(pil_image, self.current_screenshot, "截图", source)
 
         except Exception as e:
             QMessageBox.critical(self, "预处理失败", str(e))
@@ -570,67 +3522,101 @@ class OCRMainWindow(QMainWindow):
             self,
             "选择图片文件",
             "",
-            "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif *.tiff);;所有文件 (*.*)"
+            "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif *.tiff *.tif *.pdf);;所有文件 (*.*)"
         )
         if not file_path:
             return  # 用户取消选择
         
         try:
-            # 加载本地图片
-            pil_image = Image.open(file_path)
-            # 保存图片引用（复用现有显示逻辑）
-            self.current_screenshot = pil_image
-            
+            self.request_started = time.perf_counter()
+            if is_multipage(file_path):
+                # 多页文档按路径提交，由工作线程逐页解码识别；预览只显示第一页
+                with contextlib.closing(iter_document_pages(file_path)) as pages:
+                    first = next(pages, None)
+                if first is None:
+                    raise RuntimeError("文档没有任何页面")
+                self.current_screenshot = make_thumbnail(first[1])
+                self.text_edit.setPlainText("正在识别，请稍候...")
+                self.image_label.setText("识别中...")
+                self.start_ocr_job(file_path, self.current_screenshot, file_path)
+                return
+
             self.text_edit.setPlainText("正在识别，请稍候...")
             self.image_label.setText("识别中...")
             QApplication.processEvents()
-            
-            # 复用图片缩放优化逻辑，保证识别效率
-            max_width = 1280
-            max_height = 720
-            w, h = pil_image.size
-            if w > max_width or h > max_height:
-                scale = min(max_width/w, max_height/h)
-                new_w = int(w * scale)
-                new_h = int(h * scale)
-                pil_image = pil_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            
-            # 保存为临时文件（和截图逻辑一致）
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-                temp_path = tmp.name
-                pil_image.save(temp_path, "PNG")
-            
+
+            # 加载本地图片并按识别尺寸缩放（JPEG 直接低分辨率解码），只保留缩略图用于显示
+            pil_image = load_ocr_image(file_path, self.tile_mode or self.incremental_mode)
+            self.current_screenshot = make_thumbnail(pil_image)
+
             # 复用异步OCR线程逻辑，保证代码一致性
-            self.ocr_thread = QThread()
-            self.ocr_worker = OCRWorker(temp_path)
-            self.ocr_worker.moveToThread(self.ocr_thread)
-            
-            self.ocr_thread.started.connect(self.ocr_worker.run)
-            self.ocr_worker.result_ready.connect(self.handle_ocr_result)
-            self.ocr_worker.error_occurred.connect(self.handle_ocr_error)
-            self.ocr_worker.result_ready.connect(self.ocr_thread.quit)
-            self.ocr_worker.error_occurred.connect(self.ocr_thread.quit)
-            self.ocr_thread.finished.connect(lambda: os.unlink(temp_path))
-            self.ocr_thread.finished.connect(self.ocr_thread.deleteLater)
-            
-            self.ocr_thread.start()
+            self.start_ocr_job(pil_image, self.current_screenshot, file_path, ("file", file_path))
             
         except Exception as e:
             QMessageBox.critical(self, "图片加载失败", f"无法加载所选图片：{str(e)}")
 
+    def start_ocr_job(self, pil_image, preview, source, memory_key=None):
+        # 空白截图（误点、纯色区域）由 ocr_image 直接判定，不会送入引擎
+        memory = None
+        if self.incremental_mode and memory_key is not None:
+            memory = self.tile_memory.get(memory_key)
+        # 提交给调度器排队识别；只有最新提交的任务会实时显示逐行结果
+        job_id = self.scheduler.submit(
+            pil_image, self.tile_mode or memory is not None, self.pipeline_profile, self.preprocess_profile, memory
+        )
+        self.job_previews[job_id] = preview
+        self.job_sources[job_id] = source
+        self.job_started[job_id] = self.request_started
+        self.current_job_id = job_id
+        self.streaming_started = False
+
+    def handle_ocr_line(self, job_id, text):
+        if job_id != self.current_job_id:
+            return
+        # 第一行到达时清掉等待提示并显示窗口，之后逐行追加
+        if not self.streaming_started:
+            self.streaming_started = True
+            METRICS.record_since("first_line", self.job_started[job_id])
+            self.text_edit.clear()
+            self.show_window()
+        self.text_edit.append(text)
+
+    def on_job_finished(self, job_id, full_text):
+        preview = self.job_previews.pop(job_id)
+        source = self.job_sources.pop(job_id)
+        # 已被更新的提交取代的任务晚完成时只记入历史，不覆盖正在显示的结果
+        if job_id == self.current_job_id:
+            self.current_screenshot = preview
+            with METRICS.stage("display"):
+                self.handle_ocr_result(full_text)
+        if self.history is not None:
+            self.history.add(full_text, source, preview)
+        # 从选定区域（或选好图片）到结果显示完毕
+        started = self.job_started.pop(job_id)
+        METRICS.record_since("end_to_end", started)
+        if self.first_ocr_pending:
+            self.first_ocr_pending = False
+            self.startup_timings["first_ocr"] = (time.perf_counter() - started) * 1000
+            METRICS.record("startup.first_ocr", self.startup_timings["first_ocr"])
+
+    def on_job_failed(self, job_id, error_msg):
+        self.job_previews.pop(job_id, None)
+        self.job_sources.pop(job_id, None)
+        self.job_started.pop(job_id, None)
+        if job_id == self.current_job_id:
+            self.handle_ocr_error(error_msg)
+
+    def on_job_cancelled(self, job_id):
+        self.job_previews.pop(job_id, None)
+        self.job_sources.pop(job_id, None)
+        self.job_started.pop(job_id, None)
+        if job_id == self.current_job_id:
+            self.text_edit.setPlainText("识别已取消")
+            self.image_label.setText("已取消")
+
     def handle_ocr_result(self, full_text):
         try:
-            pil_img = self.current_screenshot
-            if pil_img.mode != "RGBA":
-                pil_img = pil_img.convert("RGBA")
-            data = pil_img.tobytes("raw", "RGBA")
-            qimg = QImage(data, pil_img.width, pil_img.height, QImage.Format_RGBA8888)
-            pixmap = QPixmap.fromImage(qimg).scaled(
-                self.image_label.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.image_label.setPixmap(pixmap)
+            self.image_label.setPixmap(preview_pixmap(self.current_screenshot, self.image_label.size()))
             self.text_edit.setPlainText(full_text)
         except Exception as e:
             QMessageBox.critical(self, "显示错误", str(e))
@@ -641,7 +3627,43 @@ class OCRMainWindow(QMainWindow):
         QMessageBox.critical(self, "OCR 识别失败", error_msg)
         self.show_window()
 
+    def search_history(self):
+        query = self.search_edit.text().strip()
+        self.history_list.clear()
+        if not query or self.history is None:
+            self.history_list.setVisible(False)
+            return
+        rows = self.history.search(query)
+        for _, created, source, text, thumbnail in rows:
+            when = datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M")
+            snippet = " ".join(text.split())[:60]
+            item = QListWidgetItem(f"{when}  {os.path.basename(source)}\n{snippet}")
+            if thumbnail:
+                pixmap = QPixmap()
+                pixmap.loadFromData(thumbnail)
+                item.setIcon(QIcon(pixmap))
+            item.setData(Qt.UserRole, (text, thumbnail))
+            self.history_list.addItem(item)
+        if not rows:
+            self.history_list.addItem("没有匹配的识别记录")
+        self.history_list.setVisible(True)
+
+    def show_history_item(self, item):
+        record = item.data(Qt.UserRole)
+        if record is None:
+            return
+        text, thumbnail = record
+        self.text_edit.setPlainText(text)
+        if thumbnail:
+            pixmap = QPixmap()
+            pixmap.loadFromData(thumbnail)
+            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        else:
+            self.image_label.setText("无预览")
+
     def copy_text(self):
+        import pyperclip
+
         pyperclip.copy(self.text_edit.toPlainText())
         QMessageBox.information(self, "提示", "已复制到剪贴板！", QMessageBox.Ok, QMessageBox.Ok)
 
@@ -655,29 +3677,1206 @@ class OCRMainWindow(QMainWindow):
             QMessageBox.information(self, "成功", f"已保存到：\n{path}")
 
 
-# ========== 启动程序 ==========
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    
-    # 检查引擎是否存在
-    engine_path = get_engine_path()
-    models_dir = get_models_dir()
-    missing = []
-    if not os.path.exists(engine_path):
-        missing.append(engine_path)
-    required_models = [
-        "ppocr_keys_v1.txt",
-        "ch_PP-OCRv4_det_infer.onnx",
-        "ch_ppocr_mobile_v2.0_cls_infer.onnx"，
-        "ch_PP-OCRv4_rec_infer.onnx"
+# ========== 批量识别（命令行） ==========
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff", ".tif", ".webp")
+if importlib.util.find_spec("pypdfium2") is not None:
+    IMAGE_EXTS += (".pdf",)  # 目录中的 PDF 只在能渲染时才收集
+
+
+def iter_batch_inputs(inputs):
+    # 支持单个文件、目录（递归）以及 @list.txt 形式的文件列表（每行一个路径）
+    for item in inputs:
+        if item.startswith("@"):
+            with open(item[1:], encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield line.strip()
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTS):
+                        yield os.path.join(root, name)
+        else:
+            yield item
+
+
+def load_finished_paths(output_path):
+    # 断点续跑：输出中已有成功记录的输入直接跳过，出错的记录下次重试。
+    # 返回 路径 -> 已完成页码集合；普通图片记为 None，多页文档只重试未完成的页
+    done = collections.defaultdict(set)
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 中断时只写了一半的行
+            if "error" not in record:
+                done[record["path"]].add(record.get("page"))
+    return done
+
+
+def result_record(result):
+    # 批量输出和本地服务共用的 JSON 结构
+    text = render_plain_text(result)
+    return {
+        "text": "" if text == NO_TEXT else text,
+        "lines": [
+            {"text": line.text, "polygon": line.polygon, "score": round(line.score, 4)}
+            for line in result.lines
+        ],
+    }
+
+
+def iter_file_pages(path, tiled=False, skip=()):
+    # 把一个输入展开为识别任务 (页码, 图片)：普通图片为 (None, None)，由 ocr_file 自行加载；
+    # 多页文档在后台逐页解码，skip 中的页不解码，只有一页时页码记为 None。文件无法读取时抛出异常
+    pages = document_page_count(path) if is_document(path) else 1
+    if pages == 1 and not path.lower().endswith(".pdf"):
+        yield None, None
+        return
+    for page, image in prefetch(iter_document_pages(path, tiled, set(skip) if pages > 1 else set())):
+        yield (page if pages > 1 else None), image
+
+
+def ocr_file(path, engine, cache=None, tiled=False, page=None, image=None, profile=None, preprocess=None):
+    # image 为多页文档中已解码的一页（page 为其页码）；否则从 path 加载单张图片
+    start = time.perf_counter()
+    record = {"path": path}
+    if page is not None:
+        record["page"] = page
+    try:
+        if image is None:
+            image = load_ocr_image(path, tiled)
+        result = ocr_image(image, engine, cache, tiled, profile=profile, preprocess=preprocess)
+        record.update(result_record(result))
+        METRICS.record("file", (time.perf_counter() - start) * 1000)
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(inputs, output_path, workers=None, num_thread=None, backend_name=None, cache=None, tiled=False,
+              max_threads=None):
+    import concurrent.futures
+
+    workers, num_thread = plan_engine_threads(workers, num_thread)
+    done = load_finished_paths(output_path)
+
+    # 上次中断可能留下不完整的末行，先补换行再追加
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    else:
+        needs_newline = False
+
+    stats = {"ok": 0, "error": 0, "skipped": 0}
+    pool = OCREnginePool(workers, backend_name, num_thread=num_thread, max_threads=max_threads)
+    finished = sum(len(pages) for pages in done.values())
+    print(f"批量识别：{workers} 个引擎，{pool.budget.describe()}，已完成 {finished} 个将跳过", file=sys.stderr)
+    pool.start()
+    try:
+        with open(output_path, "a", encoding="utf-8") as out, \
+                concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            if needs_newline:
+                out.write("\n")
+
+            def write_record(record):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                stats["error" if "error" in record else "ok"] += 1
+                page = f" 第 {record['page']} 页" if "page" in record else ""
+                print(f"[{stats['ok'] + stats['error']}] {record['path']}{page}", file=sys.stderr)
+
+            def write(futures):
+                # 结果完成一条写一条，不在内存中累积
+                for future in futures:
+                    write_record(future.result())
+
+            running = set()
+
+            def submit(*args):
+                # 在途任务数有上限，输入再多内存也保持平稳
+                nonlocal running
+                if len(running) >= workers * 2:
+                    finished, running = concurrent.futures.wait(
+                        running, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    write(finished)
+                running.add(executor.submit(ocr_file, *args))
+
+            for path in iter_batch_inputs(inputs):
+                path = os.path.abspath(path)
+                if None in done.get(path, ()):
+                    stats["skipped"] += 1
+                    continue
+                # 多页文档：后台逐页解码（已完成的页不解码），每页作为一个任务分给引擎池，逐页输出记录
+                stats["skipped"] += len(done[path])
+                try:
+                    for page, image in iter_file_pages(path, tiled, done[path]):
+                        done[path].add(page)
+                        submit(path, pool, cache, tiled, page, image)
+                except Exception as e:
+                    write_record({"path": path, "error": str(e), "elapsed": 0.0})
+            write(concurrent.futures.as_completed(running))
+    finally:
+        pool.stop()
+
+    print(f"完成：成功 {stats['ok']}，失败 {stats['error']}，跳过 {stats['skipped']}", file=sys.stderr)
+    if cache is not None:
+        print(f"缓存：{cache.stats()}", file=sys.stderr)
+    return stats
+
+
+# ========== 分布式批量识别 ==========
+# 一台机器跑不完时，由协调端（--batch ... --listen）把输入文件分给其他机器上的识别节点（--worker），
+# 节点用与本地批量相同的引擎池和 ocr_file 流水线识别，结果逐页流回协调端写入同一个 JSONL。
+# 节点按空闲槽位主动领取任务，快的节点自然领得多；协调端没有待分配任务时，空闲节点会领取其他节点
+# 手里最早发出的任务的副本（工作窃取），先完成的一份生效。每个任务有租约，节点定期心跳续约；
+# 连接断开或租约过期的任务重新排队，多次失败后记为错误。协议为 TCP 上的长度前缀 JSON 帧，
+# 没有加密，只应在可信网络中使用；--token 可要求节点提供共享口令
+CLUSTER_PORT = 8766
+CLUSTER_LEASE = 30           # 任务租约（秒），节点每次心跳续约
+CLUSTER_BEAT = 5             # 节点心跳间隔（秒）
+CLUSTER_MAX_ATTEMPTS = 3     # 同一任务最多分配几次（不含窃取的副本）
+CLUSTER_RETRY_DELAY = 2      # 节点连不上协调端时的重试间隔（秒）
+CLUSTER_FRAME = struct.Struct("!II")  # 帧头：JSON 长度、附带数据长度
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port or CLUSTER_PORT)
+
+
+def send_frame(sock, header, payload=b""):
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(CLUSTER_FRAME.pack(len(data), len(payload)) + data)
+    if payload:
+        sock.sendall(payload)
+
+
+def _read_exact(rfile, size):
+    data = rfile.read(size)
+    if len(data) < size:
+        raise EOFError("连接已关闭")
+    return data
+
+
+def recv_frame(rfile):
+    header_size, payload_size = CLUSTER_FRAME.unpack(_read_exact(rfile, CLUSTER_FRAME.size))
+    header = json.loads(_read_exact(rfile, header_size))
+    return header, _read_exact(rfile, payload_size) if payload_size else b""
+
+
+class ClusterTask:
+    def __init__(self, task_id, path, skip):
+        self.task_id = task_id
+        self.path = path
+        self.skip = set(skip)    # 已写出的页：断点续跑读到的，以及之前的尝试已流回的
+        self.attempts = 0
+        self.leases = {}         # 节点 -> 租约到期时间（monotonic）
+        self.dispatched = None
+        self.done = False
+
+
+class ClusterNode:
+    def __init__(self, sock, name, slots):
+        self.sock = sock
+        self.name = name
+        self.slots = slots
+        self.credit = 0          # 节点还能接收的任务数
+        self.tasks = set()       # 持有的任务编号
+        self._send_lock = threading.Lock()
+
+    def send(self, header, payload=b""):
+        with self._send_lock:
+            send_frame(self.sock, header, payload)
+
+
+class ClusterHandler:
+    # 连接处理逻辑；socketserver 在创建协调端时才导入，与 StreamRequestHandler 组合（见 make_cluster_server）
+    def handle(self):
+        coordinator = self.server.coordinator
+        # 超过租约时间没有任何消息（包括心跳）的节点视为失联
+        self.request.settimeout(CLUSTER_LEASE)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        node = None
+        try:
+            hello, _ = recv_frame(self.rfile)
+            node = coordinator.join(self.request, hello)
+            if node is None:
+                return
+            while True:
+                header, _ = recv_frame(self.rfile)
+                coordinator.on_message(node, header)
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            if node is not None:
+                coordinator.leave(node)
+
+
+def make_cluster_server(address):
+    import socketserver
+
+    class ClusterServer(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    return ClusterServer(address, type("ClusterRequestHandler", (ClusterHandler, socketserver.StreamRequestHandler), {}))
+
+
+class ClusterCoordinator:
+    def __init__(self, paths, done, out, settings, host="0.0.0.0", port=CLUSTER_PORT, token=None):
+        self.tasks = {i: ClusterTask(i, path, done[path]) for i, path in enumerate(paths)}
+        self.pending = collections.deque(self.tasks)
+        self.remaining = len(self.tasks)
+        self.nodes = []
+        self.settings = settings
+        self.token = token
+        self.stats = {"ok": 0, "error": 0, "stolen": 0, "retried": 0}
+        self.finished = threading.Event()
+        self._out = out
+        self._lock = threading.Lock()
+        if not self.tasks:
+            self.finished.set()
+        self.server = make_cluster_server((host, port))
+        self.server.coordinator = self
+        self.address = f"{host}:{self.server.server_address[1]}"
+
+    def join(self, sock, hello):
+        if hello.get("op") != "hello" or hello.get("token") != self.token:
+            send_frame(sock, {"op": "reject", "error": "口令不符或协议不兼容"})
+            return None
+        node = ClusterNode(sock, f"{hello.get('name')}@{sock.getpeername()[0]}", hello.get("slots", 1))
+        node.send({"op": "config", **self.settings})
+        with self._lock:
+            self.nodes.append(node)
+        print(f"识别节点加入：{node.name}（{node.slots} 个引擎）", file=sys.stderr)
+        return node
+
+    def leave(self, node):
+        with self._lock:
+            self.nodes.remove(node)
+            for task_id in list(node.tasks):
+                self._release(node, self.tasks[task_id])
+            assignments = self._assign()
+        print(f"识别节点离开：{node.name}", file=sys.stderr)
+        self._send_tasks(assignments)
+
+    def on_message(self, node, header):
+        op = header.get("op")
+        with self._lock:
+            if op == "want":
+                node.credit += header.get("count", 0)
+            elif op == "beat":
+                deadline = time.monotonic() + CLUSTER_LEASE
+                for task_id in node.tasks.intersection(header.get("tasks", ())):
+                    self.tasks[task_id].leases[node] = deadline
+            elif op in ("record", "done"):
+                # 编号不存在的任务（协调端重启前领取的旧任务、协议不一致）只记录，不能让一条消息拖垮协调端
+                task = self.tasks.get(header.get("task"))
+                if task is None:
+                    print(f"忽略未知任务的消息：{header.get('task')}（{node.name}）", file=sys.stderr)
+                elif op == "record":
+                    self._write(task, header.get("record", {}))
+                else:
+                    self._complete(node, task)
+            assignments = self._assign()
+        self._send_tasks(assignments)
+
+    def _write(self, task, record):
+        # 同一页只采用最先流回的一份（窃取的副本、重试都可能重复识别）
+        page = record.get("page")
+        if task.done or page in task.skip:
+            return
+        task.skip.add(page)
+        record["path"] = task.path
+        self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._out.flush()
+        self.stats["error" if "error" in record else "ok"] += 1
+        suffix = f" 第 {page} 页" if page is not None else ""
+        print(f"[{self.stats['ok'] + self.stats['error']}] {task.path}{suffix}", file=sys.stderr)
+
+    def _complete(self, node, task):
+        node.tasks.discard(task.task_id)
+        task.leases.pop(node, None)
+        if task.done:
+            return
+        task.done = True
+        self.remaining -= 1
+        # 其他节点上的副本作废，尚未开始的会被跳过
+        for other in list(task.leases):
+            other.tasks.discard(task.task_id)
+            self._notify(other, {"op": "cancel", "task": task.task_id})
+        task.leases.clear()
+        if self.remaining == 0:
+            self.finished.set()
+
+    def _release(self, node, task):
+        # 节点失联或租约过期：没有其他副本在跑的任务重新排队，次数用完记为错误
+        node.tasks.discard(task.task_id)
+        task.leases.pop(node, None)
+        if task.done or task.leases:
+            return
+        if task.attempts >= CLUSTER_MAX_ATTEMPTS:
+            self._write(task, {"error": f"分配 {task.attempts} 次均未完成", "elapsed": 0.0})
+            task.done = True
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.finished.set()
+            return
+        self.stats["retried"] += 1
+        self.pending.appendleft(task.task_id)
+
+    def _assign(self):
+        # 在锁内决定分配，发送（包括读取文件）在锁外进行
+        assignments = []
+        for node in sorted(self.nodes, key=lambda n: len(n.tasks)):
+            while node.credit > 0:
+                task = self._next_task(node)
+                if task is None:
+                    break
+                node.credit -= 1
+                node.tasks.add(task.task_id)
+                task.leases[node] = time.monotonic() + CLUSTER_LEASE
+                assignments.append((node, task, sorted(p for p in task.skip if p is not None)))
+        return assignments
+
+    def _next_task(self, node):
+        while self.pending:
+            task = self.tasks[self.pending.popleft()]
+            if not task.done:
+                task.attempts += 1
+                task.dispatched = time.monotonic()
+                return task
+        if node.tasks:
+            return None
+        # 工作窃取：队列已空、节点完全空闲时，领取其他节点手里最早发出、还没有副本的任务
+        candidates = [t for t in self.tasks.values() if not t.done and len(t.leases) == 1 and node not in t.leases]
+        if not candidates:
+            return None
+        self.stats["stolen"] += 1
+        return min(candidates, key=lambda t: t.dispatched)
+
+    def _send_tasks(self, assignments):
+        for node, task, skip in assignments:
+            try:
+                with open(task.path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                self._fail_task(node, task, str(e))
+                continue
+            name = os.path.basename(task.path)
+            self._notify(node, {"op": "task", "task": task.task_id, "name": name, "skip": skip}, data)
+
+    def _fail_task(self, node, task, error):
+        with self._lock:
+            self._write(task, {"error": error, "elapsed": 0.0})
+            self._complete(node, task)
+            node.credit += 1
+            assignments = self._assign()
+        self._send_tasks(assignments)
+
+    def _notify(self, node, header, payload=b""):
+        try:
+            node.send(header, payload)
+        except OSError:
+            # 发送失败说明连接已断，由该节点的读线程负责回收任务
+            with contextlib.suppress(OSError):
+                node.sock.shutdown(socket.SHUT_RDWR)
+
+    def expire_leases(self):
+        now = time.monotonic()
+        with self._lock:
+            for task in self.tasks.values():
+                for node, deadline in list(task.leases.items()):
+                    if deadline < now:
+                        print(f"任务租约过期：{task.path}（{node.name}）", file=sys.stderr)
+                        self._release(node, task)
+            assignments = self._assign()
+        self._send_tasks(assignments)
+
+    def run(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            while not self.finished.wait(1):
+                self.expire_leases()
+            # 全部完成才通知节点退出；中断时节点会一直重连，协调端重跑后继续
+            with self._lock:
+                nodes = list(self.nodes)
+            for node in nodes:
+                self._notify(node, {"op": "finish"})
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def run_cluster_batch(inputs, output_path, listen, tiled=False, token=None):
+    done = load_finished_paths(output_path)
+    paths = []
+    skipped = 0
+    for path in iter_batch_inputs(inputs):
+        path = os.path.abspath(path)
+        if None in done.get(path, ()):
+            skipped += 1
+            continue
+        skipped += len(done[path])
+        if done[path] and is_document(path):
+            # 多页文档的页都已完成时不再分发；读不出页数的交给识别节点报错
+            try:
+                if len(done[path]) >= document_page_count(path):
+                    continue
+            except Exception:
+                pass
+        paths.append(path)
+    settings = {"tiled": tiled, "profile": PIPELINE_PROFILE, "preprocess": PREPROCESS_PROFILE}
+
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    else:
+        needs_newline = False
+    with open(output_path, "a", encoding="utf-8") as out:
+        if needs_newline:
+            out.write("\n")
+        coordinator = ClusterCoordinator(paths, done, out, settings, *listen, token=token)
+        print(f"分布式批量识别：{len(paths)} 个文件待识别，监听 {coordinator.address}，等待识别节点连接", file=sys.stderr)
+        try:
+            coordinator.run()
+        except KeyboardInterrupt:
+            print("已中断，用同样的命令重跑可继续", file=sys.stderr)
+    stats = coordinator.stats
+    stats["skipped"] = skipped
+    print(f"完成：成功 {stats['ok']}，失败 {stats['error']}，跳过 {skipped}，"
+          f"重新分配 {stats['retried']}，窃取 {stats['stolen']}", file=sys.stderr)
+    return stats
+
+
+class ClusterWorker:
+    # 识别节点的一次连接：读线程接收任务，投递线程把任务展开成页交给引擎池，心跳线程续约
+    def __init__(self, sock, pool, cache, slots):
+        self.sock = sock
+        self.pool = pool
+        self.cache = cache
+        self.slots = slots
+        self.settings = {}
+        self.held = set()          # 已收到、尚未完成的任务
+        self.cancelled = set()
+        self.tasks = queue.Queue()
+        self.closed = threading.Event()
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def send(self, header):
+        with self._send_lock:
+            send_frame(self.sock, header)
+
+    def run(self, name, token):
+        # 返回 True 表示协调端宣布全部完成
+        rfile = self.sock.makefile("rb")
+        self.send({"op": "hello", "name": name, "slots": self.slots, "token": token})
+        header, _ = recv_frame(rfile)
+        if header["op"] == "reject":
+            raise RuntimeError(header["error"])
+        if PREPROCESS_PROFILES[header["preprocess"]] and not preprocess_available():
+            raise RuntimeError("协调端要求的图像预处理需要安装 numpy")
+        self.settings = header
+        # 每个引擎预取一个任务，网络传输与识别重叠
+        self.send({"op": "want", "count": self.slots * 2})
+        threads = [threading.Thread(target=self._feed, daemon=True), threading.Thread(target=self._beat, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                header, payload = recv_frame(rfile)
+                if header["op"] == "task":
+                    with self._lock:
+                        self.held.add(header["task"])
+                    self.tasks.put((header, payload))
+                elif header["op"] == "cancel":
+                    with self._lock:
+                        self.cancelled.add(header["task"])
+                elif header["op"] == "finish":
+                    return True
+        except (EOFError, OSError):
+            return False
+        finally:
+            self.closed.set()
+            self.tasks.put(None)
+            for thread in threads:
+                thread.join()
+
+    def _beat(self):
+        while not self.closed.wait(CLUSTER_BEAT):
+            with self._lock:
+                held = sorted(self.held)
+            with contextlib.suppress(OSError):
+                self.send({"op": "beat", "tasks": held})
+
+    def _feed(self):
+        import concurrent.futures
+
+        running = set()
+        with concurrent.futures.ThreadPoolExecutor(self.slots) as executor:
+            while True:
+                item = self.tasks.get()
+                if item is None or self.closed.is_set():
+                    break
+                header, data = item
+                with self._lock:
+                    skip_task = header["task"] in self.cancelled
+                if skip_task:
+                    self._finish(header["task"], None)
+                    continue
+                running = self._run_task(executor, running, header, data)
+            concurrent.futures.wait(running)
+
+    def _run_task(self, executor, running, header, data):
+        # 收到的文件写入临时文件（保留扩展名以识别多页文档），逐页提交到引擎池；在途页数有上限
+        import concurrent.futures
+
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(header["name"])[1])
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        task_id = header["task"]
+        pending = [1]  # 展开完成前先占一个计数，避免最后一页完成时误判任务结束
+        pending_lock = threading.Lock()
+
+        def page_finished(future):
+            record = future.result()
+            if "error" in record:
+                # 错误信息里的临时文件路径换回协调端的文件名
+                record["error"] = record["error"].replace(temp_path, header["name"])
+            try:
+                self.send({"op": "record", "task": task_id, "record": record})
+            except OSError:
+                pass
+            with pending_lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                self._finish(task_id, temp_path)
+
+        try:
+            for page, image in iter_file_pages(temp_path, self.settings["tiled"], header["skip"]):
+                if self.closed.is_set():
+                    break
+                if len(running) >= self.slots * 2:
+                    _, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                with pending_lock:
+                    pending[0] += 1
+                future = executor.submit(
+                    ocr_file, temp_path, self.pool, self.cache, self.settings["tiled"], page, image,
+                    self.settings["profile"], self.settings["preprocess"]
+                )
+                future.add_done_callback(page_finished)
+                running.add(future)
+        except Exception as e:
+            error = str(e).replace(temp_path, header["name"])
+            with contextlib.suppress(OSError):
+                self.send({"op": "record", "task": task_id, "record": {"error": error, "elapsed": 0.0}})
+        with pending_lock:
+            pending[0] -= 1
+            last = pending[0] == 0
+        if last:
+            self._finish(task_id, temp_path)
+        return running
+
+    def _finish(self, task_id, temp_path):
+        if temp_path is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+        with self._lock:
+            self.held.discard(task_id)
+            self.cancelled.discard(task_id)
+        with contextlib.suppress(OSError):
+            self.send({"op": "done", "task": task_id})
+            self.send({"op": "want", "count": 1})
+
+
+def run_cluster_worker(address, workers=None, num_thread=None, backend_name=None, cache=None, max_threads=None,
+                       token=None):
+    workers, num_thread = plan_engine_threads(workers, num_thread)
+    pool = OCREnginePool(workers, backend_name, num_thread=num_thread, max_threads=max_threads)
+    pool.start()
+    name = socket.gethostname()
+    print(f"识别节点：{workers} 个引擎，{pool.budget.describe()}，协调端 {address[0]}:{address[1]}", file=sys.stderr)
+    try:
+        while True:
+            try:
+                sock = socket.create_connection(address)
+            except OSError:
+                time.sleep(CLUSTER_RETRY_DELAY)  # 协调端尚未启动或正在重启
+                continue
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                if ClusterWorker(sock, pool, cache, workers).run(name, token):
+                    print("协调端已完成全部任务", file=sys.stderr)
+                    return True
+            except RuntimeError as e:
+                print(f"协调端拒绝：{e}", file=sys.stderr)
+                return False
+            finally:
+                sock.close()
+            print("与协调端的连接断开，重新连接", file=sys.stderr)
+            time.sleep(CLUSTER_RETRY_DELAY)
+    except KeyboardInterrupt:
+        return False
+    finally:
+        pool.stop()
+
+
+# ========== 区域监视（命令行） ==========
+def run_watch(region, interval=WATCH_INTERVAL, num_thread=None, backend_name=None, incremental=False):
+    # 无界面区域监视：文字每变化一次向标准输出写一行 JSON，Ctrl+C 结束
+    engine = OCREngineHost(backend_name, num_thread=num_thread)
+    engine.start()
+    watcher = RegionWatcher(region, engine, interval=interval, memory=TileMemory() if incremental else None)
+    stop_event = threading.Event()
+
+    def emit(text):
+        record = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "text": text}
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+
+    try:
+        watcher.run(emit, stop_event, lambda error: print(error, file=sys.stderr))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    print(f"共截取 {watcher.frames} 帧，识别 {watcher.ocr_runs} 次", file=sys.stderr)
+
+
+def parse_region(value):
+    left, top, width, height = (int(v) for v in value.split(","))
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+# ========== 视频识别（命令行） ==========
+# 屏幕录像逐帧流式解码（需要 PyAV），每帧由解码器直接缩成降采样灰度图作为感知哈希，与区域监视一样
+# 按块比较：与上一关键帧的任一块差超过阈值才算变化。变化后画面稳定一小段时间才取为关键帧，
+# 打字、滚动过程中的中间帧不识别；与最近几个关键帧之一相同（光标闪烁、来回切换的画面）时直接沿用其结果。
+# 每行文字从出现到消失合并为一段，带起止时间输出。内存中只有当前帧、在途的关键帧和屏幕上的行，与视频长度无关
+VIDEO_EXTS = (".mp4", ".mkv", ".webm", ".mov", ".avi", ".m4v", ".flv", ".ts")
+VIDEO_DIFF_THRESHOLD = 24   # 比 WATCH_DIFF_THRESHOLD 高：有损压缩的块噪声可达十几级灰度
+VIDEO_SETTLE = 0.7          # 画面保持多久（秒）不变才取为关键帧，长于常见的光标闪烁半周期（0.5~0.6 秒）
+VIDEO_SETTLE_MAX = 2.0      # 画面持续变化（如滚动输出）时，最长隔多久也取一帧
+VIDEO_RECENT = 8            # 记住最近几个关键帧的哈希和识别结果
+
+
+def open_video(path):
+    try:
+        import av
+    except ImportError:
+        raise RuntimeError("识别视频需要安装 PyAV：pip install av")
+    container = av.open(path)
+    if not container.streams.video:
+        container.close()
+        raise RuntimeError("文件中没有视频流")
+    return container
+
+
+def iter_video_frames(path):
+    # 逐帧解码，产出 (秒, 帧)；解码出的帧不做颜色转换，用完即释放
+    container = open_video(path)
+    try:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        rate = float(stream.average_rate or 25)
+        for index, frame in enumerate(container.decode(stream)):
+            yield (frame.time if frame.time is not None else index / rate), frame
+    finally:
+        container.close()
+
+
+def frame_signature(frame):
+    # 感知哈希：解码器直接输出 1/4 尺寸的灰度图（每像素即一个 4x4 块的均值），不展开全尺寸 RGB
+    small = frame.reformat(
+        width=max(1, frame.width // WATCH_DOWNSAMPLE), height=max(1, frame.height // WATCH_DOWNSAMPLE),
+        format="gray", interpolation="AREA"
+    )
+    plane = small.planes[0]
+    return Image.frombuffer("L", (small.width, small.height), bytes(plane), "raw", "L", plane.line_size, 1)
+
+
+def similar_frames(a, b, threshold=VIDEO_DIFF_THRESHOLD):
+    return a.size == b.size and ImageChops.difference(a, b).getextrema()[1] <= threshold
+
+
+def frame_image(frame, tiled=False):
+    # 与 prepare_ocr_image 相同的识别尺寸，由解码器一步缩放并转成 RGB
+    w, h = frame.width, frame.height
+    if not tiled and (w > MAX_OCR_WIDTH or h > MAX_OCR_HEIGHT):
+        scale = min(MAX_OCR_WIDTH / w, MAX_OCR_HEIGHT / h)
+        w, h = int(w * scale), int(h * scale)
+    return frame.to_image(width=w, height=h, interpolation="AREA")
+
+
+def iter_keyframes(frames, stats, settle=VIDEO_SETTLE, settle_max=VIDEO_SETTLE_MAX):
+    # 从 (秒, 帧) 流中挑出关键帧，产出 (变化开始的时间, 帧, 哈希)。
+    # 与上一关键帧不同的画面先作为候选，保持 settle 秒不变才产出；又变回上一关键帧时丢弃候选
+    base = None         # 上一关键帧的哈希
+    candidate = None    # [出现时间, 帧, 哈希]
+    changed_at = 0.0    # 与上一关键帧开始不同的时间
+    for t, frame in frames:
+        stats["frames"] += 1
+        stats["end"] = t
+        with METRICS.stage("video.hash"):
+            signature = frame_signature(frame)
+        if candidate is not None and similar_frames(signature, candidate[2]):
+            if t - candidate[0] >= settle:
+                base = candidate[2]
+                yield changed_at, candidate[1], base
+                candidate = None
+            continue
+        if base is not None and similar_frames(signature, base):
+            candidate = None
+            continue
+        if candidate is None:
+            changed_at = t
+        candidate = [t, frame, signature]
+        if t - changed_at >= settle_max:
+            base = signature
+            yield changed_at, frame, signature
+            candidate = None
+    if candidate is not None:
+        yield changed_at, candidate[1], candidate[2]
+
+
+def screen_rows(lines):
+    # 检测有时把同一行拆成几段、有时不拆：按纵向重叠把段拼回整行，逐帧比较才稳定
+    rows = []
+    for line in sorted(lines, key=lambda line: min(y for _, y in line.polygon)):
+        top = min(y for _, y in line.polygon)
+        bottom = max(y for _, y in line.polygon)
+        if rows and rows[-1][0] <= (top + bottom) / 2 <= rows[-1][1]:
+            rows[-1][2].append(line)
+        else:
+            rows.append([top, bottom, [line]])
+    return [
+        " ".join(line.text for line in sorted(parts, key=lambda line: min(x for x, _ in line.polygon)))
+        for _, _, parts in rows
     ]
-    for m in required_models:
-        if not os.path.exists(os.path.join(models_dir, m)):
-            missing.append(os.path.join(models_dir, m))
-    
+
+
+class TextSegments:
+    # 屏幕上每行文字从出现到消失合并为一段，忽略空白差异；同样的文字同时出现多行时各自计段
+    def __init__(self):
+        self.open = {}  # 去掉空白的文字 -> (首次识别出的文字, 各行的出现时间)
+
+    def update(self, t, texts):
+        # 以 t 时刻屏幕上的文字更新，返回已消失的段 [(开始, 结束, 文字)]，按开始时间排序
+        counts = collections.Counter()
+        shown = {}
+        for text in texts:
+            key = "".join(text.split())
+            counts[key] += 1
+            shown.setdefault(key, text)
+        closed = []
+        for key, (text, starts) in list(self.open.items()):
+            while len(starts) > counts.get(key, 0):
+                closed.append((starts.pop(), t, text))
+            if not starts:
+                del self.open[key]
+        for key, count in counts.items():
+            _, starts = self.open.setdefault(key, (shown[key], []))
+            starts.extend([t] * (count - len(starts)))
+        closed.sort(key=lambda segment: segment[0])
+        return closed
+
+
+def video_frame_text(image, engine, cache=None, tiled=False):
+    # 关键帧的文字行，合并空白后用于跨帧比较；识别失败时返回 None，屏幕上的段保持不变
+    try:
+        result = ocr_image(prepare_ocr_image(image, tiled), engine, cache, tiled)
+    except OCREngineError as e:
+        print(f"关键帧识别失败：{e}", file=sys.stderr)
+        return None
+    return [text for text in (" ".join(row.split()) for row in screen_rows(result.lines)) if text]
+
+
+def scan_video(path, engine, executor, emit, cache=None, tiled=False, depth=2):
+    # 关键帧交给 executor 识别，解码继续向前；在途的关键帧最多 depth 个，按时间顺序合并结果
+    stats = {"frames": 0, "keyframes": 0, "ocr": 0, "segments": 0, "end": 0.0}
+    segments = TextSegments()
+    recent = collections.deque(maxlen=VIDEO_RECENT)  # (哈希, 识别结果的 future)
+    pending = collections.deque()                    # (时间, future)
+
+    def flush(segments_closed):
+        for start, end, text in segments_closed:
+            stats["segments"] += 1
+            emit({"path": path, "start": round(start, 2), "end": round(end, 2), "text": text})
+
+    def drain(limit):
+        while pending and (len(pending) > limit or pending[0][1].done()):
+            t, future = pending.popleft()
+            texts = future.result()
+            if texts is not None:
+                flush(segments.update(t, texts))
+
+    for t, frame, signature in iter_keyframes(iter_video_frames(path), stats):
+        stats["keyframes"] += 1
+        future = next((f for s, f in recent if similar_frames(signature, s)), None)
+        if future is None:
+            stats["ocr"] += 1
+            with METRICS.stage("video.convert"):
+                image = frame_image(frame, tiled)
+            future = executor.submit(video_frame_text, image, engine, cache, tiled)
+            recent.append((signature, future))
+        pending.append((t, future))
+        drain(depth)
+    drain(0)
+    flush(segments.update(stats["end"], []))
+    return stats
+
+
+def run_video(paths, workers=None, num_thread=None, backend_name=None, cache=None, tiled=False, max_threads=None):
+    # 无界面视频识别：文字段以 JSONL 输出到标准输出，解码与识别帧数的统计输出到标准错误
+    import concurrent.futures
+
+    workers, num_thread = plan_engine_threads(workers, num_thread)
+    pool = OCREnginePool(workers, backend_name, num_thread=num_thread, max_threads=max_threads)
+    pool.start()
+    failed = 0
+
+    def emit(record):
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            for path in paths:
+                try:
+                    stats = scan_video(path, pool, executor, emit, cache, tiled, workers * 2)
+                except Exception as e:
+                    failed += 1
+                    print(f"{path}：{e}", file=sys.stderr)
+                    continue
+                ratio = stats["frames"] / stats["ocr"] if stats["ocr"] else 0
+                print(f"{path}：解码 {stats['frames']} 帧，关键帧 {stats['keyframes']} 个，识别 {stats['ocr']} 帧"
+                      f"（每 {ratio:.0f} 帧识别一次），输出 {stats['segments']} 段", file=sys.stderr)
+    except KeyboardInterrupt:
+        failed += 1
+    finally:
+        pool.stop()
+    return failed == 0
+
+
+# ========== 本地识别服务 ==========
+# 供本机其他程序调用：POST /ocr 发送图片字节，返回 JSON 结构化结果；GET /health 查看状态。
+# 监听 127.0.0.1 或 Unix 套接字，共用同一个常驻引擎池；HTTP/1.1 保持连接，客户端可复用连接连续请求
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_QUEUE = 16                      # 引擎全忙时最多排队的请求数，超出直接返回 503
+SERVICE_MAX_BYTES = 32 * 1024 * 1024    # 单个请求体上限
+SERVICE_IDLE_TIMEOUT = 30               # 保持连接的空闲超时（秒）
+
+
+class OCRServiceHandler:
+    # 请求处理逻辑；http.server 在启动服务时才导入，与 BaseHTTPRequestHandler 组合（见 make_service_server）
+    protocol_version = "HTTP/1.1"
+    timeout = SERVICE_IDLE_TIMEOUT
+
+    def do_GET(self):
+        import urllib.parse
+
+        if urllib.parse.urlsplit(self.path).path != "/health":
+            self._reply(404, {"error": "未知路径"})
+            return
+        self._reply(200, self.server.service.status())
+
+    def do_POST(self):
+        import urllib.parse
+
+        url = urllib.parse.urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 请求体长度未知，无法读取，连接也无法继续复用
+            self.close_connection = True
+            self._reply(400, {"error": "Content-Length 无效"})
+            return
+        if length > SERVICE_MAX_BYTES:
+            # 请求体未读取，连接无法继续复用
+            self.close_connection = True
+            self._reply(413, {"error": f"图片超过 {SERVICE_MAX_BYTES} 字节"})
+            return
+        body = self.rfile.read(length)
+        if url.path != "/ocr":
+            self._reply(404, {"error": "未知路径"})
+            return
+        if not body:
+            self._reply(400, {"error": "请求体为空，应为图片文件内容"})
+            return
+        query = urllib.parse.parse_qs(url.query)
+        tiled = query.get("tile", ["0"])[0] == "1"
+        profile = query.get("profile", [None])[0]
+        if profile not in (None, PROFILE_AUTO) + PIPELINE_PROFILES:
+            self._reply(400, {"error": f"未知的识别流程：{profile}"})
+            return
+        preprocess = query.get("preprocess", [None])[0]
+        if preprocess is not None and preprocess not in PREPROCESS_PROFILES:
+            self._reply(400, {"error": f"未知的预处理流程：{preprocess}"})
+            return
+        if PREPROCESS_PROFILES.get(preprocess) and not preprocess_available():
+            self._reply(400, {"error": "图像预处理需要安装 numpy"})
+            return
+        service = self.server.service
+        if not service.admit():
+            self._reply(503, {"error": "识别服务繁忙，请稍后重试"}, {"Retry-After": "1"})
+            return
+        try:
+            status, payload = service.handle(body, tiled, profile, preprocess, query.get("source", [None])[0])
+        finally:
+            service.release()
+        self._reply(status, payload)
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # 不逐条打印请求日志
+
+
+def make_service_server(host, port, socket_path=None):
+    import http.server
+    import socketserver
+
+    handler = type("OCRServiceRequestHandler", (OCRServiceHandler, http.server.BaseHTTPRequestHandler), {})
+    if socket_path:
+        if not hasattr(socketserver, "UnixStreamServer"):
+            raise OSError("当前系统不支持 Unix 套接字")
+
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        return UnixHTTPServer(socket_path, handler)
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class OCRService:
+    def __init__(self, engine, cache=None, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=None,
+                 max_queue=SERVICE_QUEUE):
+        self.engine = engine
+        self.cache = cache
+        self.socket_path = socket_path
+        # 同时识别的请求数等于引擎实例数，另外最多 max_queue 个排队，其余立即拒绝（背压）
+        self.capacity = len(getattr(engine, "hosts", ())) or 1
+        self.max_pending = self.capacity + max_queue
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+        self.tile_memory = TileMemoryStore()  # ?source= 指定来源时增量识别
+        self._lock = threading.Lock()
+        self._thread = None
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.server = make_service_server(host, port, socket_path)
+            self.address = socket_path
+        else:
+            self.server = make_service_server(host, port)
+            self.address = f"http://{host}:{self.server.server_address[1]}"
+        self.server.service = self
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def admit(self):
+        with self._lock:
+            if self.active >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self.served += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                "backend": getattr(self.engine, "backend_name", None),
+                "engines": self.capacity,
+                "active": self.active,
+                "max_pending": self.max_pending,
+                "served": self.served,
+                "rejected": self.rejected,
+            }
+
+    def handle(self, body, tiled=False, profile=None, preprocess=None, source=None):
+        start = time.perf_counter()
+        memory = self.tile_memory.get(source) if source else None
+        tiled = tiled or memory is not None  # 增量识别按全分辨率分块
+        try:
+            image = load_ocr_image(io.BytesIO(body), tiled)
+        except Exception as e:
+            return 400, {"error": f"无法解析图片：{e}"}
+        try:
+            result = ocr_image(
+                image, self.engine, self.cache, tiled, profile=profile, preprocess=preprocess, memory=memory
+            )
+        except OCREngineError as e:
+            return 500, {"error": str(e)}
+        record = result_record(result)
+        record["timings"] = result.timings
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        METRICS.record_since("service.request", start)
+        return 200, record
+
+
+def run_service(host, port, socket_path, workers=None, num_thread=None, backend_name=None, cache=None,
+                max_threads=None):
+    workers, num_thread = plan_engine_threads(workers, num_thread)
+    pool = OCREnginePool(workers, backend_name, num_thread=num_thread, max_threads=max_threads)
+    pool.start()
+    service = OCRService(pool, cache, host, port, socket_path)
+    print(f"本地识别服务：{service.address}（{workers} 个引擎，{pool.budget.describe()}），Ctrl+C 结束", file=sys.stderr)
+    try:
+        service.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        pool.stop()
+
+
+# ========== 启动程序 ==========
+def require_backend(name):
+    # 命令行模式：选择可用的 OCR 后端，缺少所需文件时直接退出
+    backend_name = name or select_backend()
+    missing = backend_missing_files(backend_name)
     if missing:
-        QMessageBox.critical(None, "错误", f"以下文件缺失：\n" + "\n".join(missing))
+        print("以下文件缺失：\n" + "\n".join(missing), file=sys.stderr)
         sys.exit(1)
-    
-    window = OCRMainWindow()
+    return backend_name
+
+
+if __name__ == '__main__':
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+
+        multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="截屏OCR工具")
+    parser.add_argument("--batch", nargs="+", metavar="INPUT", help="批量识别：图片文件、目录或 @文件列表")
+    parser.add_argument("--output", default="ocr_results.jsonl", help="批量识别结果（JSONL，支持断点续跑）")
+    parser.add_argument("--workers", type=int, help="并行引擎实例数，默认按 CPU 核数 / 线程数")
+    parser.add_argument("--numThread", type=int, help="固定每次识别的推理线程数；默认按图片大小和并发识别数自动分配")
+    parser.add_argument("--maxThreads", type=int, help="自动分配时单次识别的线程上限")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), help="指定 OCR 后端")
+    parser.add_argument("--cache", action="store_true", help="批量识别时启用结果缓存（内存 + 磁盘）")
+    parser.add_argument("--tile", action="store_true", help="大图按全分辨率分块识别，不再缩小到 1280x720")
+    parser.add_argument("--watch", type=parse_region, metavar="LEFT,TOP,WIDTH,HEIGHT",
+                        help="监视屏幕区域（物理像素），文字变化时以 JSONL 输出到标准输出")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="区域监视轮询间隔（秒）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="区域监视时增量识别：画面变化后只重识别内容变化的分块")
+    parser.add_argument("--video", nargs="+", metavar="FILE",
+                        help="识别屏幕录像：只识别内容变化的关键帧，文字段（带起止秒数）以 JSONL 输出到标准输出")
+    parser.add_argument("--blankThreshold", type=int, default=BLANK_MIN_EDGES,
+                        help="空白检测阈值（强边缘像素数），低于该值的图片不调用引擎；0 关闭检测")
+    parser.add_argument("--profile", choices=(PROFILE_AUTO,) + PIPELINE_PROFILES, default=PIPELINE_PROFILE,
+                        help="识别流程：auto 时单行文字只跑识别模型，置信度不足再走完整流程")
+    parser.add_argument("--preprocess", choices=tuple(PREPROCESS_PROFILES), default=PREPROCESS_PROFILE,
+                        help="图像预处理：scale 按字高缩放，clean 再加对比度归一化，scan 再加纠偏和二值化（需要 numpy）")
+    parser.add_argument("--metrics", metavar="PATH", help="记录各阶段耗时，结束时导出为 JSON")
+    parser.add_argument("--serve", action="store_true", help="以无界面方式运行本地识别服务")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="本地识别服务端口（仅监听 127.0.0.1）")
+    parser.add_argument("--socket", metavar="PATH", help="本地识别服务改为监听 Unix 套接字")
+    parser.add_argument("--listen", type=parse_address, metavar="HOST:PORT",
+                        help="与 --batch 一起使用：作为协调端把文件分给识别节点，如 0.0.0.0:8766")
+    parser.add_argument("--worker", type=parse_address, metavar="HOST:PORT", help="作为识别节点连接协调端")
+    parser.add_argument("--token", default=os.environ.get("OCR_CLUSTER_TOKEN"),
+                        help="协调端与识别节点的共享口令（也可用环境变量 OCR_CLUSTER_TOKEN）")
+    args, qt_args = parser.parse_known_args()
+    BLANK_MIN_EDGES = args.blankThreshold
+    PIPELINE_PROFILE = args.profile
+    if PREPROCESS_PROFILES[args.preprocess] and not preprocess_available():
+        parser.error("图像预处理需要安装 numpy（pip install numpy）")
+    PREPROCESS_PROFILE = args.preprocess
+    if args.metrics:
+        METRICS.enabled = True
+
+    if args.batch and args.listen:
+        # 协调端只分发文件、汇总结果，不加载引擎
+        stats = run_cluster_batch(args.batch, args.output, args.listen, args.tile, args.token)
+        sys.exit(1 if stats["error"] else 0)
+
+    if args.worker:
+        backend_name = require_backend(args.backend)
+        cache = OCRResultCache() if args.cache else None
+        ok = run_cluster_worker(
+            args.worker, args.workers, args.numThread, backend_name, cache, args.maxThreads, args.token
+        )
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        sys.exit(0 if ok else 1)
+
+    if args.batch:
+        backend_name = require_backend(args.backend)
+        cache = OCRResultCache() if args.cache else None
+        stats = run_batch(
+            args.batch, args.output, args.workers, args.numThread, backend_name, cache, args.tile, args.maxThreads
+        )
+        if args.metrics:
+            METRICS.dump(args.metrics)
+            print(METRICS.report(), file=sys.stderr)
+        sys.exit(1 if stats["error"] else 0)
+
+    if args.serve:
+        backend_name = require_backend(args.backend)
+        cache = OCRResultCache() if args.cache else None
+        run_service(
+            SERVICE_HOST, args.port, args.socket, args.workers, args.numThread, backend_name, cache, args.maxThreads
+        )
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        sys.exit(0)
+
+    if args.video:
+        backend_name = require_backend(args.backend)
+        cache = OCRResultCache() if args.cache else None
+        ok = run_video(args.video, args.workers, args.numThread, backend_name, cache, args.tile, args.maxThreads)
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        sys.exit(0 if ok else 1)
+
+    if args.watch:
+        backend_name = require_backend(args.backend)
+        run_watch(args.watch, args.interval, args.numThread, backend_name, args.incremental)
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        sys.exit(0)
+
+    # 界面模式在托盘出现后才选择后端、检查模型文件（见 create_tray_icon）
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = OCRMainWindow(args.backend)
     sys.exit(app.exec())
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import multiprocessing
+
+# 无界面运行：预览图转换同样走 Qt，但不需要显示器
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QSize
+from PySide6.QtWidgets import QApplication
+from PIL import Image, ImageDraw, ImageFont
+
+import OCR
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows 下不统计峰值内存
+
+
+# ========== 基准设置 ==========
+# 固定语料：几种常见截图分辨率的合成文字图，文字由固定种子生成，每次运行完全一致
+RESOLUTIONS = [(640, 360), (1280, 720), (1920, 1080), (3840, 2160)]
+CORPUS_SEED = 20240601
+LINE_HEIGHT = 40
+PREVIEW_SIZE = QSize(370, 400)  # 主窗口默认尺寸下预览区域的大小
+REGRESSION_TOLERANCE = 0.15     # p50/p95 比基线慢超过 15% 视为退化
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+WORDS = [
+    "截图", "识别", "文字", "引擎", "模型", "结果", "复制", "保存", "托盘", "窗口",
+    "screen", "capture", "engine", "result", "text", "image", "line", "model", "batch", "cache",
+]
+
+# 替身引擎：按 RapidOcrOnnx.exe 的输出格式，每 48 像素高度输出一行固定文本，
+# 只读取 BMP 文件头，不做推理，用来把引擎本身的波动从流水线开销中剥离出去
+STANDIN_ENGINE = '''#!{python}
+import struct
+import sys
+
+args = sys.argv[1:]
+path = args[args.index("--image") + 1]
+padding = int(args[args.index("--padding") + 1])
+with open(path, "rb") as f:
+    header = f.read(26)
+width, height = struct.unpack("<ii", header[18:26])
+height = abs(height)
+count = max(1, min(60, height // 48))
+right = min(width, 600) + padding
+out = ["=====Start detect=====", "dbNetTime(1.0ms)"]
+for i in range(count):
+    top = i * 48 + padding
+    out.append(
+        f"TextBox[{{i}}](+padding)[score(0.900),[x: {{padding}}, y: {{top}}], [x: {{right}}, y: {{top}}], "
+        f"[x: {{right}}, y: {{top + 30}}], [x: {{padding}}, y: {{top + 30}}]]"
+    )
+    out.append(f"angle[{{i}}][index(0), score(0.99), time(0.1ms)]")
+out.append("---------- step: crnnNet getTextLine ----------")
+for i in range(count):
+    out.append(f"textLine[{{i}}](基准测试 benchmark line {{i}})")
+    out.append(f"textScores[{{i}}]{{{{0.9,0.95,0.9}}}}")
+    out.append(f"crnnTime[{{i}}](0.5ms)")
+out.append("=====End detect=====")
+out.append("FullDetectTime(5.0ms)")
+out.extend(f"基准测试 benchmark line {{i}}" for i in range(count))
+sys.stdout.buffer.write(("\\n".join(out) + "\\n").encode("utf-8"))
+'''
+
+
+def make_corpus():
+    font = ImageFont.load_default(size=24)
+    rng = random.Random(CORPUS_SEED)
+    corpus = []
+    for width, height in RESOLUTIONS:
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        for y in range(10, height - LINE_HEIGHT, LINE_HEIGHT):
+            text = " ".join(rng.choice(WORDS) for _ in range(max(1, width // 120)))
+            draw.text((20, y), text, fill="black", font=font)
+        corpus.append((f"{width}x{height}", image))
+    return corpus
+
+
+def install_standin(workdir):
+    # 写出替身引擎和占位模型目录，并通过环境变量让 OCR.py（及其引擎子进程）使用它们
+    engine_path = os.path.join(workdir, "RapidOcrOnnx")
+    with open(engine_path, "w", encoding="utf-8") as f:
+        f.write(STANDIN_ENGINE.format(python=sys.executable))
+    os.chmod(engine_path, 0o755)
+    models_dir = os.path.join(workdir, "models")
+    os.makedirs(models_dir, exist_ok=True)
+    for name in OCR.REQUIRED_MODELS:
+        open(os.path.join(models_dir, name), "wb").close()
+    os.environ["OCR_ENGINE_PATH"] = engine_path
+    os.environ["OCR_MODELS_DIR"] = models_dir
+
+
+def run_once(image, engine, tiled):
+    # 与界面中一次识别相同的路径：预处理 -> 引擎（传输/编码/推理/解析）-> 文本 -> 预览图
+    start = time.perf_counter()
+    prepared = OCR.prepare_ocr_image(image, tiled)
+    text = OCR.run_ocr(prepared, engine, None, tiled)
+    with OCR.METRICS.stage("display"):
+        OCR.preview_pixmap(image, PREVIEW_SIZE)
+    elapsed = (time.perf_counter() - start) * 1000
+    if text == OCR.NO_TEXT:
+        raise RuntimeError("引擎没有返回任何文字，请检查引擎配置")
+    return elapsed
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(latencies):
+    total = sum(latencies)
+    return {
+        "runs": len(latencies),
+        "throughput": round(len(latencies) / (total / 1000), 2),
+        "p50": round(percentile(latencies, 0.50), 2),
+        "p95": round(percentile(latencies, 0.95), 2),
+        "p99": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def peak_rss_mb():
+    # Linux 下 ru_maxrss 单位为 KB；子进程只统计已退出的（引擎宿主在停止后计入）
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": round(own / 1024, 1), "children": round(children / 1024, 1)}
+
+
+def run_benchmark(engine_name, repeat, warmup, tiled, num_thread):
+    corpus = make_corpus()
+    backend = "exe" if engine_name == "standin" else engine_name
+    missing = OCR.backend_missing_files(backend)
+    if missing:
+        raise SystemExit("以下文件缺失：\n" + "\n".join(missing))
+
+    engine = OCR.OCREngineHost(backend, num_thread=num_thread)
+    engine.start()
+    results = {}
+    try:
+        for name, image in corpus:
+            for _ in range(warmup):
+                run_once(image, engine, tiled)
+            OCR.METRICS.reset()
+            latencies = [run_once(image, engine, tiled) for _ in range(repeat)]
+            results[name] = summarize(latencies)
+            results[name]["stages"] = {
+                stage: round(summary["p50"], 2)
+                for stage, summary in OCR.METRICS.snapshot().items()
+                if not stage.endswith(".bytes")
+            }
+            print(
+                f"{name:>10}  {results[name]['throughput']:>8.2f}/s  p50 {results[name]['p50']:>8.2f}ms  "
+                f"p95 {results[name]['p95']:>8.2f}ms  p99 {results[name]['p99']:>8.2f}ms",
+                file=sys.stderr
+            )
+    finally:
+        engine.stop()
+
+    return {
+        "engine": engine_name,
+        "tiled": tiled,
+        "repeat": repeat,
+        "num_thread": num_thread,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "peak_rss_mb": peak_rss_mb(),
+        "resolutions": results,
+    }
+
+
+def compare(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    # 只与同一引擎、同样设置的基线比较；返回退化项列表
+    if (baseline.get("engine"), baseline.get("tiled")) != (report["engine"], report["tiled"]):
+        print("基线的引擎或分块设置不同，跳过比较", file=sys.stderr)
+        return []
+    regressions = []
+    for name, current in report["resolutions"].items():
+        previous = baseline["resolutions"].get(name)
+        if previous is None:
+            continue
+        for key in ("p50", "p95"):
+            ratio = current[key] / previous[key] if previous[key] else 1.0
+            print(f"{name:>10}  {key}  {previous[key]:>8.2f} -> {current[key]:>8.2f}ms  ({ratio - 1:+.1%})", file=sys.stderr)
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name} {key} 变慢 {ratio - 1:.1%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="截屏OCR 流水线基准测试")
+    parser.add_argument("--engine", choices=["standin", "onnx", "exe"], default="standin",
+                        help="standin 为替身引擎，只测流水线本身的开销")
+    parser.add_argument("--repeat", type=int, default=20, help="每种分辨率的测量次数")
+    parser.add_argument("--warmup", type=int, default=2, help="每种分辨率测量前的预热次数")
+    parser.add_argument("--tile", action="store_true", help="大图按全分辨率分块识别")
+    parser.add_argument("--numThread", type=int, default=4, help="引擎推理线程数")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件（JSON）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为新的基线")
+    parser.add_argument("--output", help="本次结果另存为 JSON")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="允许的变慢比例")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    OCR.METRICS.enabled = True
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.engine == "standin":
+            install_standin(workdir)
+        report = run_benchmark(args.engine, args.repeat, args.warmup, args.tile, args.numThread)
+    print(f"峰值内存：{report['peak_rss_mb']}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已保存基线：{args.baseline}", file=sys.stderr)
+        sys.exit(0)
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("性能退化：\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("未发现性能退化", file=sys.stderr)
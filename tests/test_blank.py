@@ -0,0 +1,21 @@
+from PIL import Image, ImageDraw, ImageFont
+
+import OCR
+
+
+def test_plain_and_noisy_backgrounds_are_blank():
+    assert OCR.is_blank_image(Image.new("RGB", (1920, 1080), (240, 240, 240)))
+    image = Image.new("L", (1920, 1080), 200)
+    image.putpixel((500, 500), 0)
+    assert OCR.is_blank_image(image)
+
+
+def test_small_word_on_a_large_page_is_not_blank():
+    # 只有一个 20 像素高的 "OK"，降采样 4 倍后边缘像素很少，但折算回原图仍超过下限
+    image = Image.new("L", (8000, 6000), 255)
+    ImageDraw.Draw(image).text((4000, 3000), "OK", fill=0, font=ImageFont.load_default(size=20))
+    assert not OCR.is_blank_image(image)
+
+
+def test_threshold_zero_disables_the_check():
+    assert not OCR.is_blank_image(Image.new("RGB", (64, 64), "white"), min_edges=0)
@@ -0,0 +1,48 @@
+import sys
+import types
+
+import OCR
+
+
+def test_concurrent_jobs_do_not_oversubscribe():
+    budget = OCR.CPUBudget(cores=8)
+    threads = [budget.acquire(1920 * 1080) for _ in range(6)]
+    # 第一个任务用满 8 核，之后核已分完，每个任务只拿 1 线程的下限
+    assert threads == [8, 1, 1, 1, 1, 1]
+    for n in threads:
+        budget.release(n)
+    assert budget.allocated == 0
+
+
+def test_released_cores_are_shared_fairly():
+    budget = OCR.CPUBudget(cores=8)
+    first = budget.acquire(640 * 360)
+    second = budget.acquire(1920 * 1080)
+    assert (first, second) == (1, 4)
+    assert budget.allocated <= budget.cores
+
+
+def test_onnx_sessions_are_capped_per_host(monkeypatch):
+    # 替身 onnxruntime：只记录创建会话时的线程数
+    created = []
+
+    class SessionOptions:
+        pass
+
+    class InferenceSession:
+        def __init__(self, path, sess_options, providers):
+            created.append(sess_options.intra_op_num_threads)
+            self.threads = sess_options.intra_op_num_threads
+
+    fake = types.SimpleNamespace(
+        SessionOptions=SessionOptions, InferenceSession=InferenceSession,
+        GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL=99),
+    )
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake)
+    backend = object.__new__(OCR.OnnxBackend)
+    backend.models_dir = "models"
+    backend._sessions = {}
+    for threads in (4, 1, 8, 3, 2, 16):
+        backend.use_threads(threads)
+        assert backend.det.threads in (1, 4)
+    assert sorted(set(created)) == [1, 4] and len(created) == 3 * OCR.ONNX_SESSION_SETS
@@ -0,0 +1,79 @@
+import os
+
+from PIL import Image
+
+import OCR
+
+
+class CountingEngine:
+    name = "exe"
+
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, image, on_line=None, cancel_event=None, profile="full"):
+        self.calls += 1
+        result = OCR.OCRResult([
+            OCR.OCRLine.from_box("first", [0, 0, 40, 10], 0.9),
+            OCR.OCRLine.from_box("second", [0, 20, 40, 30], 0.8),
+        ])
+        if on_line is not None:
+            for line in result.lines:
+                on_line(line)
+        return result
+
+
+def entry(i):
+    return {"lines": [], "value": i}
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = OCR.OCRResultCache(cache_dir="", max_entries=2)
+    cache.put("a", entry(1))
+    cache.put("b", entry(2))
+    assert cache.get("a") == entry(1)  # a 变为最近使用
+    cache.put("c", entry(3))
+    assert cache.get("b") is None
+    assert cache.get("a") == entry(1) and cache.get("c") == entry(3)
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1, "entries": 2}
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    OCR.OCRResultCache(cache_dir=str(tmp_path)).put("ab12", entry(1))
+    cache = OCR.OCRResultCache(cache_dir=str(tmp_path))
+    assert cache.get("ab12") == entry(1)
+    assert cache.get("ab12") == entry(1)
+    assert cache.stats() == {"hits": 1, "disk_hits": 1, "misses": 0, "entries": 1}
+
+
+def test_disk_tier_trims_least_recently_used_files(tmp_path):
+    cache = OCR.OCRResultCache(cache_dir=str(tmp_path), max_entries=1, max_disk_bytes=100)
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.put(key, entry(i))
+        # 文件时间精度有限，显式拉开各条目的使用时间
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    cache.put("dd04", {"lines": [], "text": "x" * 30})
+    remaining = sorted(name for _, _, names in os.walk(tmp_path) for name in names)
+    assert remaining == ["cc03.json", "dd04.json"]
+    assert sum(size for _, size, _ in cache._scan_disk()) <= 100
+
+
+def test_cache_key_depends_on_pixels_and_settings():
+    cache = OCR.OCRResultCache(cache_dir="")
+    white = Image.new("L", (8, 8), 255)
+    black = Image.new("L", (8, 8), 0)
+    assert cache.make_key(white, ("full",)) == cache.make_key(white.copy(), ("full",))
+    assert cache.make_key(white, ("full",)) != cache.make_key(black, ("full",))
+    assert cache.make_key(white, ("full",)) != cache.make_key(white, ("rec-only",))
+
+
+def test_cache_hit_streams_lines():
+    cache = OCR.OCRResultCache(cache_dir="")
+    engine = CountingEngine()
+    image = Image.new("L", (40, 30), 255)
+    first, second = [], []
+    OCR.recognize_profile(image, engine, cache, first.append, None, "full")
+    result = OCR.recognize_profile(image, engine, cache, second.append, None, "full")
+    assert engine.calls == 1
+    assert [line.text for line in second] == [line.text for line in first] == ["first", "second"]
+    assert [line.text for line in result.lines] == ["first", "second"]
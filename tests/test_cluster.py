@@ -0,0 +1,106 @@
+import io
+import json
+import time
+
+import OCR
+
+
+class FakeSocket:
+    # 只收集协调端发给节点的帧
+    def __init__(self):
+        self.data = b""
+
+    def sendall(self, data):
+        self.data += data
+
+    def shutdown(self, how):
+        pass
+
+    def frames(self):
+        frames, data = [], self.data
+        while data:
+            header_size, payload_size = OCR.CLUSTER_FRAME.unpack(data[:OCR.CLUSTER_FRAME.size])
+            data = data[OCR.CLUSTER_FRAME.size:]
+            frames.append(json.loads(data[:header_size]))
+            data = data[header_size + payload_size:]
+        return frames
+
+
+def make_coordinator(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"page{i}.png"
+        path.write_bytes(b"image")
+        paths.append(str(path))
+    out = io.StringIO()
+    coordinator = OCR.ClusterCoordinator(paths, {path: set() for path in paths}, out, {}, host="127.0.0.1", port=0)
+    coordinator.server.server_close()
+    return coordinator, out
+
+
+def join(coordinator, name, want=1):
+    node = OCR.ClusterNode(FakeSocket(), name, 1)
+    coordinator.nodes.append(node)
+    coordinator.on_message(node, {"op": "want", "count": want})
+    return node
+
+
+def tasks_sent(node):
+    return [frame["task"] for frame in node.sock.frames() if frame["op"] == "task"]
+
+
+def records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_expired_lease_is_reassigned(tmp_path):
+    coordinator, _ = make_coordinator(tmp_path, 1)
+    first = join(coordinator, "a")
+    assert tasks_sent(first) == [0]
+    coordinator.tasks[0].leases[first] = time.monotonic() - 1
+    second = join(coordinator, "b", want=0)
+    coordinator.on_message(second, {"op": "want", "count": 1})
+    # 第一个节点还持有任务，新节点只能窃取；租约过期后任务回到队列，由空闲节点领取
+    assert tasks_sent(second) == [0] and coordinator.stats["stolen"] == 1
+    coordinator.expire_leases()
+    assert first.tasks == set() and coordinator.tasks[0].leases.keys() == {second}
+    coordinator.on_message(first, {"op": "beat", "tasks": [0]})
+    assert coordinator.tasks[0].leases.keys() == {second}
+
+
+def test_expired_lease_requeues_when_no_copy_is_running(tmp_path):
+    coordinator, _ = make_coordinator(tmp_path, 1)
+    first = join(coordinator, "a")
+    coordinator.tasks[0].leases[first] = time.monotonic() - 1
+    coordinator.expire_leases()
+    assert coordinator.stats["retried"] == 1 and list(coordinator.pending) == [0]
+    second = join(coordinator, "b")
+    assert tasks_sent(second) == [0] and coordinator.tasks[0].attempts == 2
+
+
+def test_idle_node_steals_and_first_result_wins(tmp_path):
+    coordinator, out = make_coordinator(tmp_path, 2)
+    slow = join(coordinator, "slow", want=2)
+    fast = join(coordinator, "fast")
+    assert tasks_sent(slow) == [0, 1]
+    assert tasks_sent(fast) == [0]
+    coordinator.on_message(fast, {"op": "record", "task": 0, "record": {"text": "fast", "elapsed": 0.1}})
+    coordinator.on_message(fast, {"op": "done", "task": 0})
+    assert {"op": "cancel", "task": 0} in slow.sock.frames()
+    # 慢节点的重复结果被丢弃
+    coordinator.on_message(slow, {"op": "record", "task": 0, "record": {"text": "slow", "elapsed": 0.1}})
+    coordinator.on_message(slow, {"op": "done", "task": 0})
+    assert [(r["path"].endswith("page0.png"), r["text"]) for r in records(out)] == [(True, "fast")]
+    assert coordinator.remaining == 1 and coordinator.stats["ok"] == 1
+
+
+def test_messages_for_unknown_tasks_are_ignored(tmp_path):
+    coordinator, out = make_coordinator(tmp_path, 1)
+    node = join(coordinator, "a")
+    coordinator.on_message(node, {"op": "record", "task": 99, "record": {"text": "stale"}})
+    coordinator.on_message(node, {"op": "done", "task": 99})
+    coordinator.on_message(node, {"op": "beat", "tasks": [99]})
+    assert records(out) == [] and coordinator.remaining == 1
+    coordinator.on_message(node, {"op": "record", "task": 0, "record": {"text": "ok", "elapsed": 0.1}})
+    coordinator.on_message(node, {"op": "done", "task": 0})
+    assert coordinator.finished.is_set()
@@ -0,0 +1,145 @@
+from PIL import Image, ImageDraw
+
+import OCR
+
+
+WIDTH, HEIGHT = 1280, 320
+CHAR_W, CHAR_GAP, CHAR_H = 10, 2, 20
+SETTINGS = ("full", "none")
+
+
+# 替身识别：每个字符画成一个灰度块，灰度值就是字符编码；块间隔 CHAR_GAP 像素的属于同一行
+def draw_text(image, x, y, text):
+    draw = ImageDraw.Draw(image)
+    for i, char in enumerate(text):
+        left = x + i * (CHAR_W + CHAR_GAP)
+        draw.rectangle([left, y, left + CHAR_W - 1, y + CHAR_H - 1], fill=ord(char))
+
+
+def erase(image, x, y, length):
+    ImageDraw.Draw(image).rectangle([x, y, x + length * (CHAR_W + CHAR_GAP), y + CHAR_H - 1], fill=255)
+
+
+def read_blocks(image, score):
+    width, height = image.size
+    data = image.tobytes()
+    ink_rows = [y for y in range(height) if any(b != 255 for b in data[y * width:(y + 1) * width])]
+    lines = []
+    bands = []
+    for y in ink_rows:
+        if bands and y == bands[-1][1] + 1:
+            bands[-1][1] = y
+        else:
+            bands.append([y, y])
+    for top, bottom in bands:
+        row = data[top * width:(top + 1) * width]
+        text, x0, x1 = "", None, None
+        x = 0
+        while x < width:
+            if row[x] == 255:
+                x += 1
+                continue
+            if x1 is not None and x - x1 > CHAR_GAP + 1:
+                lines.append(OCR.OCRLine.from_box(text, [x0, top, x1, bottom + 1], score))
+                text, x0 = "", None
+            start = x
+            while x < width and row[x] != 255:
+                x += 1
+            text += chr(row[start])
+            x0 = start if x0 is None else x0
+            x1 = x
+        if text:
+            lines.append(OCR.OCRLine.from_box(text, [x0, top, x1, bottom + 1], score))
+    return OCR.OCRResult(lines)
+
+
+def recognize(image, on_line):
+    return read_blocks(image, 0.9)
+
+
+def recognize_region(crop):
+    return read_blocks(crop, 0.8)
+
+
+def page(*placed):
+    image = Image.new("L", (WIDTH, HEIGHT), 255)
+    for x, y, text in placed:
+        draw_text(image, x, y, text)
+    return image
+
+
+def run(image, memory):
+    return OCR.run_incremental_ocr(image, memory, SETTINGS, recognize, recognize_region)
+
+
+def texts(result):
+    return [line.text for line in result.lines]
+
+
+def test_first_run_recognizes_the_whole_page():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"), (20, 60, "Row 7 total: 1"))
+    result = run(image, memory)
+    assert texts(result) == ["Row 6 total: 5", "Row 7 total: 1"]
+    assert "regions" not in result.timings
+
+
+def test_unchanged_lines_keep_their_previous_result():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"), (20, 60, "Row 7 total: 1"), (20, 110, "Footer"))
+    run(image, memory)
+    draw_text(image, 700, 60, "x")
+    result = run(image, memory)
+    assert texts(result) == ["Row 6 total: 5", "Row 7 total: 1", "x", "Footer"]
+    assert result.timings["regions"] == 1
+    assert [line.score for line in result.lines] == [0.9, 0.9, 0.8, 0.9]
+
+
+def test_appended_text_replaces_the_old_line():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"), (20, 60, "Row 7 total: 1"))
+    run(image, memory)
+    draw_text(image, 20, 60, "Row 7 total: 12")
+    result = run(image, memory)
+    assert texts(result) == ["Row 6 total: 5", "Row 7 total: 12"]
+    assert result.timings["changed_area"] > 0
+    # 第一行也落在变化区域里，但像素未动，保留上次的结果
+    assert [line.score for line in result.lines] == [0.9, 0.8]
+    draw_text(image, 20, 60, "Row 7 total: 1234567")
+    assert texts(run(image, memory)) == ["Row 6 total: 5", "Row 7 total: 1234567"]
+
+
+def test_deleted_text_replaces_the_old_line():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"), (20, 60, "Row 7 total: 1234567"))
+    run(image, memory)
+    erase(image, 20 + 14 * (CHAR_W + CHAR_GAP), 60, 6)
+    assert texts(run(image, memory)) == ["Row 6 total: 5", "Row 7 total: 1"]
+
+
+def test_rewrapped_paragraph_replaces_the_old_lines():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"), (20, 60, "alpha beta gamma"), (20, 200, "Footer"))
+    run(image, memory)
+    erase(image, 20, 60, 16)
+    draw_text(image, 20, 60, "alpha beta")
+    draw_text(image, 20, 90, "gamma delta")
+    result = run(image, memory)
+    assert texts(result) == ["Row 6 total: 5", "alpha beta", "gamma delta", "Footer"]
+
+
+def test_changed_regions_grow_to_cover_crossing_lines():
+    # 第 0 行第 2 格变化；与之相交的旧行跨到第 4 格，区域扩到完整包住这一行
+    columns = -(-WIDTH // OCR.INCREMENTAL_CELL)
+    line = OCR.OCRLine.from_box("wide", [100, 10, 300, 30], 0.9)
+    regions = sorted(OCR.changed_regions([2, 2 * columns + 2], (WIDTH, HEIGHT), [line]))
+    assert regions == [[100, 0, 300, 64 + OCR.INCREMENTAL_MARGIN], [104, 104, 216, 216]]
+
+
+def test_tile_memory_forgets_other_settings():
+    memory = OCR.TileMemory()
+    image = page((20, 20, "Row 6 total: 5"))
+    memory.remember(image, SETTINGS, OCR.cell_hashes(image), [])
+    assert memory.recall(image, SETTINGS) is not None
+    assert memory.recall(image, ("full", "binarize")) is None
+    assert memory.recall(image.convert("RGB"), SETTINGS) is None
@@ -0,0 +1,77 @@
+import OCR
+
+
+# RapidOcrOnnx.exe 一次识别两行时的控制台输出（带 padding 的坐标）
+ENGINE_OUTPUT = "\n".join([
+    "=====Start detect=====",
+    "dbNetTime(12.5ms)",
+    "TextBox[0](+padding)[score(0.812),[x: 60, y: 70], [x: 260, y: 70], [x: 260, y: 100], [x: 60, y: 100]]",
+    "TextBox[1](+padding)[score(0.774),[x: 60, y: 120], [x: 300, y: 120], [x: 300, y: 150], [x: 60, y: 150]]",
+    "angle[0][index(0), score(0.99), time(1.5ms)]",
+    "angle[1][index(0), score(0.98), time(1.0ms)]",
+    "---------- step: crnnNet getTextLine ----------",
+    "textLine[0](截图识别)",
+    "textScores[0]{0.9,1.0,0.95,0.95}",
+    "crnnTime[0](3.0ms)",
+    "textLine[1](screen capture 42)",
+    "textScores[1]{0.75,0.75,1.0}",
+    "crnnTime[1](4.0ms)",
+    "=====End detect=====",
+    "FullDetectTime(30.0ms)",
+    "截图识别",
+    "screen capture 42",
+    "",
+]).encode("utf-8")
+
+
+def parse_in_chunks(data, size):
+    parser = OCR.OCROutputParser()
+    events = []
+    for start in range(0, len(data), size):
+        events.extend(parser.feed(data[start:start + size]))
+    events.extend(parser.close())
+    return parser.result, events
+
+
+def test_structured_lines_and_timings():
+    result = OCR.parse_engine_output(ENGINE_OUTPUT)
+    assert result.lines == [
+        OCR.OCRLine("截图识别", [[10, 20], [210, 20], [210, 50], [10, 50]], 0.95),
+        OCR.OCRLine("screen capture 42", [[10, 70], [250, 70], [250, 100], [10, 100]], 2.5 / 3),
+    ]
+    assert result.timings == {
+        "dbNetTime": 12.5, "angleTime": 2.5, "crnnTime": 7.0, "FullDetectTime": 30.0,
+    }
+    assert result.text_lines == ["截图识别", "screen capture 42"]
+    assert OCR.render_plain_text(result) == "截图识别\nscreen capture 42"
+
+
+def test_chunked_input_matches_whole_input():
+    whole = OCR.parse_engine_output(ENGINE_OUTPUT)
+    # 1 字节的分块会把多字节汉字和 \r\n 都切开
+    for size in (1, 7, 64, len(ENGINE_OUTPUT)):
+        result, events = parse_in_chunks(ENGINE_OUTPUT.replace(b"\n", b"\r\n"), size)
+        assert result.to_dict() == whole.to_dict()
+        assert events == whole.lines
+
+
+def test_lines_are_emitted_as_soon_as_they_complete():
+    parser = OCR.OCROutputParser()
+    head, _, tail = ENGINE_OUTPUT.partition(b"textLine[1]")
+    assert [line.text for line in parser.feed(head)] == ["截图识别"]
+    assert [line.text for line in parser.feed(b"textLine[1]" + tail)] == ["screen capture 42"]
+    assert parser.close() == []
+
+
+def test_output_without_result_block_falls_back_to_raw_text():
+    output = "模型文件加载失败: ch_PP-OCRv4_det_infer.onnx\r\nusage: RapidOcrOnnx --models ...\n".encode("utf-8")
+    result, events = parse_in_chunks(output, 5)
+    assert events == [] and result.lines == []
+    assert OCR.render_plain_text(result) == "模型文件加载失败: ch_PP-OCRv4_det_infer.onnx\nusage: RapidOcrOnnx --models ..."
+
+
+def test_filter_ocr_bytes_drops_stderr_and_handles_empty_output():
+    raw = ENGINE_OUTPUT + "\n【错误输出】\nwarning\n".encode("utf-8")
+    assert OCR.filter_ocr_bytes(raw) == "截图识别\nscreen capture 42"
+    assert OCR.filter_ocr_bytes(b"") == OCR.NO_TEXT
+    assert OCR.filter_ocr_bytes(b"\r\n  \n") == OCR.NO_TEXT
@@ -0,0 +1,50 @@
+from PIL import Image, ImageDraw
+
+import OCR
+
+
+class RecordingEngine:
+    # 记录每次识别所用流程的替身引擎，返回固定置信度的一行
+    def __init__(self, name, score):
+        self.name = name
+        self.score = score
+        self.profiles = []
+
+    def recognize(self, image, on_line=None, cancel_event=None, profile="full"):
+        self.profiles.append(profile)
+        return OCR.OCRResult([OCR.OCRLine.from_box("E1234", [0, 0, image.width, image.height], self.score)])
+
+
+def single_line():
+    image = Image.new("RGB", (400, 40), "white")
+    ImageDraw.Draw(image).rectangle([10, 10, 390, 30], fill="black")
+    return image
+
+
+def recognize(engine):
+    return OCR.recognize_auto(single_line(), engine, None, None, None, OCR.PROFILE_AUTO)
+
+
+def test_onnx_single_line_skips_detection():
+    engine = RecordingEngine("onnx", 0.99)
+    recognize(engine)
+    assert engine.profiles == ["rec-only"]
+
+
+def test_onnx_low_confidence_falls_back_to_full():
+    engine = RecordingEngine("onnx", 0.5)
+    recognize(engine)
+    assert engine.profiles == ["rec-only", "full"]
+
+
+def test_exe_single_line_runs_once_without_angle_classification():
+    engine = RecordingEngine("exe", 0.5)
+    recognize(engine)
+    assert engine.profiles == ["no-cls"]
+
+
+def test_exe_maps_rec_only_to_no_cls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(OCR, "run_engine_once", lambda *args: calls.append(args[-1]) or OCR.OCRResult())
+    OCR.ExeBackend().recognize("page.png", profile="rec-only")
+    assert calls == ["no-cls"]
@@ -0,0 +1,68 @@
+import pytest
+from PIL import Image, ImageDraw
+
+import OCR
+
+np = pytest.importorskip("numpy")
+OCR.load_numpy()
+
+
+def page(char_h=16, size=(800, 400), background=255, ink=0):
+    # 替身文字：每行一串字符大小的方块，块间留空，行间留一个字高
+    image = Image.new("L", size, background)
+    draw = ImageDraw.Draw(image)
+    char_w = max(2, char_h * 2 // 3)
+    for y in range(char_h * 2, size[1] - char_h * 2, char_h * 2):
+        for x in range(40, size[0] - 40 - char_w, char_w + max(2, char_h // 4)):
+            draw.rectangle([x, y, x + char_w - 1, y + char_h - 1], fill=ink)
+    return image
+
+
+def test_normalize_contrast_stretches_and_inverts_dark_backgrounds():
+    gray = np.asarray(page(background=100, ink=150))
+    out = OCR.normalize_contrast(gray)
+    # 深底浅字反色为浅底深字，并拉满 0~255
+    assert out[0, 0] == 255
+    assert out[gray == 150].max() == 0
+
+
+def test_estimate_skew_reports_the_correcting_angle():
+    skewed = page(size=(1000, 600)).rotate(3, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    assert OCR.estimate_skew(np.asarray(skewed)) == pytest.approx(-3, abs=OCR.DESKEW_STEP)
+    assert OCR.estimate_skew(np.asarray(page())) == 0.0
+
+
+def test_binarize_ignores_uneven_lighting():
+    image = np.asarray(page()).astype(np.int16)
+    # 左暗右亮的光照：背景从 140 渐变到 255，笔画始终比背景暗 100
+    shade = np.linspace(-115, 0, image.shape[1]).astype(np.int16)
+    lit = np.clip(np.where(image == 0, 155, 255) + shade, 0, 255).astype(np.uint8)
+    out = OCR.binarize(lit)
+    assert set(np.unique(out)) == {0, 255}
+    assert np.array_equal(out == 0, image == 0)
+
+
+def test_text_scale_targets_a_readable_height():
+    assert OCR.text_scale(np.asarray(page(char_h=16))) == 1.0
+    assert OCR.text_scale(np.asarray(page(char_h=48, size=(1600, 800)))) == OCR.TEXT_MAX_HEIGHT / 48
+    assert OCR.text_scale(np.asarray(page(char_h=4, size=(400, 200)))) == OCR.TEXT_MAX_SCALE
+
+
+def test_restored_boxes_map_back_to_source_coordinates():
+    source = page(char_h=48, size=(1600, 800))
+    image, transform = OCR.preprocess_image(source, "clean")
+    assert image.size == (800, 400)
+    line = OCR.OCRLine.from_box("x", [20, 48, 60, 72], 0.9)
+    assert OCR.restore_line(line, transform).box == [40, 96, 120, 144]
+
+
+def test_rotation_transform_maps_points_back():
+    source = Image.new("L", (600, 300), 255)
+    ImageDraw.Draw(source).rectangle([400, 200, 409, 209], fill=0)
+    rotated, transform = OCR.rotate_image(source, -3)
+    ys, xs = np.nonzero(np.asarray(rotated) < 128)
+    box = [int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1]
+    restored = OCR.restore_line(OCR.OCRLine.from_box("x", box, 0.9), transform).box
+    # 旋转后的外接框略大于原方块，中心应回到原处
+    assert (restored[0] + restored[2]) / 2 == pytest.approx(405, abs=1)
+    assert (restored[1] + restored[3]) / 2 == pytest.approx(205, abs=1)
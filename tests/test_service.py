@@ -0,0 +1,46 @@
+import http.client
+import json
+
+import pytest
+
+import OCR
+
+
+class StaticEngine:
+    name = "exe"
+
+    def recognize(self, image, on_line=None, cancel_event=None, profile="full"):
+        return OCR.OCRResult([OCR.OCRLine.from_box("hi", [0, 0, 10, 10], 0.99)])
+
+
+@pytest.fixture
+def service():
+    service = OCR.OCRService(StaticEngine(), port=0)
+    service.start()
+    yield service
+    service.stop()
+
+
+def post(service, headers, body=b""):
+    conn = http.client.HTTPConnection("127.0.0.1", service.server.server_address[1], timeout=5)
+    conn.putrequest("POST", "/ocr")
+    for name, value in headers.items():
+        conn.putheader(name, value)
+    conn.endheaders()
+    if body:
+        conn.send(body)
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    conn.close()
+    return response.status, payload
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_invalid_content_length_is_rejected(service, length):
+    status, payload = post(service, {"Content-Length": length})
+    assert status == 400 and "Content-Length" in payload["error"]
+
+
+def test_oversized_and_empty_bodies_are_rejected(service):
+    assert post(service, {"Content-Length": str(OCR.SERVICE_MAX_BYTES + 1)})[0] == 413
+    assert post(service, {"Content-Length": "0"})[0] == 400
@@ -0,0 +1,47 @@
+import OCR
+
+
+WIDTH, HEIGHT = 2600, 1600
+
+
+def tile_results(*placed):
+    # placed: (分块序号, 文本, 分块内坐标框)；其余分块没有识别结果
+    tiles = OCR.split_tiles(WIDTH, HEIGHT)
+    results = [OCR.OCRResult() for _ in tiles]
+    for index, text, box in placed:
+        results[index].lines.append(OCR.OCRLine.from_box(text, box, 0.9))
+    return tiles, results
+
+
+def test_cut_word_is_joined_across_seam():
+    # 分块 0 右边界截断 "Column two va"，分块 1（从 x=1120 开始）左边界截断 "olumn two value 42"
+    tiles, results = tile_results(
+        (0, "Column two va", [1097, 100, 1280, 130]),
+        (1, "olumn two value 42", [0, 100, 660, 130]),
+    )
+    lines = OCR.merge_tile_lines(tiles, results, WIDTH, HEIGHT)
+    assert [line.text for line in lines] == ["Column two value 42"]
+    assert lines[0].box == [1097, 100, 1780, 130]
+
+
+def test_contained_fragment_is_dropped():
+    # 分块 1 里的完整行已覆盖分块 0 右边界截下的片段
+    tiles, results = tile_results(
+        (0, "two va", [1180, 100, 1280, 130]),
+        (1, "Column two value 42", [20, 100, 680, 130]),
+    )
+    lines = OCR.merge_tile_lines(tiles, results, WIDTH, HEIGHT)
+    assert [line.text for line in lines] == ["Column two value 42"]
+    assert lines[0].box == [1140, 100, 1800, 130]
+
+
+def test_repeated_characters_keep_their_count_across_seams():
+    # 125 个宽 20 像素的 "0" 从 x=40 起横跨三个分块（分块起点 0、1120、1320），重叠区的字数由像素决定
+    tiles, results = tile_results(
+        (0, "0" * 62, [40, 100, 1280, 130]),
+        (1, "0" * 64, [0, 100, 1280, 130]),
+        (2, "0" * 61, [0, 100, 1220, 130]),
+    )
+    lines = OCR.merge_tile_lines(tiles, results, WIDTH, HEIGHT)
+    assert [line.text for line in lines] == ["0" * 125]
+    assert lines[0].box == [40, 100, 2540, 130]
@@ -0,0 +1,73 @@
+from PIL import Image, ImageDraw
+
+import OCR
+
+
+class Plane(bytes):
+    line_size = 0
+
+
+class FakeFrame:
+    # 替身视频帧：只实现 frame_signature 用到的 reformat 和 planes
+    def __init__(self, image):
+        self.image = image
+        self.width, self.height = image.size
+
+    def reformat(self, width, height, format, interpolation):
+        assert format == "gray"
+        small = self.image.convert("L").resize((width, height), Image.Resampling.BOX)
+        plane = Plane(small.tobytes())
+        plane.line_size = width
+        frame = FakeFrame(small)
+        frame.planes = [plane]
+        return frame
+
+
+def screen(text_width):
+    image = Image.new("RGB", (128, 64), "white")
+    if text_width:
+        ImageDraw.Draw(image).rectangle([8, 24, 8 + text_width, 40], fill="black")
+    return FakeFrame(image)
+
+
+def test_frame_signature_is_a_downsampled_gray_image():
+    signature = OCR.frame_signature(screen(64))
+    assert signature.mode == "L"
+    assert signature.size == (128 // OCR.WATCH_DOWNSAMPLE, 64 // OCR.WATCH_DOWNSAMPLE)
+    assert OCR.similar_frames(signature, OCR.frame_signature(screen(64)))
+    assert not OCR.similar_frames(signature, OCR.frame_signature(screen(96)))
+
+
+def test_keyframes_wait_for_the_screen_to_settle():
+    # 10 帧/秒：空白屏 1 秒，打字 0.3 秒（每帧都不同），之后停在整行文字上
+    frames = [screen(0)] * 10 + [screen(20), screen(40), screen(60)] + [screen(80)] * 20
+    timed = [(i / 10, frame) for i, frame in enumerate(frames)]
+    stats = {"frames": 0, "end": 0.0}
+    keyframes = list(OCR.iter_keyframes(iter(timed), stats))
+    assert [(t, frame) for t, frame, _ in keyframes] == [(0.0, frames[0]), (1.0, frames[-1])]
+    assert stats == {"frames": len(frames), "end": 3.2}
+
+
+def test_keyframe_is_dropped_when_the_screen_changes_back():
+    # 光标闪烁：短暂变化后回到上一关键帧的画面，不产生新的关键帧
+    frames = [screen(80)] * 10 + [screen(84)] * 3 + [screen(80)] * 10
+    stats = {"frames": 0, "end": 0.0}
+    keyframes = list(OCR.iter_keyframes(((i / 10, f) for i, f in enumerate(frames)), stats))
+    assert [t for t, _, _ in keyframes] == [0.0]
+
+
+def test_continuous_changes_still_yield_keyframes():
+    frames = [screen(i) for i in range(0, 100, 4)]
+    stats = {"frames": 0, "end": 0.0}
+    keyframes = list(OCR.iter_keyframes(((i / 10, f) for i, f in enumerate(frames)), stats))
+    assert [t for t, _, _ in keyframes] == [0.0, 2.1]
+
+
+def test_text_segments_span_from_appearance_to_disappearance():
+    segments = OCR.TextSegments()
+    assert segments.update(0.0, ["Build started", "step 1"]) == []
+    assert segments.update(1.5, ["Build  started", "step 2"]) == [(0.0, 1.5, "step 1")]
+    # 同样的文字同时出现两行时各自计段
+    assert segments.update(2.0, ["Build started", "step 2", "step 2"]) == []
+    assert segments.update(4.0, ["step 2"]) == [(0.0, 4.0, "Build started"), (2.0, 4.0, "step 2")]
+    assert segments.update(5.0, []) == [(1.5, 5.0, "step 2")]